@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式累加器
+逐条计入数值、占用固定大小内存、部分结果可以合并的统计量，用于月度统计：
+RunningStats（次数、总和、最小、最大、Welford 方差）、FirstLast（按日期的首次和最新值）、
+QuantileSketch（按固定宽度分桶计数，求中位数、P90 等分位数）
+都支持 to_dict()/from_dict()，可以直接写入 JSON（增量汇总状态 .cache/aggregates.json 按月保存它们）
+"""
+
+import math
+
+
+class RunningStats:
+    """次数、总和、最小、最大，以及 Welford 算法的均值和方差"""
+
+    __slots__ = ('count', 'total', 'minimum', 'maximum', '_mean', '_m2')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        """计入一个数值"""
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+
+    def merge(self, other):
+        """合并另一部分的统计（Chan 等人的两组合并公式）"""
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.total = other.count, other.total
+            self.minimum, self.maximum = other.minimum, other.maximum
+            self._mean, self._m2 = other._mean, other._m2
+            return
+        count = self.count + other.count
+        delta = other._mean - self._mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self._mean += delta * other.count / count
+        self.count = count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def mean(self):
+        """均值（总和 ÷ 次数，与按总和计算的结果完全一致），没有数值时为 None"""
+        return self.total / self.count if self.count else None
+
+    def variance(self):
+        """样本方差，少于两个数值时为 None"""
+        return self._m2 / (self.count - 1) if self.count > 1 else None
+
+    def std(self):
+        """样本标准差，少于两个数值时为 None"""
+        variance = self.variance()
+        return math.sqrt(max(variance, 0)) if variance is not None else None
+
+    def to_dict(self):
+        """可写入 JSON 的字典"""
+        return {'count': self.count, 'total': self.total, 'min': self.minimum,
+                'max': self.maximum, 'mean': self._mean, 'm2': self._m2}
+
+    @classmethod
+    def from_dict(cls, data):
+        """由 to_dict() 的结果恢复"""
+        stats = cls()
+        stats.count, stats.total = data['count'], data['total']
+        stats.minimum, stats.maximum = data['min'], data['max']
+        stats._mean, stats._m2 = data['mean'], data['m2']
+        return stats
+
+
+class FirstLast:
+    """按日期（或其他可比较的键）记录最早和最新的值；键相同时最早值保留先计入的，最新值取后计入的"""
+
+    __slots__ = ('first_key', 'first', 'last_key', 'last')
+
+    def __init__(self):
+        self.first_key = None
+        self.first = None
+        self.last_key = None
+        self.last = None
+
+    def add(self, key, value):
+        """计入一个带键的数值"""
+        if self.first_key is None or key < self.first_key:
+            self.first_key, self.first = key, value
+        if self.last_key is None or key >= self.last_key:
+            self.last_key, self.last = key, value
+
+    def merge(self, other):
+        """合并另一部分（视为在本部分之后计入）"""
+        if other.first_key is None:
+            return
+        if self.first_key is None or other.first_key < self.first_key:
+            self.first_key, self.first = other.first_key, other.first
+        if self.last_key is None or other.last_key >= self.last_key:
+            self.last_key, self.last = other.last_key, other.last
+
+    def change(self):
+        """最新值减最早值，没有数值时为 None"""
+        return self.last - self.first if self.first_key is not None else None
+
+    def to_dict(self):
+        """可写入 JSON 的字典"""
+        return {'first_key': self.first_key, 'first': self.first,
+                'last_key': self.last_key, 'last': self.last}
+
+    @classmethod
+    def from_dict(cls, data):
+        """由 to_dict() 的结果恢复"""
+        result = cls()
+        result.first_key, result.first = data['first_key'], data['first']
+        result.last_key, result.last = data['last_key'], data['last']
+        return result
+
+
+class QuantileSketch:
+    """按固定宽度分桶计数的分位数
+
+    桶数只取决于数值范围（心率按 1 bpm 分桶不超过 250 个），与数值个数无关；合并只是桶计数相加，
+    结果与一次计入全部数值完全相同。分位数按最近秩取所在桶的下界，宽度为 1 且数值为整数时是精确值
+    """
+
+    __slots__ = ('width', 'counts', 'count')
+
+    def __init__(self, width=1):
+        self.width = width
+        self.counts = {}
+        self.count = 0
+
+    def add(self, value):
+        """计入一个数值"""
+        bucket = math.floor(value / self.width)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+
+    def merge(self, other):
+        """合并另一部分的桶计数，两者的桶宽度必须相同"""
+        if other.width != self.width:
+            raise ValueError(f"桶宽度不同，无法合并: {self.width} 和 {other.width}")
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+
+    def quantile(self, q):
+        """第 q 分位数（0 < q ≤ 1），没有数值时为 None"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return bucket * self.width
+        return max(self.counts) * self.width
+
+    def median(self):
+        """中位数"""
+        return self.quantile(0.5)
+
+    def to_dict(self):
+        """可写入 JSON 的字典"""
+        # JSON 的键只能是字符串，桶计数保存为 [桶, 次数] 列表
+        return {'width': self.width, 'counts': sorted([b, c] for b, c in self.counts.items())}
+
+    @classmethod
+    def from_dict(cls, data):
+        """由 to_dict() 的结果恢复"""
+        sketch = cls(data['width'])
+        sketch.counts = {bucket: count for bucket, count in data['counts']}
+        sketch.count = sum(sketch.counts.values())
+        return sketch
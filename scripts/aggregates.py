@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+月度统计与增量汇总状态
+月度统计的累加/合并，以及保存在 .cache/aggregates.json 中的汇总状态：
+quick_log.py 每录入一条记录以 O(1) 更新状态，analyze.py 在数据文件未被其他方式修改时直接用它出报告，不再解析；
+还有各脚本共用的配速转换、日期校验和月度文件列表
+
+本模块以及 accumulators.py、hr_model.py、best_efforts.py 只依赖标准库，quick_log.py 导入它们不会带来 NumPy 的开销
+"""
+
+import bisect
+import json
+import os
+from collections import defaultdict
+from datetime import date, timedelta
+
+from accumulators import FirstLast, QuantileSketch, RunningStats
+from parse_cache import default_cache_dir, file_signature
+
+STATE_VERSION = 2
+
+# 报告中的“最近5次跑步”
+RECENT_RUNS = 5
+
+# 训练负荷只需要最近一段时间的每日数据：报告最多回看 4 周，每个点还需要 28 天的慢性负荷
+LOAD_WINDOW_DAYS = 56
+
+
+# 月度统计中的流式累加器：键 -> 类型，内存只与月份数有关，与记录数无关
+MONTH_ACCUMULATORS = {
+    'hr': RunningStats,
+    'hr_quantiles': QuantileSketch,
+    'weight': RunningStats,
+    'weight_trend': FirstLast,
+    'feeling': RunningStats,
+}
+
+MONTH_TOTALS = ('total_distance', 'total_duration', 'count')
+
+
+def pace_to_seconds(pace_str):
+    """将配速（6:15）转换为秒数，无效时为 None"""
+    try:
+        parts = pace_str.split(':')
+        return int(parts[0]) * 60 + int(parts[1])
+    except (AttributeError, ValueError, IndexError):
+        return None
+
+
+def format_pace(seconds):
+    """将秒数转换为 m:ss 配速"""
+    seconds = int(seconds)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def new_month_stats():
+    """空的月度统计"""
+    stats = {key: 0 for key in MONTH_TOTALS}
+    stats.update((key, cls()) for key, cls in MONTH_ACCUMULATORS.items())
+    return stats
+
+
+def accumulate_record(stats, record):
+    """把一条记录计入月度统计"""
+    stats['total_distance'] += record['distance']
+    stats['total_duration'] += record['duration']
+    stats['count'] += 1
+
+    if record['avg_hr']:
+        stats['hr'].add(record['avg_hr'])
+        stats['hr_quantiles'].add(record['avg_hr'])
+
+    if record['weight']:
+        stats['weight'].add(record['weight'])
+        stats['weight_trend'].add(record['date'], record['weight'])
+
+    if record['feeling']:
+        stats['feeling'].add(record['feeling'])
+
+
+def merge_month_stats(target, partial):
+    """把部分统计合并进月度统计（partial 视为在 target 之后计入，不会被修改）"""
+    for key in MONTH_TOTALS:
+        target[key] += partial[key]
+    for key in MONTH_ACCUMULATORS:
+        target[key].merge(partial[key])
+
+
+def month_stats_to_dict(stats):
+    """月度统计转为可写入 JSON 的字典"""
+    data = {key: stats[key] for key in MONTH_TOTALS}
+    data.update((key, stats[key].to_dict()) for key in MONTH_ACCUMULATORS)
+    return data
+
+
+def month_stats_from_dict(data):
+    """由 month_stats_to_dict() 的结果恢复月度统计"""
+    stats = {key: data[key] for key in MONTH_TOTALS}
+    stats.update((key, cls.from_dict(data[key])) for key, cls in MONTH_ACCUMULATORS.items())
+    return stats
+
+
+def valid_date(value):
+    """是否为 YYYY-MM-DD 格式的有效日期（汇总状态按字符串比较日期，只接受这种写法）"""
+    try:
+        return date.fromisoformat(value).isoformat() == value
+    except (TypeError, ValueError):
+        return False
+
+
+def month_in_range(month_key, since=None, until=None):
+    """月份（YYYY-MM）是否与日期范围 since~until（YYYY-MM-DD，含两端，None 为不限）有交集"""
+    return (not since or month_key >= since[:7]) and (not until or month_key <= until[:7])
+
+
+def record_in_range(record, since=None, until=None):
+    """记录的日期是否在 since~until 内（含两端）"""
+    return (not since or record['date'] >= since) and (not until or record['date'] <= until)
+
+
+def list_month_files(data_dir, since=None, until=None):
+    """按时间顺序列出月度文件，返回 (月份键, 文件路径) 列表
+
+    给出 since/until（YYYY-MM-DD，含两端）时只按目录名和文件名筛选与范围有交集的年份和月份，
+    范围外的年份目录不会被读取，月度文件也不会被打开
+    """
+    month_files = []
+    for year in sorted(os.listdir(data_dir)):
+        if year.isdigit() and ((since and year < since[:4]) or (until and year > until[:4])):
+            continue
+        year_path = os.path.join(data_dir, year)
+        if not os.path.isdir(year_path):
+            continue
+
+        # 文件名以两位月份开头（01-January.md），按名称排序即按月份排序
+        for month_file in sorted(os.listdir(year_path)):
+            if not month_file.endswith('.md'):
+                continue
+            month_key = f"{year}-{month_file[:2]}"
+            if month_in_range(month_key, since, until):
+                month_files.append((month_key, os.path.join(year_path, month_file)))
+
+    return month_files
+
+
+def month_file_signatures(data_dir, month_files=None):
+    """所有月度文件的签名（修改时间、大小），键为相对 data 目录的路径"""
+    if month_files is None:
+        month_files = list_month_files(data_dir)
+    return {os.path.relpath(file_path, data_dir): list(file_signature(file_path))
+            for _, file_path in month_files}
+
+
+def default_state_path(data_dir):
+    """默认状态文件：.cache/aggregates.json"""
+    return os.path.join(default_cache_dir(data_dir), 'aggregates.json')
+
+
+class AggregateState:
+    """增量维护的汇总状态：总体统计、月度统计、最近记录和最近几周的每日负荷"""
+
+    def __init__(self, state=None):
+        self.state = state or {
+            'version': STATE_VERSION,
+            'sources': {},
+            'diagnostics': [],
+            'overall': {
+                'count': 0,
+                'total_distance': 0,
+                'total_duration': 0,
+                'avg_hr_sum': 0,
+                'avg_hr_count': 0,
+                'max_hr': None,
+                'first_date': None,
+                'last_date': None,
+                'weight': None,
+            },
+            'monthly': {},
+            'recent': [],
+            # 日期 -> [距离, 时长, 有心率训练的 时长×心率 之和, 无心率训练的时长]
+            'daily': {},
+        }
+
+    @classmethod
+    def load(cls, state_path):
+        """读取状态文件，不存在或版本不符时返回 None"""
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get('version') != STATE_VERSION:
+            return None
+        return cls(state)
+
+    def save(self, state_path):
+        """原子写入状态文件"""
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, state_path)
+
+    @classmethod
+    def build(cls, records, monthly_stats, sources, diagnostics=()):
+        """由完整解析的结果（按日期排序的记录）建立状态，日期无效的记录被忽略"""
+        records = [r for r in records if valid_date(r['date'])]
+        aggregate = cls()
+        aggregate.state['sources'] = sources
+        aggregate.state['diagnostics'] = [list(d) for d in diagnostics]
+        aggregate.state['monthly'] = {month: month_stats_to_dict(stats)
+                                      for month, stats in monthly_stats.items()}
+        for record in records:
+            aggregate._add_to_overall(record)
+        aggregate.state['recent'] = list(records[-RECENT_RUNS:])
+
+        # 记录已按日期排序，每日负荷只需要看末尾几周
+        cutoff = aggregate._daily_cutoff() if records else None
+        for record in reversed(records):
+            if record['date'] < cutoff:
+                break
+            aggregate._add_daily(record)
+        return aggregate
+
+    def is_current(self, sources):
+        """状态是否与当前的月度文件一致"""
+        return self.state['sources'] == sources
+
+    def add_record(self, record, source, signature, line_no=None):
+        """计入一条新追加到 source 文件的记录，并更新该文件的签名，与记录总数无关的常数时间
+
+        line_no 为新记录所在行，该文件中位于其后的解析诊断行号顺延；
+        日期无效的记录不计入，也不更新签名，下次分析时重建状态
+        """
+        if not valid_date(record['date']):
+            return
+        month = record['date'][:7]
+        monthly = self.state['monthly']
+        stats = month_stats_from_dict(monthly[month]) if month in monthly else new_month_stats()
+        accumulate_record(stats, record)
+        monthly[month] = month_stats_to_dict(stats)
+        previous_last = self.state['overall']['last_date']
+        self._add_to_overall(record)
+        self._add_recent(record)
+        self._add_daily(record)
+        if self.state['overall']['last_date'] != previous_last:
+            self._trim_daily()
+
+        self.state['sources'][source] = list(signature)
+        if line_no is not None:
+            suffix = os.sep + os.path.normpath(source)
+            for d in self.state['diagnostics']:
+                if os.path.normpath(d[0]).endswith(suffix) and d[1] >= line_no:
+                    d[1] += 1
+
+    def _add_to_overall(self, record):
+        """更新总体统计"""
+        overall = self.state['overall']
+        day = record['date']
+        overall['count'] += 1
+        overall['total_distance'] += record['distance']
+        overall['total_duration'] += record['duration']
+        if overall['first_date'] is None or day < overall['first_date']:
+            overall['first_date'] = day
+        if overall['last_date'] is None or day > overall['last_date']:
+            overall['last_date'] = day
+
+        if record['avg_hr']:
+            overall['avg_hr_sum'] += record['avg_hr']
+            overall['avg_hr_count'] += 1
+            if record['max_hr'] and (overall['max_hr'] is None or record['max_hr'] > overall['max_hr']):
+                overall['max_hr'] = record['max_hr']
+
+        if record['weight']:
+            self._add_weight(day, record['weight'])
+
+    def _add_recent(self, record):
+        """更新最近记录：按日期排序，同一天的新记录排在后面（与文件中的顺序一致）"""
+        recent = self.state['recent']
+        position = bisect.bisect_right([r['date'] for r in recent], record['date'])
+        if position > 0 or len(recent) < RECENT_RUNS:
+            recent.insert(position, record)
+            del recent[:-RECENT_RUNS]
+
+    def _add_weight(self, day, value):
+        """更新体重的首次、最新、最高、最低值"""
+        weight = self.state['overall']['weight']
+        if weight is None:
+            self.state['overall']['weight'] = {'first_date': day, 'first': value,
+                                               'latest_date': day, 'latest': value,
+                                               'max': value, 'min': value}
+            return
+        if day < weight['first_date']:
+            weight['first_date'], weight['first'] = day, value
+        if day >= weight['latest_date']:
+            weight['latest_date'], weight['latest'] = day, value
+        weight['max'] = max(weight['max'], value)
+        weight['min'] = min(weight['min'], value)
+
+    def _daily_cutoff(self):
+        """每日负荷保留的最早日期"""
+        last = date.fromisoformat(self.state['overall']['last_date'])
+        return str(last - timedelta(days=LOAD_WINDOW_DAYS - 1))
+
+    def _add_daily(self, record):
+        """计入每日负荷，早于保留窗口的记录不影响报告，直接忽略"""
+        day = record['date']
+        if day < self._daily_cutoff():
+            return
+
+        entry = self.state['daily'].setdefault(day, [0, 0, 0, 0])
+        entry[0] += record['distance']
+        entry[1] += record['duration']
+        if record['avg_hr']:
+            entry[2] += record['duration'] * record['avg_hr']
+        else:
+            entry[3] += record['duration']
+
+    def _trim_daily(self):
+        """最后训练日期推后时，丢掉移出窗口的每日负荷（最多 LOAD_WINDOW_DAYS 项）"""
+        daily = self.state['daily']
+        cutoff = self._daily_cutoff()
+        for old in [d for d in daily if d < cutoff]:
+            del daily[old]
+
+    def summary(self):
+        """总体统计，格式与 RunLog.summary() 相同"""
+        overall = self.state['overall']
+        count = overall['count']
+        if count == 0:
+            return None
+
+        summary = {
+            'count': count,
+            'total_distance': overall['total_distance'],
+            'total_duration': overall['total_duration'],
+            'avg_distance': overall['total_distance'] / count,
+            'avg_duration': overall['total_duration'] / count,
+            'avg_hr': None,
+            'max_hr': None,
+            'weight': None,
+        }
+        if overall['avg_hr_count']:
+            summary['avg_hr'] = overall['avg_hr_sum'] / overall['avg_hr_count']
+            summary['max_hr'] = overall['max_hr']
+        weight = overall['weight']
+        if weight:
+            summary['weight'] = {key: weight[key] for key in ('first', 'latest', 'max', 'min')}
+        return summary
+
+    def monthly_stats(self):
+        """月度统计，格式与 analyze_data() 返回的相同"""
+        return defaultdict(new_month_stats, {month: month_stats_from_dict(stats)
+                                             for month, stats in self.state['monthly'].items()})
+
+    def recent(self):
+        """最近几次记录（按日期升序）"""
+        return self.state['recent']
+
+    def daily_load(self):
+        """最近几周的每日负荷：(首次训练日期, 最后训练日期, {日期: [距离, 时长, 时长×心率, 无心率时长]})"""
+        overall = self.state['overall']
+        return overall['first_date'], overall['last_date'], self.state['daily']
+
+    def mean_hr(self):
+        """全部记录的平均心率，没有心率数据时为 None"""
+        overall = self.state['overall']
+        if not overall['avg_hr_count']:
+            return None
+        return overall['avg_hr_sum'] / overall['avg_hr_count']
+
+    def diagnostics(self):
+        """上次完整解析时的解析诊断：[(文件, 行号, 行, 错误)]"""
+        return self.state['diagnostics']
@@ -5,161 +5,292 @@
 读取所有跑步记录，生成统计分析报告
 """
 
+import argparse
 import os
-from collections import defaultdict
+import re
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
 
-def parse_markdown_table(file_path):
+from aggregates import (AggregateState, accumulate_record, default_state_path, list_month_files,
+                        merge_month_stats, month_file_signatures, new_month_stats, record_in_range)
+from best_efforts import load_or_sync, print_best_efforts
+from parse_cache import ParseCache, default_cache_dir
+from profiling import PROFILER, add_profile_arguments
+from runlog import RunLog
+from training_load import compute_training_load, print_training_load, training_load_from_state
+
+# 表格行：| 单元格 | 单元格 | ... |，一次切分出去掉首尾空白的单元格
+ROW_PATTERN = re.compile(r'^\s*\|(.*)\|\s*$')
+CELL_SPLIT = re.compile(r'\s*\|\s*')
+
+# 解析失败的行，代替直接 print，由调用方决定如何展示
+ParseDiagnostic = namedtuple('ParseDiagnostic', ['file', 'line_no', 'line', 'error'])
+
+def _optional(value, convert):
+    """缺失值（空或 -）返回 None"""
+    return convert(value) if value and value != '-' else None
+
+def _parse_date(value):
+    """日期单元格转为 YYYY-MM-DD，无法解析时抛出 ValueError"""
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"日期无效: {value}") from None
+
+def iter_markdown_table(file_path, diagnostics=None):
+    """逐行读取Markdown表格，逐条产出跑步记录
+
+    解析失败的行以 ParseDiagnostic 追加到 diagnostics（传入列表时）
+    """
+    in_table = False
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if line.startswith('| 日期'):
+                in_table = True
+                continue
+            if not in_table:
+                continue
+            if line.startswith('|---'):
+                continue
+
+            match = ROW_PATTERN.match(line)
+            if not match:
+                in_table = False
+                continue
+
+            parts = CELL_SPLIT.split(match.group(1).strip())
+            if not parts[0] or parts[0] == '日期':
+                continue
+            # 未跑步占位行（距离为 -）不是错误
+            if len(parts) > 1 and parts[1] == '-':
+                continue
+
+            try:
+                yield {
+                    'date': _parse_date(parts[0]),
+                    'distance': float(parts[1]),
+                    'duration': float(parts[2]),  # 改为float支持小数
+                    'pace': parts[3],
+                    'avg_hr': _optional(parts[4], int),
+                    'max_hr': _optional(parts[5], int),
+                    'weight': _optional(parts[6], float),
+                    'venue': parts[7],  # 改为venue（场地）
+                    'feeling': _optional(parts[8], int),
+                    'note': parts[9] if len(parts) > 9 else ''
+                }
+            except (ValueError, IndexError) as e:
+                if diagnostics is not None:
+                    diagnostics.append(ParseDiagnostic(file_path, line_no, line.rstrip('\n'), str(e)))
+
+def parse_markdown_table(file_path, diagnostics=None):
     """解析Markdown表格中的跑步数据"""
+    return list(iter_markdown_table(file_path, diagnostics))
+
+def print_diagnostics(diagnostics):
+    """打印解析失败的行"""
+    for d in diagnostics:
+        print(f"解析失败: {d.file}:{d.line_no}: {d.line}")
+        print(f"错误: {d.error}")
+
+def load_month_file(file_path):
+    """解析月度文件，边读边统计，返回记录、该文件的月度统计和解析诊断"""
     records = []
+    stats = new_month_stats()
+    diagnostics = []
+    with PROFILER.stage('parse_markdown_table', file=os.path.basename(file_path),
+                        bytes=os.path.getsize(file_path)):
+        for record in iter_markdown_table(file_path, diagnostics):
+            records.append(record)
+            accumulate_record(stats, record)
+        PROFILER.count(records=len(records))
+    return records, stats, diagnostics
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+def _load_month_file_worker(cache_root, file_path):
+    """子进程中解析单个月度文件，返回解析结果、缓存命中数和剖析记录"""
+    PROFILER.reset()
+    if cache_root is None:
+        return load_month_file(file_path), 0, 0, PROFILER.collect()
+    cache = ParseCache(cache_root)
+    payload = cache.load(file_path, load_month_file)
+    return payload, cache.hits, cache.misses, PROFILER.collect()
 
-    # 查找表格内容
-    lines = content.split('\n')
-    in_table = False
+def _load_month_files(month_files, cache, jobs):
+    """依次产出每个文件的解析结果；jobs > 1 时用进程池并行解析，结果仍按文件顺序返回"""
+    if jobs <= 1 or len(month_files) <= 1:
+        for _, file_path in month_files:
+            if cache is not None:
+                yield cache.load(file_path, load_month_file)
+            else:
+                yield load_month_file(file_path)
+        return
 
-    for line in lines:
-        if line.startswith('| 日期'):
-            in_table = True
-            continue
-        if in_table and line.startswith('|---'):
-            continue
-        if in_table and line.startswith('|'):
-            # 解析数据行
-            parts = [p.strip() for p in line.split('|')[1:-1]]
-            if len(parts) >= 9 and parts[0] and parts[0] != '日期':
-                try:
-                    record = {
-                        'date': parts[0],
-                        'distance': float(parts[1]),
-                        'duration': float(parts[2]),  # 改为float支持小数
-                        'pace': parts[3],
-                        'avg_hr': int(parts[4]) if parts[4] and parts[4] != '-' else None,
-                        'max_hr': int(parts[5]) if parts[5] and parts[5] != '-' else None,
-                        'weight': float(parts[6]) if parts[6] and parts[6] != '-' else None,
-                        'venue': parts[7],  # 改为venue（场地）
-                        'feeling': int(parts[8]) if parts[8] and parts[8] != '-' else None,
-                        'note': parts[9] if len(parts) > 9 else ''
-                    }
-                    records.append(record)
-                except (ValueError, IndexError) as e:
-                    # 调试：打印解析失败的行
-                    print(f"解析失败: {line}")
-                    print(f"错误: {e}")
-                    continue
-        elif in_table and not line.strip().startswith('|'):
-            in_table = False
+    cache_root = cache.root if cache is not None else None
+    paths = [file_path for _, file_path in month_files]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for payload, hits, misses, nodes in executor.map(_load_month_file_worker,
+                                                         [cache_root] * len(paths), paths):
+            if cache is not None:
+                cache.hits += hits
+                cache.misses += misses
+            PROFILER.attach(nodes, worker=True)
+            yield payload
 
-    return records
+def analyze_data(data_dir='data', cache=None, diagnostics=None, jobs=1, since=None, until=None):
+    """分析所有跑步数据
 
-def analyze_data(data_dir='data'):
-    """分析所有跑步数据"""
+    cache 为 ParseCache 时，未变化的月度文件直接使用缓存的解析结果；
+    diagnostics 为列表时收集解析失败的行；
+    jobs > 1 时并行解析月度文件，合并结果与顺序执行完全一致；
+    since/until（YYYY-MM-DD，含两端）只读取范围内的月度文件，只有首尾两个月需要逐行筛选
+    """
     all_records = []
-    monthly_stats = defaultdict(lambda: {
-        'total_distance': 0,
-        'total_duration': 0,
-        'count': 0,
-        'avg_hr_sum': 0,
-        'avg_hr_count': 0,
-        'weights': [],
-        'feelings': []
-    })
-
-    # 遍历所有年份和月份文件
-    for year in os.listdir(data_dir):
-        year_path = os.path.join(data_dir, year)
-        if not os.path.isdir(year_path):
-            continue
-
-        for month_file in os.listdir(year_path):
-            if not month_file.endswith('.md'):
-                continue
+    monthly_stats = defaultdict(new_month_stats)
+    boundary_months = {d[:7] for d in (since, until) if d}
 
-            file_path = os.path.join(year_path, month_file)
-            records = parse_markdown_table(file_path)
+    # 遍历范围内的年份和月份文件
+    with PROFILER.stage('scan'):
+        month_files = list_month_files(data_dir, since, until)
+        PROFILER.count(files=len(month_files))
+
+    with PROFILER.stage('ingest', jobs=jobs):
+        loaded = _load_month_files(month_files, cache, jobs)
+        for (month_key, _), (records, file_stats, file_diagnostics) in zip(month_files, loaded):
+            if month_key in boundary_months:
+                # 首尾月份只保留范围内的记录，重新统计该月
+                records = [r for r in records if record_in_range(r, since, until)]
+                if not records:
+                    continue
+                file_stats = new_month_stats()
+                for record in records:
+                    accumulate_record(file_stats, record)
             all_records.extend(records)
+            if diagnostics is not None:
+                diagnostics.extend(file_diagnostics)
 
             # 统计月度数据
-            month_key = f"{year}-{month_file[:2]}"
-            for record in records:
-                monthly_stats[month_key]['total_distance'] += record['distance']
-                monthly_stats[month_key]['total_duration'] += record['duration']
-                monthly_stats[month_key]['count'] += 1
+            with PROFILER.stage('aggregate', merge=True, records=len(records)):
+                merge_month_stats(monthly_stats[month_key], file_stats)
+        PROFILER.count(records=len(all_records))
+        if cache is not None:
+            PROFILER.count(cache_hits=cache.hits, cache_misses=cache.misses)
 
-                if record['avg_hr']:
-                    monthly_stats[month_key]['avg_hr_sum'] += record['avg_hr']
-                    monthly_stats[month_key]['avg_hr_count'] += 1
+    # 按日期排序（稳定排序，同一天的记录保持文件中的顺序）
+    with PROFILER.stage('sort', records=len(all_records)):
+        all_records.sort(key=lambda r: r['date'])
 
-                if record['weight']:
-                    monthly_stats[month_key]['weights'].append(record['weight'])
+    return all_records, monthly_stats
 
-                if record['feeling']:
-                    monthly_stats[month_key]['feelings'].append(record['feeling'])
+def add_common_arguments(parser):
+    """各脚本共用的命令行参数"""
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='并行解析月度文件的进程数（默认1，顺序解析）')
+    add_profile_arguments(parser)
 
-    return all_records, monthly_stats
+def add_date_range_arguments(parser):
+    """只分析一段时间的命令行参数"""
+    parser.add_argument('--since', help='起始日期 YYYY-MM-DD（含）')
+    parser.add_argument('--until', help='结束日期 YYYY-MM-DD（含）')
+    parser.add_argument('--days', type=int, default=None,
+                        help='只分析最近 N 天（含今天），与 --since 二选一')
+
+def date_range(parser, args):
+    """由命令行参数得到 (since, until)，不限时为 None；日期格式错误时退出"""
+    if args.days is not None:
+        if args.since:
+            parser.error('--days 和 --since 不能同时使用')
+        if args.days <= 0:
+            parser.error('--days 必须大于 0')
+        args.since = str(date.today() - timedelta(days=args.days - 1))
+    for name in ('since', 'until'):
+        value = getattr(args, name)
+        if value:
+            try:
+                setattr(args, name, date.fromisoformat(value).isoformat())
+            except ValueError:
+                parser.error(f'--{name} 的日期格式应为 YYYY-MM-DD: {value}')
+    if args.since and args.until and args.since > args.until:
+        parser.error('--since 不能晚于 --until')
+    return args.since, args.until
 
-def print_report(all_records, monthly_stats):
+def print_date_range(since, until):
+    """打印统计范围"""
+    if since or until:
+        print(f"统计范围: {since or '最早'} ~ {until or '最新'}")
+
+def print_report(runlog, monthly_stats, bests=None):
     """打印分析报告"""
+    recent = [runlog.record(i) for i in range(max(len(runlog) - 5, 0), len(runlog))]
+    print_summary_report(runlog.summary(), monthly_stats, compute_training_load(runlog), recent,
+                         bests)
+
+def print_summary_report(summary, monthly_stats, load, recent, bests=None):
+    """按汇总结果打印分析报告
+
+    summary 为 RunLog.summary() 格式的总体统计，load 为训练负荷，recent 为按日期升序的最近记录；
+    既可以来自完整解析，也可以来自增量汇总状态；bests 为个人最佳索引（可省略）
+    """
     print("=" * 60)
     print("跑步数据分析报告")
     print("=" * 60)
     print()
 
     # 总体统计
-    if all_records:
-        total_distance = sum(r['distance'] for r in all_records)
-        total_duration = sum(r['duration'] for r in all_records)
-        total_count = len(all_records)
-        avg_distance = total_distance / total_count
-        avg_duration = total_duration / total_count
+    if summary:
+        total_duration = summary['total_duration']
 
         print("【总体统计】")
-        print(f"总跑步次数: {total_count} 次")
-        print(f"总跑步距离: {total_distance:.2f} 公里")
+        print(f"总跑步次数: {summary['count']} 次")
+        print(f"总跑步距离: {summary['total_distance']:.2f} 公里")
         print(f"总跑步时长: {total_duration:.0f} 分钟 ({total_duration/60:.1f} 小时)")
-        print(f"平均每次距离: {avg_distance:.2f} 公里")
-        print(f"平均每次时长: {avg_duration:.0f} 分钟")
+        print(f"平均每次距离: {summary['avg_distance']:.2f} 公里")
+        print(f"平均每次时长: {summary['avg_duration']:.0f} 分钟")
         print()
 
         # 心率统计
-        hr_records = [r for r in all_records if r['avg_hr']]
-        if hr_records:
-            avg_hr = sum(r['avg_hr'] for r in hr_records) / len(hr_records)
-            max_hr = max(r['max_hr'] for r in hr_records if r['max_hr'])
-            print(f"平均心率: {avg_hr:.0f} bpm")
-            print(f"最高心率: {max_hr} bpm")
+        if summary['avg_hr'] is not None:
+            print(f"平均心率: {summary['avg_hr']:.0f} bpm")
+            print(f"最高心率: {summary['max_hr']} bpm")
             print()
 
         # 体重统计
-        weight_records = [r for r in all_records if r['weight']]
-        if weight_records:
-            weights = [r['weight'] for r in weight_records]
-            print(f"最新体重: {weights[-1]:.1f} kg")
-            print(f"最高体重: {max(weights):.1f} kg")
-            print(f"最低体重: {min(weights):.1f} kg")
-            print(f"体重变化: {weights[-1] - weights[0]:+.1f} kg")
+        weight = summary['weight']
+        if weight:
+            print(f"最新体重: {weight['latest']:.1f} kg")
+            print(f"最高体重: {weight['max']:.1f} kg")
+            print(f"最低体重: {weight['min']:.1f} kg")
+            print(f"体重变化: {weight['latest'] - weight['first']:+.1f} kg")
             print()
 
     # 月度统计
     if monthly_stats:
         print("【月度统计】")
-        print(f"{'月份':<12} {'次数':>6} {'总距离(km)':>12} {'平均心率':>10} {'平均感受':>10}")
-        print("-" * 60)
+        print(f"{'月份':<12} {'次数':>6} {'总距离(km)':>12} {'平均心率':>10} {'心率中位数':>10} "
+              f"{'P90心率':>8} {'平均感受':>10}")
+        print("-" * 74)
 
         for month in sorted(monthly_stats.keys()):
             stats = monthly_stats[month]
-            avg_hr = stats['avg_hr_sum'] / stats['avg_hr_count'] if stats['avg_hr_count'] > 0 else 0
-            avg_feeling = sum(stats['feelings']) / len(stats['feelings']) if stats['feelings'] else 0
+            avg_hr = stats['hr'].mean() or 0
+            median_hr = stats['hr_quantiles'].median() or 0
+            p90_hr = stats['hr_quantiles'].quantile(0.9) or 0
+            avg_feeling = stats['feeling'].mean() or 0
 
             print(f"{month:<12} {stats['count']:>6} {stats['total_distance']:>12.2f} "
-                  f"{avg_hr:>10.0f} {avg_feeling:>10.1f}")
+                  f"{avg_hr:>10.0f} {median_hr:>10.0f} {p90_hr:>8.0f} {avg_feeling:>10.1f}")
         print()
 
+    # 训练负荷（7/28 天滚动）
+    print_training_load(load)
+
+    # 个人最佳
+    if bests is not None:
+        print_best_efforts(bests)
+
     # 最近5次记录
-    if all_records:
+    if recent:
         print("【最近5次跑步】")
-        recent = all_records[-5:]
         for r in reversed(recent):
             print(f"{r['date']}: {r['distance']}km, {r['pace']}, "
                   f"心率{r['avg_hr'] or '-'}bpm, 感受{r['feeling'] or '-'}/10")
@@ -167,8 +298,23 @@ def print_report(all_records, monthly_stats):
 
     print("=" * 60)
 
+def sync_best_efforts(data_dir, cache, sources):
+    """读取个人最佳索引，只重新索引有变化的月度文件（记录来自解析缓存）"""
+    with PROFILER.stage('best_efforts'):
+        bests, _ = load_or_sync(data_dir, lambda path: cache.load(path, load_month_file)[0],
+                                sources)
+    return bests
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='跑步数据分析')
+    add_common_arguments(parser)
+    add_date_range_arguments(parser)
+    parser.add_argument('--full', action='store_true',
+                        help='忽略增量汇总状态，重新读取全部月度文件')
+    args = parser.parse_args()
+    since, until = date_range(parser, args)
+
     script_dir = os.path.dirname(os.path.abspath(__file__))
     project_dir = os.path.dirname(script_dir)
     data_dir = os.path.join(project_dir, 'data')
@@ -177,13 +323,52 @@ def main():
         print("错误: 找不到data目录")
         return
 
-    all_records, monthly_stats = analyze_data(data_dir)
+    PROFILER.configure(args, 'analyze', os.path.join(default_cache_dir(data_dir), 'profile'))
+
+    # 月度文件都没有被其他方式修改过时，直接使用 quick_log.py 增量维护的汇总状态；
+    # 指定日期范围时只读取范围内的月度文件，汇总状态是全部数据的，不检查也不更新
+    state_path = default_state_path(data_dir)
+    ranged = bool(since or until)
+    aggregate = None
+    if not ranged:
+        with PROFILER.stage('check_aggregates'):
+            sources = month_file_signatures(data_dir)
+            aggregate = None if args.full else AggregateState.load(state_path)
+    if aggregate is not None and aggregate.is_current(sources):
+        print_diagnostics([ParseDiagnostic(*d) for d in aggregate.diagnostics()])
+        print(f"使用增量汇总（{len(sources)} 个文件均未变化，未重新解析）")
+        if not aggregate.summary():
+            print("暂无跑步记录数据")
+            return
+        bests = sync_best_efforts(data_dir, ParseCache.for_data_dir(data_dir), sources)
+        with PROFILER.stage('print_report'):
+            print_summary_report(aggregate.summary(), aggregate.monthly_stats(),
+                                 training_load_from_state(aggregate), aggregate.recent(), bests)
+        return
+
+    cache = ParseCache.for_data_dir(data_dir)
+    diagnostics = []
+    all_records, monthly_stats = analyze_data(data_dir, cache=cache, diagnostics=diagnostics,
+                                              jobs=args.jobs, since=since, until=until)
+    print_diagnostics(diagnostics)
+    print(cache.report())
+    # 个人最佳是全部数据的，指定日期范围时不显示
+    bests = None
+    if ranged:
+        print_date_range(since, until)
+    else:
+        with PROFILER.stage('save_aggregates'):
+            AggregateState.build(all_records, monthly_stats, sources, diagnostics).save(state_path)
+        bests = sync_best_efforts(data_dir, cache, sources)
 
     if not all_records:
         print("暂无跑步记录数据")
         return
 
-    print_report(all_records, monthly_stats)
+    with PROFILER.stage('build_runlog', records=len(all_records)):
+        runlog = RunLog.from_records(all_records)
+    with PROFILER.stage('print_report'):
+        print_report(runlog, monthly_stats, bests)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多运动员批量分析
+对多个数据目录（每名运动员一个）并发执行解析、统计报告和图表生成，
+每名运动员输出到独立目录，并汇总为一个 JSON；单个目录出错或超时不影响其他运动员
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from parse_cache import ParseCache
+from analyze import analyze_data, print_report
+from runlog import RunLog
+
+
+def resolve_data_root(root):
+    """把命令行给出的目录解析为 (运动员名, data目录)
+
+    支持三种写法：运动员根目录（包含 data/）、data 目录本身、直接存放年份目录的目录
+    """
+    root = os.path.abspath(root.rstrip(os.sep))
+    if os.path.isdir(os.path.join(root, 'data')):
+        return os.path.basename(root), os.path.join(root, 'data')
+    if os.path.basename(root) == 'data':
+        return os.path.basename(os.path.dirname(root)), root
+    return os.path.basename(root), root
+
+
+def expand_roots(patterns):
+    """展开通配符，返回去重后的 [(运动员名, data目录)]，重名时追加序号"""
+    athletes = []
+    seen_dirs = set()
+    names = {}
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for root in matches:
+            if not os.path.isdir(root):
+                print(f"⚠️  跳过不存在的目录: {root}")
+                continue
+            name, data_dir = resolve_data_root(root)
+            if data_dir in seen_dirs:
+                continue
+            seen_dirs.add(data_dir)
+            names[name] = names.get(name, 0) + 1
+            if names[name] > 1:
+                name = f"{name}-{names[name]}"
+            athletes.append((name, data_dir))
+    return athletes
+
+
+def _rounded(value, digits):
+    """保留几位小数，None 保持不变"""
+    return round(value, digits) if value is not None else None
+
+
+def monthly_rows(monthly_stats):
+    """月度统计（与 print_report 的月度统计一致）"""
+    rows = []
+    for month in sorted(monthly_stats.keys()):
+        stats = monthly_stats[month]
+        rows.append({
+            'month': month,
+            'count': stats['count'],
+            'total_distance': round(stats['total_distance'], 2),
+            'avg_hr': stats['hr'].mean(),
+            'median_hr': stats['hr_quantiles'].median(),
+            'p90_hr': stats['hr_quantiles'].quantile(0.9),
+            'avg_feeling': stats['feeling'].mean(),
+            'avg_weight': _rounded(stats['weight'].mean(), 2),
+            'weight_change': _rounded(stats['weight_trend'].change(), 1),
+        })
+    return rows
+
+
+def process_athlete(name, data_dir, output_dir, plots):
+    """处理单名运动员：解析、写出报告和统计、生成图表，结果写到 output_dir/summary.json"""
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    result = {'name': name, 'data_dir': data_dir, 'output_dir': output_dir}
+
+    try:
+        cache = ParseCache.for_data_dir(data_dir)
+        diagnostics = []
+        all_records, monthly_stats = analyze_data(data_dir, cache=cache, diagnostics=diagnostics)
+        runlog = RunLog.from_records(all_records)
+
+        report = io.StringIO()
+        with contextlib.redirect_stdout(report):
+            print_report(runlog, monthly_stats)
+        with open(os.path.join(output_dir, 'report.txt'), 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+
+        charts = []
+        if plots and len(runlog):
+            from visualize import render_charts
+            with contextlib.redirect_stdout(io.StringIO()):
+                # 渲染状态与图表放在一起：多名运动员的年份目录可能在同一个父目录下，共用 .cache/
+                charts = render_charts(runlog, monthly_stats, output_dir,
+                                       os.path.join(output_dir, '.charts.json'), jobs=1)
+
+        result.update({
+            'status': 'ok',
+            'records': len(runlog),
+            'diagnostics': len(diagnostics),
+            'overall': runlog.summary(),
+            'monthly': monthly_rows(monthly_stats),
+            'charts_rendered': charts,
+        })
+    except Exception as e:
+        result.update({'status': 'error', 'error': f"{type(e).__name__}: {e}",
+                       'traceback': traceback.format_exc()})
+
+    result['elapsed_s'] = round(time.perf_counter() - started, 3)
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+def _read_result(name, data_dir, output_dir):
+    """读取子进程写出的结果"""
+    try:
+        with open(os.path.join(output_dir, 'summary.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'name': name, 'data_dir': data_dir, 'output_dir': output_dir,
+                'status': 'error', 'error': '进程异常退出，未写出结果'}
+
+
+def run_batch(athletes, output_root, jobs, plots=True, timeout=None):
+    """并发处理所有运动员，最多同时运行 jobs 个进程，返回各运动员结果（保持输入顺序）"""
+    ctx = multiprocessing.get_context()
+    pending = list(athletes)
+    running = {}
+    results = {}
+
+    while pending or running:
+        while pending and len(running) < jobs:
+            name, data_dir = pending.pop(0)
+            output_dir = os.path.join(output_root, name)
+            # 清掉上一次的结果，避免进程崩溃时读到旧数据
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(output_dir, 'summary.json'))
+            process = ctx.Process(target=process_athlete, args=(name, data_dir, output_dir, plots))
+            process.start()
+            running[name] = (process, data_dir, output_dir, time.monotonic())
+
+        time.sleep(0.05)
+        for name, (process, data_dir, output_dir, started) in list(running.items()):
+            if process.is_alive():
+                if timeout and time.monotonic() - started > timeout:
+                    process.terminate()
+                    process.join()
+                    results[name] = {'name': name, 'data_dir': data_dir, 'output_dir': output_dir,
+                                     'status': 'timeout', 'error': f'超过 {timeout} 秒未完成'}
+                    del running[name]
+                    print(f"⏱  {name}: 超时")
+                continue
+
+            process.join()
+            results[name] = _read_result(name, data_dir, output_dir)
+            del running[name]
+            status = results[name]['status']
+            if status == 'ok':
+                print(f"✓ {name}: {results[name]['records']} 条记录")
+            else:
+                print(f"❌ {name}: {results[name]['error']}")
+
+    return [results[name] for name, _ in athletes]
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='多运动员批量分析')
+    parser.add_argument('roots', nargs='+', help='运动员数据目录，可使用通配符，例如 "club/*"')
+    parser.add_argument('--output', default=None, help='输出目录（默认 output/batch）')
+    parser.add_argument('--jobs', type=int, default=min(os.cpu_count() or 1, 4),
+                        help='同时处理的运动员数')
+    parser.add_argument('--timeout', type=float, default=None, help='单名运动员的超时时间（秒）')
+    parser.add_argument('--no-plots', action='store_true', help='不生成图表')
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(script_dir)
+    output_root = args.output or os.path.join(project_dir, 'output', 'batch')
+
+    athletes = expand_roots(args.roots)
+    if not athletes:
+        print("错误: 没有找到任何数据目录")
+        sys.exit(1)
+
+    print(f"共 {len(athletes)} 名运动员，并发数 {args.jobs}\n")
+    started = time.perf_counter()
+    results = run_batch(athletes, output_root, max(args.jobs, 1), not args.no_plots, args.timeout)
+
+    combined = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'elapsed_s': round(time.perf_counter() - started, 3),
+        'athletes': [{k: v for k, v in r.items() if k != 'traceback'} for r in results],
+    }
+    os.makedirs(output_root, exist_ok=True)
+    summary_path = os.path.join(output_root, 'summary.json')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(combined, f, ensure_ascii=False, indent=2)
+
+    failed = [r for r in results if r['status'] != 'ok']
+    print(f"\n完成 {len(results) - len(failed)}/{len(results)}，汇总: {summary_path}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试
+在合成数据上测量解析、汇总、报告、绘图、体重关联分析各阶段的耗时、峰值内存和吞吐量，
+结果保存为 JSON，并与基线比较，发现性能退化时返回非零退出码
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import queue as queue_module
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# 阶段名 -> 说明
+STAGES = {
+    'parse_markdown_table': '逐个解析月度文件',
+    'analyze_data': '解析并汇总（无缓存）',
+    'analyze_data_cached': '解析并汇总（缓存命中）',
+    'print_report': '生成文字报告',
+    'plot_charts': '生成全部 plot_* 图表',
+    'analyze_weight_correlation': '体重-心率-配速关联分析',
+}
+
+# 默认只跑不画图的阶段，--plots 时加上绘图
+DEFAULT_STAGES = [s for s in STAGES if s != 'plot_charts']
+
+
+def find_data_dirs(root):
+    """找出 root 下所有运动员的 data 目录（root/data 或 root/*/data）"""
+    if os.path.isdir(os.path.join(root, 'data')):
+        return [os.path.join(root, 'data')]
+    return sorted(os.path.join(root, name, 'data') for name in os.listdir(root)
+                  if os.path.isdir(os.path.join(root, name, 'data')))
+
+
+def _peak_rss_mb():
+    """当前进程的峰值常驻内存（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_stage(stage, data_dirs, queue):
+    """在独立子进程中执行一个阶段，准备工作不计时"""
+    from analyze import analyze_data, list_month_files, parse_markdown_table, print_report
+    from parse_cache import ParseCache
+    from runlog import RunLog
+
+    month_files = [path for d in data_dirs for _, path in list_month_files(d)]
+    total_bytes = sum(os.path.getsize(path) for path in month_files)
+
+    # 准备阶段输入
+    prepared = []
+    if stage in ('print_report', 'plot_charts', 'analyze_weight_correlation'):
+        for data_dir in data_dirs:
+            records, monthly_stats = analyze_data(data_dir)
+            prepared.append((RunLog.from_records(records), monthly_stats))
+    caches = []
+    if stage == 'analyze_data_cached':
+        cache_root = tempfile.mkdtemp(prefix='bench-cache-')
+        caches = [ParseCache(os.path.join(cache_root, str(i))) for i in range(len(data_dirs))]
+        for data_dir, cache in zip(data_dirs, caches):
+            analyze_data(data_dir, cache=cache)
+
+    records = 0
+    start = time.perf_counter()
+    if stage == 'parse_markdown_table':
+        for path in month_files:
+            records += len(parse_markdown_table(path))
+    elif stage == 'analyze_data':
+        for data_dir in data_dirs:
+            records += len(analyze_data(data_dir)[0])
+    elif stage == 'analyze_data_cached':
+        for data_dir, cache in zip(data_dirs, caches):
+            records += len(analyze_data(data_dir, cache=cache)[0])
+    elif stage == 'print_report':
+        with contextlib.redirect_stdout(io.StringIO()):
+            for runlog, monthly_stats in prepared:
+                print_report(runlog, monthly_stats)
+                records += len(runlog)
+    elif stage == 'plot_charts':
+        import visualize
+        output_dir = tempfile.mkdtemp(prefix='bench-output-')
+        with contextlib.redirect_stdout(io.StringIO()):
+            for runlog, monthly_stats in prepared:
+                for filename, (plot, source, _) in visualize.CHARTS.items():
+                    plot(runlog if source == 'runlog' else monthly_stats, output_dir)
+                records += len(runlog)
+    elif stage == 'analyze_weight_correlation':
+        from weight_analysis import analyze_weight_correlation
+        with contextlib.redirect_stdout(io.StringIO()):
+            for runlog, _ in prepared:
+                analyze_weight_correlation(runlog)
+                records += len(runlog)
+    wall = time.perf_counter() - start
+
+    queue.put({
+        'wall_s': wall,
+        'peak_rss_mb': _peak_rss_mb(),
+        'records': records,
+        'bytes': total_bytes,
+        'records_per_s': records / wall if wall > 0 else None,
+    })
+
+
+def run_stage(stage, data_dirs):
+    """在新进程中运行阶段，使峰值内存互不影响
+
+    子进程异常退出（出错、被 OOM killer 结束、段错误）时不会等待下去，返回 {'error': 说明}
+    """
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_stage, args=(stage, data_dirs, queue))
+    process.start()
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=1)
+        except queue_module.Empty:
+            if process.is_alive():
+                continue
+            # 子进程已退出：结果可能刚写入队列，再取一次
+            try:
+                result = queue.get(timeout=1)
+            except queue_module.Empty:
+                result = {'error': f"子进程异常退出（退出码 {process.exitcode}）"}
+    process.join()
+    return result
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """与基线比较，返回退化项列表"""
+    regressions = []
+    for stage, current in results['stages'].items():
+        base = baseline.get('stages', {}).get(stage)
+        if not base or 'error' in base or 'error' in current:
+            continue
+        for metric in ('wall_s', 'peak_rss_mb'):
+            if base[metric] and current[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{stage}.{metric}: {base[metric]:.3f} → {current[metric]:.3f} "
+                                   f"(+{(current[metric] / base[metric] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='跑步数据脚本基准测试')
+    parser.add_argument('--root', help='已有的数据根目录（包含 data/ 或 */data/），默认临时生成')
+    parser.add_argument('--runs', type=int, default=10000, help='生成数据时每名运动员的训练次数')
+    parser.add_argument('--athletes', type=int, default=1, help='生成数据时的运动员数量')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), help='只运行指定阶段')
+    parser.add_argument('--plots', action='store_true', help='包含绘图阶段（较慢）')
+    parser.add_argument('--output', help='结果 JSON 输出路径')
+    parser.add_argument('--baseline', help='基线 JSON 路径')
+    parser.add_argument('--update-baseline', action='store_true', help='把本次结果写为基线')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='判定退化的相对阈值（默认0.2，即慢20%%）')
+    args = parser.parse_args()
+
+    root = args.root
+    if root is None:
+        from gen_synthetic import generate
+        root = tempfile.mkdtemp(prefix='bench-data-')
+        print(f"正在生成合成数据: {args.athletes} 名运动员 × {args.runs} 条记录 → {root}")
+        generate(root, args.runs, args.athletes)
+
+    data_dirs = find_data_dirs(root)
+    if not data_dirs:
+        print(f"错误: {root} 下找不到data目录")
+        sys.exit(1)
+
+    stages = args.stages or DEFAULT_STAGES + (['plot_charts'] if args.plots else [])
+    results = {
+        'meta': {
+            'root': os.path.abspath(root),
+            'athletes': len(data_dirs),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'stages': {},
+    }
+
+    print(f"\n{'阶段':<28} {'耗时(s)':>10} {'峰值内存(MB)':>14} {'记录数':>10} {'记录/秒':>12}")
+    print("-" * 80)
+    failed = []
+    for stage in stages:
+        r = run_stage(stage, data_dirs)
+        results['stages'][stage] = r
+        if 'error' in r:
+            failed.append(stage)
+            print(f"{stage:<28} ❌ {r['error']}")
+            continue
+        rate = f"{r['records_per_s']:.0f}" if r['records_per_s'] else '-'
+        print(f"{stage:<28} {r['wall_s']:>10.3f} {r['peak_rss_mb']:>14.1f} "
+              f"{r['records']:>10} {rate:>12}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.output}")
+
+    # 有阶段失败时不与基线比较，也不写入基线
+    if failed:
+        print(f"\n❌ {len(failed)} 个阶段失败: {', '.join(failed)}")
+        sys.exit(1)
+
+    if not args.baseline:
+        return
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基线已更新: {args.baseline}")
+        return
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ 相对基线退化超过 {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\n✅ 未发现超过 {args.threshold:.0%} 的退化")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+个人最佳索引
+按 指标 × 距离段 × 场地 分桶、各桶按成绩排好序的索引，保存在 .cache/best_efforts.json：
+最佳成绩 O(1)，某个成绩的排名 O(log n)；quick_log.py 录入时用 bisect.insort 逐条插入，
+月度文件被手动修改时只重新索引该文件的记录
+距离段按“不少于”划分（10km+ 包括半马、全马），每次训练按整次的平均配速、平均心率计
+"""
+
+import argparse
+import bisect
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from aggregates import format_pace, month_file_signatures, pace_to_seconds
+from parse_cache import default_cache_dir
+
+INDEX_VERSION = 2
+
+# 距离段：(名称, 最短距离 km)
+DISTANCE_BANDS = (
+    ('3km+', 3),
+    ('5km+', 5),
+    ('10km+', 10),
+    ('半马+', 21.0975),
+    ('全马+', 42.195),
+)
+
+# 所有场地、所有距离合在一起的桶
+ALL_VENUES = '全部'
+ALL_BANDS = '全部'
+
+# 指标：名称 -> (说明, 排序值)，排序值越小成绩越好
+METRICS = {
+    'pace': ('最快配速', lambda run: run[2]),
+    'hr': ('最低心率', lambda run: run[3]),
+    'distance': ('最长距离', lambda run: -run[1]),
+}
+
+# 桶条目中缺失的配速、心率：同分同日同距离时要比较到这两项，不能与数字比较的 None 换成 -1
+MISSING = -1
+
+# 报告中按场地对比的场地顺序，其他场地排在后面
+VENUE_ORDER = ('跑步机', '户外', '操场')
+
+
+def default_index_path(data_dir):
+    """默认索引文件：.cache/best_efforts.json"""
+    return os.path.join(default_cache_dir(data_dir), 'best_efforts.json')
+
+
+def run_entry(record):
+    """索引中保存的训练：[日期, 距离, 配速秒数或 None, 平均心率或 None, 场地]"""
+    return [record['date'], record['distance'], pace_to_seconds(record['pace']),
+            record['avg_hr'] or None, record['venue'] or '其他']
+
+
+def _bucket_key(metric, band, venue):
+    return f"{metric}|{band}|{venue}"
+
+
+def _bucket_entries(run):
+    """一次训练在各个桶中的条目：[(桶, [排序值, 日期, 距离, 配速, 心率, 场地])]
+
+    条目中缺失的配速、心率为 MISSING，保证任意两个条目都可以比较
+    """
+    day, distance, pace, hr, venue = run
+    bands = [band for band, minimum in DISTANCE_BANDS if distance >= minimum]
+    entries = []
+    for metric, (_, sort_value) in METRICS.items():
+        value = sort_value(run)
+        if value is None:
+            continue
+        entry = [value, day, distance, MISSING if pace is None else pace,
+                 MISSING if hr is None else hr, venue]
+        # 最长距离不分距离段
+        for band in (ALL_BANDS,) if metric == 'distance' else bands:
+            for bucket_venue in (ALL_VENUES, venue):
+                entries.append((_bucket_key(metric, band, bucket_venue), entry))
+    return entries
+
+
+class BestEfforts:
+    """个人最佳索引：每个桶是按 [排序值, 日期, ...] 升序排列的列表，排在最前的就是最佳成绩"""
+
+    def __init__(self, state=None):
+        self.state = state or {
+            'version': INDEX_VERSION,
+            'sources': {},
+            # 月度文件 -> 该文件中的训练，文件被修改时据此从各桶中删除
+            'runs': {},
+            'buckets': {},
+        }
+
+    @classmethod
+    def load(cls, index_path):
+        """读取索引文件，不存在或版本不符时返回 None"""
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get('version') != INDEX_VERSION:
+            return None
+        return cls(state)
+
+    def save(self, index_path):
+        """原子写入索引文件"""
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        tmp_path = index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+
+    def is_current(self, sources):
+        """索引是否与当前的月度文件一致"""
+        return self.state['sources'] == sources
+
+    def add_record(self, record, source, signature=None):
+        """把 source 文件中的一条记录插入各个桶，每个桶 O(log n) 定位"""
+        run = run_entry(record)
+        self.state['runs'].setdefault(source, []).append(run)
+        buckets = self.state['buckets']
+        for key, entry in _bucket_entries(run):
+            bisect.insort(buckets.setdefault(key, []), entry)
+        if signature is not None:
+            self.state['sources'][source] = list(signature)
+
+    def remove_source(self, source):
+        """删除一个月度文件的全部记录"""
+        buckets = self.state['buckets']
+        for run in self.state['runs'].pop(source, []):
+            for key, entry in _bucket_entries(run):
+                bucket = buckets[key]
+                i = bisect.bisect_left(bucket, entry)
+                if i < len(bucket) and bucket[i] == entry:
+                    del bucket[i]
+                if not bucket:
+                    del buckets[key]
+        self.state['sources'].pop(source, None)
+
+    def replace_source(self, source, signature, records):
+        """用 source 文件重新解析的记录替换索引中该文件原有的记录"""
+        self.remove_source(source)
+        self.state['runs'][source] = []
+        for record in records:
+            self.add_record(record, source)
+        self.state['sources'][source] = list(signature)
+
+    def sync(self, data_dir, load_records, sources=None):
+        """只重新索引有变化的月度文件，删除已不存在的文件，返回重新索引和删除的文件数
+
+        load_records(file_path) 返回该文件的记录；sources 为当前的月度文件签名（省略时重新获取）
+        """
+        if sources is None:
+            sources = month_file_signatures(data_dir)
+        if self.is_current(sources):
+            return 0
+        removed = [s for s in self.state['sources'] if s not in sources]
+        for source in removed:
+            self.remove_source(source)
+        changed = len(removed)
+        for source, signature in sources.items():
+            if self.state['sources'].get(source) != signature:
+                self.replace_source(source, signature, load_records(os.path.join(data_dir, source)))
+                changed += 1
+        return changed
+
+    def best(self, metric, band, venue=ALL_VENUES, k=1):
+        """某个桶中最好的 k 个成绩：[{date, distance, pace, avg_hr, venue}]"""
+        bucket = self.state['buckets'].get(_bucket_key(metric, band, venue), [])
+        return [{'date': e[1], 'distance': e[2], 'pace': None if e[3] == MISSING else e[3],
+                 'avg_hr': None if e[4] == MISSING else e[4], 'venue': e[5]}
+                for e in bucket[:k]]
+
+    def rank(self, metric, band, venue, value):
+        """成绩 value（配速秒数、心率或距离）在桶中排第几（1 为最佳，并列时取最好的名次）"""
+        bucket = self.state['buckets'].get(_bucket_key(metric, band, venue), [])
+        sort_value = -value if metric == 'distance' else value
+        return bisect.bisect_left(bucket, [sort_value]) + 1
+
+    def venues(self):
+        """索引中出现过的场地（常用场地在前）"""
+        seen = {run[4] for runs in self.state['runs'].values() for run in runs}
+        return [v for v in VENUE_ORDER if v in seen] + sorted(seen - set(VENUE_ORDER))
+
+    def new_records(self, record):
+        """这条记录（已加入索引）刷新了哪些全部场地的最佳成绩：[(指标说明, 距离段)]"""
+        run = run_entry(record)
+        result = []
+        for key, entry in _bucket_entries(run):
+            metric, band, venue = key.split('|')
+            bucket = self.state['buckets'].get(key)
+            if venue == ALL_VENUES and bucket and bucket[0] == entry and \
+                    (len(bucket) == 1 or bucket[1][0] != entry[0]):
+                result.append((METRICS[metric][0], band))
+        return result
+
+
+def load_or_sync(data_dir, load_records, sources=None, index_path=None):
+    """读取索引并同步有变化的月度文件，有变化时保存，返回 (索引, 重新索引和删除的文件数)"""
+    index_path = index_path or default_index_path(data_dir)
+    index = BestEfforts.load(index_path) or BestEfforts()
+    changed = index.sync(data_dir, load_records, sources)
+    if changed or not os.path.exists(index_path):
+        index.save(index_path)
+    return index, changed
+
+
+def _effort_text(metric, effort):
+    """一项最佳成绩的显示文字"""
+    if effort is None:
+        return '-'
+    value = {'pace': lambda e: format_pace(e['pace']), 'hr': lambda e: f"{e['avg_hr']}bpm",
+             'distance': lambda e: f"{e['distance']}km"}[metric](effort)
+    if metric == 'distance':
+        return f"{value} ({effort['date']} {effort['venue']})"
+    return f"{value} ({effort['date']} {effort['distance']}km {effort['venue']})"
+
+
+def print_best_efforts(index):
+    """打印个人最佳：各距离段的最快配速和最低心率，以及各场地的最快配速"""
+    longest = index.best('distance', ALL_BANDS)
+    if not longest:
+        return
+    bands = [band for band, _ in DISTANCE_BANDS
+             if index.best('pace', band) or index.best('hr', band)]
+
+    print("【个人最佳】")
+    print(f"最长距离: {_effort_text('distance', longest[0])}")
+    for band in bands:
+        pace = index.best('pace', band)
+        hr = index.best('hr', band)
+        print(f"{band} 最快配速: {_effort_text('pace', pace[0] if pace else None)}")
+        print(f"{band} 最低心率: {_effort_text('hr', hr[0] if hr else None)}")
+
+    venues = index.venues()
+    if len(venues) > 1:
+        print("各场地最快配速:")
+        for venue in venues:
+            cells = []
+            for band in bands:
+                best = index.best('pace', band, venue)
+                cells.append(f"{band} {format_pace(best[0]['pace']) if best else '-'}")
+            print(f"  {venue}: " + '  '.join(cells))
+    print()
+
+
+def main():
+    """主函数"""
+    from analyze import load_month_file
+    from parse_cache import ParseCache
+
+    parser = argparse.ArgumentParser(description='个人最佳成绩查询')
+    parser.add_argument('--metric', choices=list(METRICS), default=None,
+                        help='指标：pace 最快配速、hr 最低心率、distance 最长距离（默认显示个人最佳汇总）')
+    parser.add_argument('--band', choices=[band for band, _ in DISTANCE_BANDS], default='5km+',
+                        help='距离段（默认 5km+，最长距离不分距离段）')
+    parser.add_argument('--venue', default=ALL_VENUES, help='场地（默认全部）')
+    parser.add_argument('--top', type=int, default=5, help='显示前几名（默认 5）')
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(script_dir)
+    data_dir = os.path.join(project_dir, 'data')
+
+    if not os.path.exists(data_dir):
+        print("错误: 找不到data目录")
+        return
+
+    cache = ParseCache.for_data_dir(data_dir)
+    index, changed = load_or_sync(data_dir, lambda path: cache.load(path, load_month_file)[0])
+    print(f"个人最佳索引: 更新 {changed} 个文件")
+    print()
+
+    if args.metric is None:
+        print_best_efforts(index)
+        return
+
+    band = ALL_BANDS if args.metric == 'distance' else args.band
+    efforts = index.best(args.metric, band, args.venue, args.top)
+    title = METRICS[args.metric][0]
+    print(f"【{title}】{'' if band == ALL_BANDS else band + ' '}{args.venue}")
+    if not efforts:
+        print("暂无记录")
+    for i, effort in enumerate(efforts, 1):
+        print(f"{i:>2}. {_effort_text(args.metric, effort)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时检查
+用 python -X importtime 测量各脚本冷启动的导入耗时，超过预算或在纯文本路径上导入了 matplotlib 时返回非零退出码
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# 模块 -> 导入耗时预算（毫秒）
+# analyze / weight_analysis 需要 NumPy（RunLog），quick_log 是交互工具，应当几乎零开销
+STARTUP_BUDGETS_MS = {
+    'analyze': 400,
+    'weight_analysis': 400,
+    'quick_log': 60,
+}
+
+# 纯文本路径上不允许出现的重量级模块
+FORBIDDEN_MODULES = ('matplotlib',)
+
+
+def measure_import(module, scripts_dir):
+    """在新进程中导入模块，返回 (总耗时毫秒, 导入的模块名列表)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=scripts_dir, capture_output=True, text=True,
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr}")
+
+    total_us = 0
+    imported = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imported.append(name.strip())
+        # 只累加顶层导入（没有缩进），避免重复计算
+        if not name.startswith('  ', 1):
+            total_us += int(cumulative)
+
+    return total_us / 1000, imported
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='检查脚本冷启动导入耗时')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='预算放大倍数（较慢的机器上使用）')
+    args = parser.parse_args()
+
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    failed = False
+
+    print(f"{'模块':<18} {'导入耗时(ms)':>12} {'预算(ms)':>10}  结果")
+    print("-" * 60)
+    for module, budget in STARTUP_BUDGETS_MS.items():
+        budget *= args.scale
+        elapsed, imported = measure_import(module, scripts_dir)
+        heavy = [m for m in imported if m.split('.')[0] in FORBIDDEN_MODULES]
+
+        status = '✅'
+        if elapsed > budget:
+            status = '❌ 超出预算'
+            failed = True
+        if heavy:
+            status = f'❌ 导入了 {heavy[0]}'
+            failed = True
+        print(f"{module:<18} {elapsed:>12.1f} {budget:>10.0f}  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
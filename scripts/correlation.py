@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量相关分析
+对体重、心率、配速、距离、场地以及滞后的体重一次算出完整的相关系数矩阵，缺失值按两两可用的记录计算；
+自助法（bootstrap）的上千次重抽样合并为一次矩阵乘法，得到相关系数和回归斜率的置信区间
+"""
+
+import warnings
+
+import numpy as np
+
+# 滞后体重：每次训练取 N 天前（最多再往前 N 天）最近一次记录的体重
+LAG_DAYS = (7,)
+
+BOOTSTRAP_SAMPLES = 2000
+
+# 两两可用的记录少于这个数时相关系数记为 nan
+MIN_PAIRS = 3
+
+# 每批重抽样的矩阵元素上限（重抽样次数 × 记录数），控制内存
+CHUNK_ELEMENTS = 4_000_000
+
+
+def lagged_values(dates, values, valid, lag):
+    """每个日期 lag 天前最近一次有效记录的数值，再往前 lag 天内都没有记录时无效
+
+    返回 (数值, 是否有效)
+    """
+    value_dates = dates[valid]
+    value_list = values[valid]
+    if not len(value_dates):
+        return np.zeros(len(dates)), np.zeros(len(dates), dtype=bool)
+    target = dates - np.timedelta64(lag, 'D')
+    position = np.searchsorted(value_dates, target, side='right') - 1
+    found = position >= 0
+    position = np.maximum(position, 0)
+    lagged_valid = found & (value_dates[position] > target - np.timedelta64(lag, 'D'))
+    return value_list[position].astype(np.float64), lagged_valid
+
+
+def feature_columns(runlog, lags=LAG_DAYS):
+    """相关分析用到的列，返回 (列名列表, 数值矩阵 n×k, 有效掩码 n×k)
+
+    场地按是否为该场地的 0/1 列参与计算，最常见的场地作为基准不单独成列
+    """
+    columns = [
+        ('体重', runlog.weight.astype(np.float64), runlog.weight_valid),
+    ]
+    for lag in lags:
+        values, valid = lagged_values(runlog.date, runlog.weight, runlog.weight_valid, lag)
+        columns.append((f'{lag}天前体重', values, valid))
+    columns += [
+        ('心率', runlog.avg_hr.astype(np.float64), runlog.avg_hr_valid),
+        ('配速', runlog.pace.astype(np.float64), runlog.pace_valid),
+        ('距离', runlog.distance.astype(np.float64), np.ones(len(runlog), dtype=bool)),
+    ]
+
+    counts = np.bincount(runlog.venue, minlength=len(runlog.venues))
+    present = np.flatnonzero(counts)
+    if len(present) > 1:
+        reference = present[np.argmax(counts[present])]
+        for code in present:
+            if code != reference:
+                columns.append((f'场地:{runlog.venues[code]}', (runlog.venue == code).astype(np.float64),
+                                np.ones(len(runlog), dtype=bool)))
+
+    names = [name for name, _, _ in columns]
+    values = np.column_stack([v for _, v, _ in columns])
+    valid = np.column_stack([m for _, _, m in columns])
+    return names, values, valid
+
+
+def pair_products(values, valid):
+    """两两配对所需的逐行乘积，返回 (n×(4·k·k) 矩阵, 各列均值)，矩阵各项为 [m_i·m_j, x_i·m_j, x_i²·m_j, x_i·x_j]
+
+    x 先按列中心化（缺失处为 0），减小平方和相减时的舍入误差；
+    矩阵较大（每行 4k² 个 float64，k=8 时 10^6 条记录约 2 GB），只计算一次，同时传给 correlation_matrix 和 bootstrap
+    """
+    mask = valid.astype(np.float64)
+    count = mask.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        center = np.where(count > 0, (values * mask).sum(axis=0) / count, 0)
+    x = np.where(valid, values - center, 0.0)
+    n, k = x.shape
+    products = np.empty((n, 4, k, k))
+    products[:, 0] = mask[:, :, None] * mask[:, None, :]
+    products[:, 1] = x[:, :, None] * mask[:, None, :]
+    products[:, 2] = (x * x)[:, :, None] * mask[:, None, :]
+    products[:, 3] = x[:, :, None] * x[:, None, :]
+    return products.reshape(n, -1), center
+
+
+def _statistics(sums, k, center):
+    """由加权的配对乘积之和计算相关系数、回归斜率和配对均值（最后两维为 k×k）
+
+    r[i, j]：第 i、j 列的相关系数；slope[i, j]：第 j 列对第 i 列的回归斜率；mean[i, j]：与第 j 列配对时第 i 列的均值
+    """
+    sums = sums.reshape(sums.shape[:-1] + (4, k, k))
+    n, a, q, s = (sums[..., i, :, :] for i in range(4))
+    a_t = np.swapaxes(a, -1, -2)
+    q_t = np.swapaxes(q, -1, -2)
+    covariance = n * s - a * a_t
+    var_i = n * q - a * a
+    var_j = n * q_t - a_t * a_t
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = covariance / np.sqrt(var_i * var_j)
+        slope = covariance / var_i
+        mean = a / n + center[:, None]
+    too_few = n < MIN_PAIRS
+    r[too_few] = np.nan
+    slope[too_few] = np.nan
+    return r, slope, mean, n
+
+
+def correlation_matrix(products, center):
+    """两两可用记录上的相关系数矩阵，返回 (r, slope, mean, 配对数)，含义见 _statistics
+
+    products, center 为 pair_products() 的结果
+    """
+    return _statistics(products.sum(axis=0), len(center), center)
+
+
+def bootstrap(products, center, samples=BOOTSTRAP_SAMPLES, seed=None):
+    """自助法：每次有放回地抽取 n 条记录，返回每次重抽样的 (r, slope, mean)，形状为 samples×k×k
+
+    products, center 为 pair_products() 的结果；重抽样用下标矩阵表示，按行统计每条记录被抽中的次数，
+    与配对乘积相乘即得到全部重抽样的统计量
+    """
+    n, k = len(products), len(center)
+    rng = np.random.default_rng(seed)
+    chunk = max(1, CHUNK_ELEMENTS // max(n, 1))
+
+    results = []
+    for start in range(0, samples, chunk):
+        size = min(chunk, samples - start)
+        index = rng.integers(0, n, size=(size, n))
+        index += (np.arange(size) * n)[:, None]
+        counts = np.bincount(index.ravel(), minlength=size * n).reshape(size, n)
+        results.append(_statistics(counts @ products, k, center)[:3])
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+
+def confidence_interval(samples, level=0.95):
+    """重抽样结果的百分位置信区间，返回 (下限, 上限)"""
+    tail = (1 - level) / 2 * 100
+    with warnings.catch_warnings():
+        # 配对不足的格子全部为 nan
+        warnings.simplefilter('ignore', RuntimeWarning)
+        low, high = np.nanpercentile(samples, [tail, 100 - tail], axis=0)
+    return low, high
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间序列降采样
+历史记录很长（上千次训练或每秒的轨迹数据）时，折线图只需要几百到上千个点就能画出同样的形状。
+提供两种方法，都返回选中点的下标，保留首尾两点：
+- lttb：Largest-Triangle-Three-Buckets，每个桶选与前后两点构成三角形面积最大的点，保留视觉形状
+- minmax：每个桶保留最小值和最大值，峰值（如最大心率）一定会保留
+"""
+
+import numpy as np
+
+METHODS = ('lttb', 'minmax')
+
+
+def _as_float(values):
+    """日期转为整数天数，其余转为 float64"""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype(np.int64)
+    return values.astype(np.float64)
+
+
+def lttb(x, y, points):
+    """Largest-Triangle-Three-Buckets 降采样，返回 points 个下标（升序）"""
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    x = _as_float(x)
+    y = _as_float(y)
+
+    # 首尾之外的点均分为 points-2 个桶
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    prefix_x = np.concatenate(([0.0], np.cumsum(x)))
+    prefix_y = np.concatenate(([0.0], np.cumsum(y)))
+    sizes = edges[1:] - edges[:-1]
+    avg_x = (prefix_x[edges[1:]] - prefix_x[edges[:-1]]) / sizes
+    avg_y = (prefix_y[edges[1:]] - prefix_y[edges[:-1]]) / sizes
+    # 最后一个桶的“下一个桶”是最后一个点
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(x, y, points):
+    """最小/最大值降采样：每个桶保留最小值和最大值，返回最多 points 个下标（升序）"""
+    n = len(x)
+    if points >= n or points < 4:
+        return np.arange(n)
+    y = _as_float(y)
+
+    buckets = (points - 2) // 2
+    edges = np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+    bucket = np.repeat(np.arange(buckets), edges[1:] - edges[:-1])
+
+    # 各桶的最小、最大值，再找出每个桶中第一个等于它的点
+    interior = y[1:n - 1]
+    starts = edges[:-1] - 1
+    selected = [[0, n - 1]]
+    for reduce in (np.minimum, np.maximum):
+        extreme = reduce.reduceat(interior, starts)
+        hits = np.flatnonzero(interior == extreme[bucket])
+        _, first = np.unique(bucket[hits], return_index=True)
+        selected.append(hits[first] + 1)
+    return np.unique(np.concatenate(selected))
+
+
+def downsample(x, y, points, method='lttb'):
+    """按指定方法降采样，points 为空或 0 时不降采样，返回选中点的下标"""
+    if not points:
+        return np.arange(len(x))
+    if method == 'lttb':
+        return lttb(x, y, points)
+    if method == 'minmax':
+        return minmax(x, y, points)
+    raise ValueError(f"未知的降采样方法: {method}")
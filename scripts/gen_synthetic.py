@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成跑步数据生成器
+按 quick_log.py 输出的表格格式生成 data/YYYY/MM-Month.md 目录树，用于基准测试
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from quick_log import MONTH_FILE_FOOTER, calculate_pace, format_record_line, month_file_header, month_file_path
+
+VENUES = ['跑步机', '户外', '操场', '其他']
+VENUE_WEIGHTS = [0.5, 0.35, 0.1, 0.05]
+
+
+def generate_rows(runs, start_year, years, rng):
+    """生成 runs 条按日期排序的记录行，返回 [(日期, 记录行)]"""
+    start = np.datetime64(f'{start_year}-01-01')
+    span_days = max(int(years * 365), 1)
+    dates = np.sort(start + rng.integers(0, span_days, size=runs).astype('timedelta64[D]'))
+
+    distance = np.round(rng.gamma(6.0, 1.2, size=runs).clip(1.0, 42.2), 2)
+    pace_min = rng.normal(7.0, 0.6, size=runs).clip(4.0, 10.0)
+    duration = np.round(distance * pace_min, 2)
+    avg_hr = rng.normal(155, 8, size=runs).clip(110, 190).astype(int)
+    max_hr = (avg_hr + rng.integers(5, 25, size=runs)).clip(max=205)
+    # 体重随时间缓慢下降，大约一半的训练记录了体重
+    weight = np.round(82 - 6 * np.linspace(0, 1, runs) + rng.normal(0, 0.4, size=runs), 1)
+    venue = rng.choice(len(VENUES), size=runs, p=VENUE_WEIGHTS)
+    feeling = rng.integers(4, 10, size=runs)
+    has_hr = rng.random(runs) < 0.9
+    has_weight = rng.random(runs) < 0.5
+    has_feeling = rng.random(runs) < 0.6
+
+    rows = []
+    for i in range(runs):
+        date = str(dates[i])
+        d = float(distance[i])
+        t = float(duration[i])
+        rows.append((date, format_record_line(
+            date, d, t, calculate_pace(d, t),
+            int(avg_hr[i]) if has_hr[i] else None,
+            int(max_hr[i]) if has_hr[i] else None,
+            float(weight[i]) if has_weight[i] else None,
+            VENUES[venue[i]],
+            int(feeling[i]) if has_feeling[i] else None,
+            f"步频{rng.integers(150, 175)},合成数据")))
+    return rows
+
+
+def write_data_tree(data_dir, rows):
+    """按月份写出月度文件，返回写出的文件数"""
+    files = 0
+    current_path = None
+    f = None
+    try:
+        for date, line in rows:
+            path = month_file_path(data_dir, date)
+            if path != current_path:
+                if f:
+                    f.write(MONTH_FILE_FOOTER)
+                    f.close()
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                f = open(path, 'w', encoding='utf-8')
+                f.write(month_file_header(int(date[:4]), int(date[5:7])))
+                current_path = path
+                files += 1
+            f.write(line + "\n")
+    finally:
+        if f:
+            f.write(MONTH_FILE_FOOTER)
+            f.close()
+    return files
+
+
+def generate(output_dir, runs, athletes=1, start_year=2010, years=None, seed=0):
+    """生成合成数据，返回各运动员的 data 目录列表
+
+    单个运动员时写到 output_dir/data，多个运动员时写到 output_dir/athlete-NN/data
+    """
+    rng = np.random.default_rng(seed)
+    if years is None:
+        # 大约每年 200 次训练，数据量很大时限制在 50 年内（同一天会有多条记录）
+        years = min(max(runs / 200, 1), 50)
+
+    data_dirs = []
+    for a in range(athletes):
+        root = output_dir if athletes == 1 else os.path.join(output_dir, f'athlete-{a + 1:02d}')
+        data_dir = os.path.join(root, 'data')
+        write_data_tree(data_dir, generate_rows(runs, start_year, years, rng))
+        data_dirs.append(data_dir)
+    return data_dirs
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='生成合成跑步数据')
+    parser.add_argument('output', help='输出目录')
+    parser.add_argument('--runs', type=int, default=1000, help='每名运动员的训练次数')
+    parser.add_argument('--athletes', type=int, default=1, help='运动员数量')
+    parser.add_argument('--start-year', type=int, default=2010, help='起始年份')
+    parser.add_argument('--years', type=float, default=None, help='时间跨度（年），默认按训练次数推算')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    data_dirs = generate(args.output, args.runs, args.athletes, args.start_year, args.years, args.seed)
+    print(f"✓ 已生成 {args.athletes} 名运动员 × {args.runs} 条记录")
+    for data_dir in data_dirs:
+        print(f"  {data_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+心率回归模型
+用递推最小二乘（RLS）拟合平均心率 ~ 体重 + 配速 + 距离 + 场地 + 近7天跑量，
+每加入一条记录以 O(p²) 更新系数，不需要重新拟合；模型保存在 .cache/hr_model.json，
+与月度文件签名一致时直接使用，quick_log.py 录入记录时同步更新
+"""
+
+import json
+import math
+import os
+from datetime import date, timedelta
+
+from aggregates import month_file_signatures, pace_to_seconds
+from parse_cache import default_cache_dir
+
+MODEL_VERSION = 1
+
+# 近7天跑量：训练当天之前 7 天的总距离（不含当天）
+LOAD_DAYS = 7
+
+# 场地以跑步机为基准，其余场地各一个 0/1 特征，未知场地归为“其他”
+BASE_VENUE = '跑步机'
+VENUES = ('户外', '操场', '其他')
+
+FEATURES = ('截距', '体重', '配速', '距离', '近7天跑量') + tuple(f'场地:{v}' for v in VENUES)
+
+# 初始协方差 P0 = δI，δ 越大先验越弱
+INITIAL_COVARIANCE = 1e6
+
+# 95% 预测区间
+Z_95 = 1.959964
+
+
+def default_model_path(data_dir):
+    """默认模型文件：.cache/hr_model.json"""
+    return os.path.join(default_cache_dir(data_dir), 'hr_model.json')
+
+
+def feature_vector(weight, pace_seconds, distance, venue, load):
+    """由各项条件组成特征向量（与 FEATURES 对应）"""
+    venue = venue if venue in VENUES or venue == BASE_VENUE else '其他'
+    return [1.0, float(weight), float(pace_seconds), float(distance), float(load)] + \
+        [1.0 if venue == v else 0.0 for v in VENUES]
+
+
+def t_quantile(df, z=Z_95):
+    """t 分布分位数（Cornish-Fisher 展开，自由度 ≥3 时误差小于 1%）"""
+    return z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+
+
+class HRModel:
+    """递推最小二乘的心率模型"""
+
+    def __init__(self, state=None):
+        p = len(FEATURES)
+        self.state = state or {
+            'version': MODEL_VERSION,
+            'features': list(FEATURES),
+            'sources': {},
+            'theta': [0.0] * p,
+            'P': [[INITIAL_COVARIANCE if i == j else 0.0 for j in range(p)] for i in range(p)],
+            'n': 0,
+            'sse': 0.0,
+            'last_date': None,
+            # 最近几天的跑量：日期 -> 距离，用于计算近7天跑量
+            'recent': {},
+        }
+
+    @classmethod
+    def load(cls, model_path):
+        """读取模型文件，不存在或版本、特征不符时返回 None"""
+        try:
+            with open(model_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (not isinstance(state, dict) or state.get('version') != MODEL_VERSION
+                or state.get('features') != list(FEATURES)):
+            return None
+        return cls(state)
+
+    def save(self, model_path):
+        """原子写入模型文件"""
+        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+        tmp_path = model_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, model_path)
+
+    @classmethod
+    def fit(cls, records, sources):
+        """按日期顺序逐条加入全部记录（与逐条增量更新的结果相同）"""
+        model = cls()
+        model.state['sources'] = sources
+        for record in records:
+            model.add_record(record)
+        return model
+
+    def is_current(self, sources):
+        """模型是否与当前的月度文件一致"""
+        return self.state['sources'] == sources
+
+    def recent_load(self, day):
+        """day 之前 7 天（不含当天）的总距离"""
+        start = str(date.fromisoformat(day) - timedelta(days=LOAD_DAYS))
+        return sum(distance for d, distance in self.state['recent'].items() if start <= d < day)
+
+    def current_load(self):
+        """下一次训练的近7天跑量：截至最后一次训练当天的 7 天总距离"""
+        last = self.state['last_date']
+        if last is None:
+            return 0
+        return self.recent_load(str(date.fromisoformat(last) + timedelta(days=1)))
+
+    def features(self, record):
+        """记录的特征向量，缺少体重或配速时为 None"""
+        pace = pace_to_seconds(record['pace'])
+        if not record['weight'] or pace is None:
+            return None
+        return feature_vector(record['weight'], pace, record['distance'], record['venue'],
+                              self.recent_load(record['date']))
+
+    def add_record(self, record, source=None, signature=None):
+        """计入一条记录并更新该文件的签名
+
+        记录须不早于模型中最后一次训练（近7天跑量只能向后推算）；更早的记录返回 False，
+        模型不再与月度文件一致，下次使用时重新拟合
+        """
+        day = record['date']
+        last = self.state['last_date']
+        if last is not None and day < last:
+            return False
+
+        x = self.features(record)
+        if x is not None and record['avg_hr']:
+            self._update(x, record['avg_hr'])
+
+        recent = self.state['recent']
+        recent[day] = recent.get(day, 0) + record['distance']
+        if day != last:
+            self.state['last_date'] = day
+            start = str(date.fromisoformat(day) - timedelta(days=LOAD_DAYS))
+            for old in [d for d in recent if d < start]:
+                del recent[old]
+
+        if source is not None:
+            self.state['sources'][source] = list(signature)
+        return True
+
+    def _update(self, x, y):
+        """RLS 更新：θ ← θ + k·e，P ← P − k·(Px)ᵀ，k = Px / (1 + xᵀPx)，O(p²)"""
+        theta = self.state['theta']
+        P = self.state['P']
+        p = len(x)
+        px = [sum(P[i][j] * x[j] for j in range(p)) for i in range(p)]
+        denominator = 1 + sum(x[i] * px[i] for i in range(p))
+        gain = [v / denominator for v in px]
+        error = y - sum(theta[i] * x[i] for i in range(p))
+
+        for i in range(p):
+            theta[i] += gain[i] * error
+            row = P[i]
+            for j in range(p):
+                row[j] -= gain[i] * px[j]
+        # 先验误差平方 / (1 + xᵀPx) 即为残差平方和的增量
+        self.state['sse'] += error * error / denominator
+        self.state['n'] += 1
+
+    def count(self):
+        """参与拟合的记录数"""
+        return self.state['n']
+
+    def residual_variance(self):
+        """残差方差，记录数不超过参数个数时为 None"""
+        dof = self.state['n'] - len(FEATURES)
+        if dof <= 0:
+            return None
+        return self.state['sse'] / dof
+
+    def coefficients(self):
+        """[(特征, 系数, 标准误)]，记录不足或该特征从未出现（例如没去过的场地）时标准误为 None"""
+        variance = self.residual_variance()
+        result = []
+        for i, name in enumerate(FEATURES):
+            spread = self.state['P'][i][i]
+            error = None
+            if variance is not None and spread < INITIAL_COVARIANCE / 2:
+                error = math.sqrt(max(variance * spread, 0))
+            result.append((name, self.state['theta'][i], error))
+        return result
+
+    def predict(self, x):
+        """预测平均心率，返回 (预测值, 95%预测区间下限, 上限)，记录不足时区间为 None"""
+        theta = self.state['theta']
+        P = self.state['P']
+        p = len(x)
+        estimate = sum(theta[i] * x[i] for i in range(p))
+        variance = self.residual_variance()
+        if variance is None:
+            return estimate, None, None
+
+        leverage = sum(x[i] * P[i][j] * x[j] for i in range(p) for j in range(p))
+        margin = t_quantile(self.state['n'] - p) * math.sqrt(variance * (1 + leverage))
+        return estimate, estimate - margin, estimate + margin
+
+
+def load_or_fit(data_dir, records, model_path=None):
+    """读取与月度文件一致的模型，否则用 records（按日期排序的全部记录）重新拟合并保存
+
+    返回 (模型, 是否重新拟合)
+    """
+    model_path = model_path or default_model_path(data_dir)
+    sources = month_file_signatures(data_dir)
+    model = HRModel.load(model_path)
+    if model is not None and model.is_current(sources):
+        return model, False
+
+    model = HRModel.fit(records, sources)
+    model.save(model_path)
+    return model, True
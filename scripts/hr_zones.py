@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+心率区间分析
+对全部历史一次性计算每次训练的心率区间时间分布、有氧脱钩（前后半程心率漂移）和效率因子（EF），
+并按月汇总。有轨迹（tracks/）时使用每秒数据，否则使用备注中的每公里分段，最后退回到整次训练的平均心率
+"""
+
+import argparse
+import os
+import re
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from parse_cache import ParseCache, default_cache_dir
+from profiling import PROFILER
+from analyze import (add_common_arguments, add_date_range_arguments, analyze_data, date_range,
+                     print_date_range, print_diagnostics)
+from runlog import RunLog, pace_to_seconds
+from tracks import default_tracks_dir, load_track, tracks_by_date
+
+# 以最大心率的百分比划分五个区间
+ZONE_FRACTIONS = (0.6, 0.7, 0.8, 0.9)
+ZONE_NAMES = ['Z1 恢复', 'Z2 有氧', 'Z3 节奏', 'Z4 阈值', 'Z5 无氧']
+
+# 数据来源
+SOURCE_NONE, SOURCE_AVERAGE, SOURCE_LAPS, SOURCE_TRACK = range(4)
+SOURCE_NAMES = ['-', '平均', '分段', '轨迹']
+
+# 备注中的分段：每公里配速:1km-7:23,2km-7:28,...，可选 每公里心率:1km-150,2km-152,...
+LAP_PACE_PATTERN = re.compile(r'每公里配速[:：]\s*((?:\d+km-\d+:\d{2}[,，]?)+)')
+LAP_HR_PATTERN = re.compile(r'每公里心率[:：]\s*((?:\d+km-\d+[,，]?)+)')
+LAP_ITEM = re.compile(r'(\d+)km-([\d:]+)')
+
+
+def parse_laps(note):
+    """从备注中解析每公里分段，返回 (每公里用时秒数列表, 每公里心率列表或 None)"""
+    match = LAP_PACE_PATTERN.search(note or '')
+    if not match:
+        return None, None
+    paces = [pace_to_seconds(value) for _, value in LAP_ITEM.findall(match.group(1))]
+    paces = [p for p in paces if p]
+
+    hrs = None
+    hr_match = LAP_HR_PATTERN.search(note)
+    if hr_match:
+        hrs = [int(value) for _, value in LAP_ITEM.findall(hr_match.group(1))]
+        if len(hrs) != len(paces):
+            hrs = None
+    return paces, hrs
+
+
+def zone_bounds(max_hr, fractions=ZONE_FRACTIONS):
+    """区间边界（bpm）"""
+    return np.array([round(max_hr * f) for f in fractions], dtype=np.float64)
+
+
+def build_segments(runlog, tracks_dir=None):
+    """把每次训练拆成若干段：轨迹的每一秒、备注中的每一公里，或整次训练
+
+    返回 (段数组字典 run/seconds/hr/speed, 每次训练的数据来源, 是否有逐段心率)；
+    speed 为米/秒，hr 缺失为 nan
+    """
+    n = len(runlog)
+    source = np.zeros(n, dtype=np.int8)
+    profiled = np.zeros(n, dtype=bool)
+    tracks = tracks_by_date(tracks_dir) if tracks_dir else {}
+    used_tracks = {}
+
+    runs, seconds, hrs, speeds = [], [], [], []
+
+    def add(i, seg_seconds, seg_hr, seg_speed):
+        runs.append(np.full(len(seg_seconds), i, dtype=np.int64))
+        seconds.append(np.asarray(seg_seconds, dtype=np.float64))
+        hrs.append(np.asarray(seg_hr, dtype=np.float64))
+        speeds.append(np.asarray(seg_speed, dtype=np.float64))
+
+    dates = runlog.date.astype(str)
+    for i in range(n):
+        # 同一天有多条记录和多条轨迹时按顺序对应
+        day_tracks = tracks.get(dates[i], [])
+        k = used_tracks.get(dates[i], 0)
+        if k < len(day_tracks):
+            used_tracks[dates[i]] = k + 1
+            track = load_track(day_tracks[k])
+            mask = track['moving']
+            add(i, np.ones(mask.sum()), track['hr'][mask], track['speed'][mask])
+            source[i] = SOURCE_TRACK
+            profiled[i] = True
+            continue
+
+        avg_hr = runlog.avg_hr[i] if runlog.avg_hr_valid[i] else np.nan
+        paces, lap_hrs = parse_laps(runlog.note[i])
+        if paces:
+            add(i, paces, lap_hrs if lap_hrs else [avg_hr] * len(paces), [1000 / p for p in paces])
+            source[i] = SOURCE_LAPS
+            profiled[i] = lap_hrs is not None
+        elif not np.isnan(avg_hr):
+            duration = float(runlog.duration[i]) * 60
+            add(i, [duration], [avg_hr], [float(runlog.distance[i]) * 1000 / duration])
+            source[i] = SOURCE_AVERAGE
+
+    if not runs:
+        empty = np.zeros(0)
+        return {'run': empty.astype(np.int64), 'seconds': empty, 'hr': empty, 'speed': empty}, source, profiled
+    segments = {'run': np.concatenate(runs), 'seconds': np.concatenate(seconds),
+                'hr': np.concatenate(hrs), 'speed': np.concatenate(speeds)}
+    return segments, source, profiled
+
+
+def zone_analysis(runlog, segments, source, profiled, bounds):
+    """一次向量化计算所有训练的区间时间、效率因子和有氧脱钩
+
+    返回字典：zone_seconds（训练数×区间数）、ef（米/分 ÷ bpm）、decoupling（%，后半程相对前半程的效率下降）
+    """
+    n = len(runlog)
+    zones = len(bounds) + 1
+    run = segments['run']
+    weight = segments['seconds']
+    hr = segments['hr']
+    speed = segments['speed']
+    valid = ~np.isnan(hr)
+
+    # 区间时间：每段按心率落入的区间，以 (训练, 区间) 为键加权计数
+    zone = np.digitize(hr[valid], bounds)
+    zone_seconds = np.bincount(run[valid] * zones + zone, weights=weight[valid],
+                               minlength=n * zones).reshape(n, zones)
+
+    # 按累计时间的中点划分前后半程
+    total = np.bincount(run, weights=weight, minlength=n)
+    elapsed = np.cumsum(weight) - weight / 2
+    run_start = np.concatenate(([0.0], np.cumsum(total)[:-1]))
+    second_half = (elapsed - run_start[run]) >= total[run] / 2
+
+    def weighted(values, mask):
+        return np.bincount(run[mask] * 2 + second_half[mask], weights=weight[mask] * values[mask],
+                           minlength=n * 2).reshape(n, 2)
+
+    time = np.bincount(run[valid] * 2 + second_half[valid], weights=weight[valid],
+                       minlength=n * 2).reshape(n, 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_speed = weighted(speed * 60, valid) / time
+        mean_hr = weighted(hr, valid) / time
+        half_ef = mean_speed / mean_hr
+        all_time = time.sum(axis=1)
+        ef = (weighted(speed * 60, valid).sum(axis=1) / all_time) / \
+             (weighted(hr, valid).sum(axis=1) / all_time)
+        decoupling = (half_ef[:, 0] - half_ef[:, 1]) / half_ef[:, 0] * 100
+    decoupling[~profiled] = np.nan
+
+    return {'zone_seconds': zone_seconds, 'ef': ef, 'decoupling': decoupling, 'source': source}
+
+
+def monthly_zones(runlog, analysis):
+    """按月汇总：返回 (月份列表, 各月区间时间, 各月平均效率因子, 各月平均脱钩)"""
+    months = runlog.date.astype('datetime64[M]')
+    unique, month_index = np.unique(months, return_inverse=True)
+    m = len(unique)
+    zone_seconds = np.zeros((m, analysis['zone_seconds'].shape[1]))
+    np.add.at(zone_seconds, month_index, analysis['zone_seconds'])
+
+    def month_mean(values):
+        valid = ~np.isnan(values)
+        count = np.bincount(month_index[valid], minlength=m)
+        total = np.bincount(month_index[valid], weights=values[valid], minlength=m)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(count > 0, total / count, np.nan)
+
+    return ([str(u) for u in unique], zone_seconds,
+            month_mean(analysis['ef']), month_mean(analysis['decoupling']))
+
+
+def _percent_cells(row):
+    total = row.sum()
+    return ' '.join(f"{(v / total * 100 if total else 0):>7.0f}%" for v in row)
+
+
+def _value(value, fmt):
+    return '-' if np.isnan(value) else format(value, fmt)
+
+
+def _decoupling(value):
+    return '-' if np.isnan(value) else f"{value:+.1f}%"
+
+
+def print_zone_report(runlog, analysis, bounds, max_hr, recent=10):
+    """打印每次训练和每月的心率区间表"""
+    print("=" * 80)
+    print("心率区间分析")
+    print("=" * 80)
+    edges = [0] + [int(b) for b in bounds] + [max_hr]
+    print(f"最大心率 {max_hr} bpm，区间: " +
+          '，'.join(f"{name} {lo}-{hi}" for name, lo, hi in zip(ZONE_NAMES, edges, edges[1:])))
+    print("EF = 速度(米/分) ÷ 心率，越高越好；脱钩 = 后半程 EF 相对前半程的下降，<5% 说明有氧耐力良好")
+    print()
+
+    header = ' '.join(f"{name.split()[0]:>8}" for name in ZONE_NAMES)
+    has_zone = analysis['zone_seconds'].sum(axis=1) > 0
+    indices = np.flatnonzero(has_zone)
+    if recent:
+        indices = indices[-recent:]
+
+    print("【每次训练】")
+    print(f"{'日期':<12} {'来源':<4} {header} {'EF':>6} {'脱钩':>7}")
+    print("-" * 80)
+    for i in indices:
+        print(f"{str(runlog.date[i]):<12} {SOURCE_NAMES[analysis['source'][i]]:<4} "
+              f"{_percent_cells(analysis['zone_seconds'][i])} "
+              f"{_value(analysis['ef'][i], '6.2f'):>6} {_decoupling(analysis['decoupling'][i]):>7}")
+    print()
+
+    months, zone_seconds, ef, decoupling = monthly_zones(runlog.take(has_zone), {
+        key: value[has_zone] for key, value in analysis.items()})
+    print("【每月】")
+    print(f"{'月份':<12} {'分钟':>6} {header} {'EF':>6} {'脱钩':>7}")
+    print("-" * 80)
+    for month, row, e, d in zip(months, zone_seconds, ef, decoupling):
+        print(f"{month:<12} {row.sum() / 60:>6.0f} {_percent_cells(row)} "
+              f"{_value(e, '6.2f'):>6} {_decoupling(d):>7}")
+    print("=" * 80)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='心率区间分析')
+    add_common_arguments(parser)
+    add_date_range_arguments(parser)
+    parser.add_argument('--max-hr', type=int, default=None,
+                        help='最大心率（默认取历史记录中的最大心率）')
+    parser.add_argument('--zones', default=None,
+                        help='自定义区间边界，例如 120,140,155,170（覆盖 --max-hr 的百分比划分）')
+    parser.add_argument('--runs', type=int, default=10, help='显示最近几次训练（0 为全部）')
+    parser.add_argument('--tracks', default=None, help='轨迹目录（默认 tracks/）')
+    args = parser.parse_args()
+    since, until = date_range(parser, args)
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(script_dir)
+    data_dir = os.path.join(project_dir, 'data')
+
+    if not os.path.exists(data_dir):
+        print("错误: 找不到data目录")
+        return
+
+    PROFILER.configure(args, 'hr_zones', os.path.join(default_cache_dir(data_dir), 'profile'))
+    cache = ParseCache.for_data_dir(data_dir)
+    diagnostics = []
+    all_records, _ = analyze_data(data_dir, cache=cache, diagnostics=diagnostics, jobs=args.jobs,
+                                  since=since, until=until)
+    print_diagnostics(diagnostics)
+    print_date_range(since, until)
+    with PROFILER.stage('build_runlog', records=len(all_records)):
+        runlog = RunLog.from_records(all_records)
+
+    max_hr = args.max_hr
+    if max_hr is None:
+        if not runlog.max_hr_valid.any():
+            print("没有最大心率记录，请用 --max-hr 指定")
+            return
+        max_hr = int(runlog.valid_values('max_hr').max())
+    if args.zones:
+        bounds = np.array(sorted(float(v) for v in args.zones.split(',')))
+    else:
+        bounds = zone_bounds(max_hr)
+    if len(bounds) != len(ZONE_NAMES) - 1:
+        print(f"错误: 需要 {len(ZONE_NAMES) - 1} 个区间边界")
+        return
+
+    with PROFILER.stage('build_segments', records=len(runlog)):
+        segments, source, profiled = build_segments(runlog, args.tracks or default_tracks_dir(project_dir))
+        PROFILER.count(segments=len(segments['run']))
+    with PROFILER.stage('zone_analysis'):
+        analysis = zone_analysis(runlog, segments, source, profiled, bounds)
+
+    if not analysis['zone_seconds'].any():
+        print("没有心率数据")
+        return
+    print_zone_report(runlog, analysis, bounds, max_hr, args.runs)
+
+
+if __name__ == '__main__':
+    main()
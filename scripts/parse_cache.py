@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+月度记录文件的解析缓存
+按文件 mtime/大小/内容哈希判断是否需要重新解析，解析结果以 pickle 存放在 .cache/ 下
+"""
+
+import hashlib
+import os
+import pickle
+
+CACHE_VERSION = 4
+
+
+def file_signature(file_path):
+    """获取文件的快速签名（修改时间 + 大小）"""
+    st = os.stat(file_path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def file_digest(file_path):
+    """计算文件内容哈希"""
+    h = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def default_cache_dir(data_dir):
+    """默认缓存目录：data目录同级的 .cache/"""
+    return os.path.join(os.path.dirname(os.path.abspath(data_dir)), '.cache')
+
+
+class ParseCache:
+    """按源文件存放解析结果的磁盘缓存"""
+
+    def __init__(self, cache_dir):
+        self.root = cache_dir
+        self.cache_dir = os.path.join(cache_dir, 'parsed')
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def for_data_dir(cls, data_dir):
+        return cls(default_cache_dir(data_dir))
+
+    def _entry_path(self, file_path):
+        key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _read_entry(self, entry_path):
+        try:
+            with open(entry_path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        if not isinstance(entry, dict) or entry.get('version') != CACHE_VERSION:
+            return None
+        return entry
+
+    def _write_entry(self, entry_path, entry):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = entry_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, entry_path)
+
+    def load(self, file_path, build):
+        """读取文件的解析结果，缓存失效时调用 build(file_path) 重新解析并写回缓存"""
+        entry_path = self._entry_path(file_path)
+        entry = self._read_entry(entry_path)
+        signature = file_signature(file_path)
+
+        if entry and entry['signature'] == signature:
+            self.hits += 1
+            return entry['payload']
+
+        # 修改时间或大小变了，再比较内容哈希
+        digest = file_digest(file_path)
+        if entry and entry['digest'] == digest:
+            self.hits += 1
+            entry['signature'] = signature
+            self._write_entry(entry_path, entry)
+            return entry['payload']
+
+        self.misses += 1
+        payload = build(file_path)
+        self._write_entry(entry_path, {
+            'version': CACHE_VERSION,
+            'source': os.path.abspath(file_path),
+            'signature': signature,
+            'digest': digest,
+            'payload': payload,
+        })
+        return payload
+
+    def report(self):
+        """缓存命中情况"""
+        return f"解析缓存: 命中 {self.hits} 个文件，重新解析 {self.misses} 个文件"
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+matplotlib 延迟加载
+只有真正需要画图时才导入 matplotlib 并设置中文字体，纯文本报告不承担导入开销
+"""
+
+import os
+
+from profiling import PROFILER
+
+_pyplot = None
+
+
+def get_pyplot():
+    """导入 matplotlib.pyplot 并设置中文字体（只执行一次）"""
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib.pyplot as plt
+
+        # 设置中文字体
+        plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'DejaVu Sans']
+        plt.rcParams['axes.unicode_minus'] = False
+        _pyplot = plt
+    return _pyplot
+
+
+def save_figure(plt, path, dpi=300):
+    """保存当前图表（剖析时单独记录编码耗时和文件大小）"""
+    with PROFILER.stage('savefig', file=os.path.basename(path), dpi=dpi):
+        plt.savefig(path, dpi=dpi)
+        PROFILER.count(bytes=os.path.getsize(path))
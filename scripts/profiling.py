@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分阶段性能剖析
+--profile 或环境变量 RUNLOG_PROFILE=1 开启后，记录目录扫描、每次解析、汇总、每个图表和 savefig 的耗时，
+以及记录数、字节数，退出时输出 JSON 计时树；RUNLOG_PROFILE=cprofile 或 --profile-pstats 时同时保存 pstats
+"""
+
+import atexit
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+ENV_VAR = 'RUNLOG_PROFILE'
+
+
+class Profiler:
+    """嵌套的阶段计时器，未开启时所有操作都是空操作"""
+
+    def __init__(self):
+        mode = os.environ.get(ENV_VAR, '')
+        self.enabled = mode not in ('', '0')
+        self.pstats = mode == 'cprofile'
+        self._cprofile = None
+        self.reset()
+
+    def reset(self):
+        """清空已记录的阶段（子进程每个任务开始时调用）"""
+        self.root = {'name': 'total', 'elapsed_ms': 0.0, 'counters': {}, 'children': []}
+        self._stack = [self.root]
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, merge=False, **counters):
+        """记录一个阶段，可附带计数（记录数、字节数等）
+
+        merge=True 时同名阶段累加到同一个节点（用于循环中频繁调用的小步骤）
+        """
+        if not self.enabled:
+            yield
+            return
+
+        siblings = self._stack[-1]['children']
+        node = None
+        if merge:
+            node = next((n for n in siblings if n['name'] == name), None)
+        if node is None:
+            node = {'name': name, 'elapsed_ms': 0.0, 'counters': {}, 'children': []}
+            siblings.append(node)
+        for key, value in counters.items():
+            node['counters'][key] = node['counters'].get(key, 0) + value if merge else value
+        if merge:
+            node['counters']['calls'] = node['counters'].get('calls', 0) + 1
+
+        self._stack.append(node)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            node['elapsed_ms'] += (time.perf_counter() - start) * 1000
+            self._stack.pop()
+
+    def count(self, **counters):
+        """给当前阶段累加计数"""
+        if not self.enabled:
+            return
+        node_counters = self._stack[-1]['counters']
+        for key, value in counters.items():
+            node_counters[key] = node_counters.get(key, 0) + value
+
+    def collect(self):
+        """取出已记录的阶段（子进程把结果传回主进程）"""
+        if not self.enabled:
+            return []
+        return self.root['children']
+
+    def attach(self, nodes, **counters):
+        """把子进程记录的阶段挂到当前阶段下"""
+        if not self.enabled:
+            return
+        for node in nodes:
+            node['counters'].update(counters)
+            self._stack[-1]['children'].append(node)
+
+    def configure(self, args, script, output_dir):
+        """根据命令行参数开启剖析，并在进程退出时写出结果"""
+        if getattr(args, 'profile', False):
+            self.enabled = True
+        if getattr(args, 'profile_pstats', False):
+            self.enabled = True
+            self.pstats = True
+        if not self.enabled:
+            return
+
+        # 让进程池中的子进程也开启剖析
+        os.environ[ENV_VAR] = 'cprofile' if self.pstats else '1'
+        self.reset()
+        if self.pstats:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        atexit.register(self._write_report, script, output_dir)
+
+    def to_dict(self, script):
+        """计时树"""
+        self.root['elapsed_ms'] = (time.perf_counter() - self._started) * 1000
+        return {
+            'script': script,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'pid': os.getpid(),
+            'tree': self.root,
+        }
+
+    def _write_report(self, script, output_dir):
+        """保存 JSON（以及 pstats），并把计时树打印到 stderr"""
+        os.makedirs(output_dir, exist_ok=True)
+        base = os.path.join(output_dir, f"{script}-{datetime.now():%Y%m%d-%H%M%S}")
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(base + '.pstats')
+
+        report = self.to_dict(script)
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        print("\n【性能剖析】", file=sys.stderr)
+        _print_node(report['tree'], 0)
+        print(f"计时树已保存: {base}.json", file=sys.stderr)
+        if self._cprofile is not None:
+            print(f"cProfile 结果: {base}.pstats（python -m pstats 查看）", file=sys.stderr)
+
+
+def _print_node(node, depth):
+    """打印计时树的一个节点"""
+    counters = ', '.join(f"{k}={v}" for k, v in node['counters'].items())
+    line = f"{'  ' * depth}{node['name']:<{40 - 2 * depth}} {node['elapsed_ms']:>10.1f} ms"
+    if counters:
+        line += f"  ({counters})"
+    print(line, file=sys.stderr)
+    for child in node['children']:
+        _print_node(child, depth + 1)
+
+
+def add_profile_arguments(parser):
+    """剖析相关的命令行参数"""
+    parser.add_argument('--profile', action='store_true',
+                        help=f'输出分阶段计时树（等同于 {ENV_VAR}=1）')
+    parser.add_argument('--profile-pstats', action='store_true',
+                        help=f'同时保存 cProfile 结果（等同于 {ENV_VAR}=cprofile）')
+
+
+PROFILER = Profiler()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跑步记录 SQLite 索引与查询
+从 data/ 下的 Markdown 表格同步到本地 SQLite（.cache/runs.sqlite），按日期、场地、心率范围查询
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from parse_cache import default_cache_dir, file_digest, file_signature
+from analyze import iter_markdown_table, list_month_files, print_diagnostics
+from runlog import pace_to_seconds
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    month TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    month TEXT NOT NULL,
+    date TEXT NOT NULL,
+    distance REAL NOT NULL,
+    duration REAL NOT NULL,
+    pace TEXT,
+    pace_seconds INTEGER,
+    avg_hr INTEGER,
+    max_hr INTEGER,
+    weight REAL,
+    venue TEXT,
+    feeling INTEGER,
+    note TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_date ON runs(date);
+CREATE INDEX IF NOT EXISTS idx_runs_venue_date ON runs(venue, date);
+CREATE INDEX IF NOT EXISTS idx_runs_avg_hr ON runs(avg_hr);
+CREATE INDEX IF NOT EXISTS idx_runs_source ON runs(source);
+CREATE INDEX IF NOT EXISTS idx_runs_month ON runs(month);
+"""
+
+
+def default_index_path(data_dir):
+    """默认索引位置：.cache/runs.sqlite"""
+    return os.path.join(default_cache_dir(data_dir), 'runs.sqlite')
+
+
+def open_index(index_path):
+    """打开（必要时创建）索引数据库"""
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    conn = sqlite3.connect(index_path)
+    conn.row_factory = sqlite3.Row
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version != SCHEMA_VERSION:
+        # 结构有变化时直接重建，数据源始终是 Markdown 文件
+        conn.executescript('DROP TABLE IF EXISTS runs; DROP TABLE IF EXISTS sources;')
+    conn.executescript(SCHEMA)
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    return conn
+
+
+def sync_index(conn, data_dir, diagnostics=None):
+    """把 data 目录同步到索引，只重新导入有变化的月度文件
+
+    返回 (重新导入的文件数, 删除的文件数)
+    """
+    indexed = {row['path']: row for row in conn.execute('SELECT * FROM sources')}
+    updated = 0
+    seen = set()
+
+    with conn:
+        for month_key, file_path in list_month_files(data_dir):
+            rel_path = os.path.relpath(file_path, data_dir)
+            seen.add(rel_path)
+            mtime_ns, size = file_signature(file_path)
+            row = indexed.get(rel_path)
+            if row and (row['mtime_ns'], row['size']) == (mtime_ns, size):
+                continue
+
+            digest = file_digest(file_path)
+            if not row or row['digest'] != digest:
+                conn.execute('DELETE FROM runs WHERE source = ?', (rel_path,))
+                conn.executemany(
+                    'INSERT INTO runs (source, month, date, distance, duration, pace, pace_seconds, '
+                    'avg_hr, max_hr, weight, venue, feeling, note) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    ((rel_path, month_key, r['date'], r['distance'], r['duration'], r['pace'],
+                      pace_to_seconds(r['pace']), r['avg_hr'], r['max_hr'], r['weight'],
+                      r['venue'], r['feeling'], r['note'])
+                     for r in iter_markdown_table(file_path, diagnostics)))
+                updated += 1
+
+            conn.execute('INSERT OR REPLACE INTO sources (path, month, mtime_ns, size, digest) '
+                         'VALUES (?, ?, ?, ?, ?)', (rel_path, month_key, mtime_ns, size, digest))
+
+        removed = [path for path in indexed if path not in seen]
+        for path in removed:
+            conn.execute('DELETE FROM runs WHERE source = ?', (path,))
+            conn.execute('DELETE FROM sources WHERE path = ?', (path,))
+
+    return updated, len(removed)
+
+
+def query_runs(conn, since=None, until=None, venue=None, min_hr=None, max_hr=None, limit=None):
+    """按条件查询跑步记录（日期含两端）"""
+    clauses = []
+    params = []
+    if since:
+        clauses.append('date >= ?')
+        params.append(since)
+    if until:
+        clauses.append('date <= ?')
+        params.append(until)
+    if venue:
+        clauses.append('venue = ?')
+        params.append(venue)
+    if min_hr is not None:
+        clauses.append('avg_hr >= ?')
+        params.append(min_hr)
+    if max_hr is not None:
+        clauses.append('avg_hr <= ?')
+        params.append(max_hr)
+
+    sql = 'SELECT * FROM runs'
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY date, id'
+    if limit:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
+def monthly_summary(conn):
+    """月度统计（与 print_report 的月度统计一致），一条 GROUP BY 完成"""
+    return conn.execute(
+        'SELECT month, COUNT(*) AS count, SUM(distance) AS total_distance, '
+        'AVG(avg_hr) AS avg_hr, AVG(feeling) AS avg_feeling '
+        'FROM runs GROUP BY month ORDER BY month').fetchall()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='查询跑步记录（SQLite索引）')
+    parser.add_argument('--since', help='起始日期 YYYY-MM-DD（含）')
+    parser.add_argument('--until', help='结束日期 YYYY-MM-DD（含）')
+    parser.add_argument('--venue', help='场地，例如 跑步机、户外')
+    parser.add_argument('--min-hr', type=int, help='平均心率下限（含）')
+    parser.add_argument('--max-hr', type=int, help='平均心率上限（含）')
+    parser.add_argument('--limit', type=int, help='最多返回条数')
+    parser.add_argument('--monthly', action='store_true', help='输出月度统计')
+    parser.add_argument('--index', default=None, help='索引文件路径（默认 .cache/runs.sqlite）')
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(script_dir)
+    data_dir = os.path.join(project_dir, 'data')
+
+    if not os.path.exists(data_dir):
+        print("错误: 找不到data目录")
+        return
+
+    conn = open_index(args.index or default_index_path(data_dir))
+    diagnostics = []
+    updated, removed = sync_index(conn, data_dir, diagnostics)
+    print_diagnostics(diagnostics)
+    if updated or removed:
+        print(f"索引已同步: 重新导入 {updated} 个文件，移除 {removed} 个文件")
+
+    start = time.perf_counter()
+    if args.monthly:
+        rows = monthly_summary(conn)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{'月份':<12} {'次数':>6} {'总距离(km)':>12} {'平均心率':>10} {'平均感受':>10}")
+        print("-" * 60)
+        for row in rows:
+            print(f"{row['month']:<12} {row['count']:>6} {row['total_distance']:>12.2f} "
+                  f"{row['avg_hr'] or 0:>10.0f} {row['avg_feeling'] or 0:>10.1f}")
+    else:
+        rows = query_runs(conn, args.since, args.until, args.venue,
+                          args.min_hr, args.max_hr, args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        for row in rows:
+            print(f"{row['date']}: {row['distance']}km, {row['pace']}, "
+                  f"心率{row['avg_hr'] or '-'}bpm, {row['venue']}")
+
+    print(f"\n共 {len(rows)} 条，查询耗时 {elapsed:.2f} ms")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,15 +4,250 @@
 跑步记录快速录入和计划对比工具
 """
 
+import argparse
+import bisect
+import csv
+import itertools
+import json
 import os
+import re
 import sys
+import time
+from collections import defaultdict
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from aggregates import (AggregateState, default_state_path, format_pace, month_file_signatures,
+                        pace_to_seconds)
+from best_efforts import ALL_BANDS, BestEfforts, default_index_path
+from hr_model import HRModel, default_model_path
+from parse_cache import file_signature
+
 def get_project_root():
     """获取项目根目录"""
     script_dir = os.path.dirname(os.path.abspath(__file__))
     return os.path.dirname(script_dir)
 
+# 月度文件名中的英文月份（data/YYYY/MM-Month.md）
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+def check_date(date):
+    """校验 YYYY-MM-DD 日期，无效时抛出 ValueError"""
+    try:
+        if not DATE_PATTERN.match(date):
+            raise ValueError
+        datetime.fromisoformat(date)
+    except ValueError:
+        raise ValueError(f"日期格式应为 YYYY-MM-DD: {date or '(空)'}") from None
+
+def month_file_path(data_dir, date):
+    """日期 YYYY-MM-DD 对应的月度记录文件，日期无效时抛出 ValueError"""
+    check_date(date)
+    year, month = date[:4], int(date[5:7])
+    return os.path.join(data_dir, year, f"{month:02d}-{MONTH_NAMES[month - 1]}.md")
+
+TABLE_HEADER = (
+    "| 日期 | 距离(km) | 时长(分钟) | 配速(分/km) | 平均心率(bpm) | 最大心率(bpm) | 体重(kg) | 场地 | 感受(1-10) | 备注 |\n"
+    "|------|----------|------------|-------------|---------------|---------------|----------|------|------------|------|\n"
+)
+
+def month_file_header(year, month):
+    """新建月度文件时表格之前的内容"""
+    return (f"# {year}年{month}月跑步记录\n\n"
+            "[← 返回主页](../../README.md)\n\n"
+            "## 跑步记录\n\n") + TABLE_HEADER
+
+MONTH_FILE_FOOTER = "\n---\n\n## 本月总结\n"
+
+# 场地选项
+VENUE_CHOICES = {"1": "跑步机", "2": "户外", "3": "操场", "4": "其他"}
+
+def clean_note(note):
+    """备注中的竖线和换行会破坏表格：竖线换成 /，连续空白和换行合并为一个空格"""
+    return ' '.join(str(note or '').replace('|', '/').split())
+
+def format_record_line(date, distance, duration, pace, avg_hr, max_hr, weight, venue, feeling, note):
+    """生成月度表格中的一行记录"""
+    return f"| {date} | {distance} | {duration:.2f} | {pace} | {avg_hr or '-'} | {max_hr or '-'} | {weight or '-'} | {venue} | {feeling or '-'} | {clean_note(note)} |"
+
+def _optional(value, convert):
+    """缺失值（空或 -）返回 None"""
+    return convert(value) if value and value != '-' else None
+
+def make_record(date, distance, duration, pace, avg_hr, max_hr, weight, venue, feeling, note):
+    """与 format_record_line 对应的记录字典，和解析该行得到的结果相同"""
+    return {
+        'date': date,
+        'distance': float(distance),
+        'duration': float(f"{duration:.2f}"),
+        'pace': pace,
+        'avg_hr': _optional(str(avg_hr or ''), int),
+        'max_hr': _optional(str(max_hr or ''), int),
+        'weight': _optional(str(weight or ''), float),
+        'venue': venue,
+        'feeling': _optional(str(feeling or ''), int),
+        'note': clean_note(note),
+    }
+
+def _row_date(line):
+    """表格行的日期单元格"""
+    return line.split('|')[1].strip()
+
+def _read_month_lines(file_path, date):
+    """读取月度文件的各行和表头所在行，文件不存在时使用新文件模板，没有表格时在末尾加上"""
+    if not os.path.exists(file_path):
+        lines = (month_file_header(int(date[:4]), int(date[5:7])) + MONTH_FILE_FOOTER).splitlines(True)
+    else:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+
+    header = next((i for i, line in enumerate(lines) if line.startswith('| 日期')), None)
+    if header is None:
+        if lines and not lines[-1].endswith('\n'):
+            lines[-1] += '\n'
+        lines.extend(("\n## 跑步记录\n\n" + TABLE_HEADER).splitlines(True))
+        header = len(lines) - 2
+    return lines, header
+
+def insert_record_lines(file_path, rows, skip_duplicates=False):
+    """把多条记录行按日期顺序合并进月度文件的表格，整个文件只读写一次
+
+    rows 为按日期排序的 [(日期, 记录行)]，同一天的新记录排在已有记录之后；
+    skip_duplicates 时跳过文件中（或本批次前面）已有同一天记录的行。
+    返回 (写入的行在 rows 中的下标, 对应的行号（从1开始，升序）, 跳过的重复行下标)
+    """
+    if not rows:
+        return [], [], []
+    lines, header = _read_month_lines(file_path, rows[0][0])
+
+    first_row = header + 2
+    end = first_row
+    while end < len(lines) and lines[end].lstrip().startswith('|'):
+        end += 1
+    table = lines[first_row:end]
+    existing = [_row_date(line) for line in table]
+
+    kept = list(range(len(rows)))
+    duplicates = []
+    if skip_duplicates:
+        seen = set(existing)
+        kept = []
+        for index, (date, _) in enumerate(rows):
+            if date in seen:
+                duplicates.append(index)
+            else:
+                seen.add(date)
+                kept.append(index)
+
+    # 已有表格按日期有序，逐条定位插入位置，一次生成新表格
+    merged = []
+    inserted = []
+    i = 0
+    for index in kept:
+        date, line = rows[index]
+        position = bisect.bisect_right(existing, date, lo=i)
+        merged.extend(table[i:position])
+        i = position
+        inserted.append(first_row + len(merged) + 1)
+        merged.append(line + '\n')
+    merged.extend(table[i:])
+
+    if inserted:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines[:first_row])
+            f.writelines(merged)
+            f.writelines(lines[end:])
+        os.replace(tmp_path, file_path)
+    return kept, inserted, duplicates
+
+def insert_record_line(file_path, date, record_line):
+    """把一条记录行按日期顺序插入月度文件的表格，文件不存在时新建，返回插入的行号（从1开始）"""
+    _, inserted, _ = insert_record_lines(file_path, [(date, record_line)])
+    return inserted[0]
+
+def save_records(data_dir, entries, skip_duplicates=False):
+    """按月份分组写入多条记录（每个月度文件只读写一次），并增量更新汇总状态、心率模型和个人最佳索引
+
+    entries 为 [(记录字典, 记录行)]，返回 (写入的文件列表, 写入条数, 跳过的重复记录, 汇总状态是否已更新)
+    """
+    state_path = default_state_path(data_dir)
+    model_path = default_model_path(data_dir)
+    bests_path = default_index_path(data_dir)
+
+    # 只有写入前状态（和心率模型、个人最佳索引）与所有月度文件一致，才能在它的基础上增量更新
+    sources = month_file_signatures(data_dir)
+    aggregate = AggregateState.load(state_path)
+    if aggregate is not None and not aggregate.is_current(sources):
+        aggregate = None
+    model = HRModel.load(model_path)
+    if model is not None and not model.is_current(sources):
+        model = None
+    bests = BestEfforts.load(bests_path)
+    if bests is not None and not bests.is_current(sources):
+        bests = None
+
+    by_file = defaultdict(list)
+    for record, record_line in sorted(entries, key=lambda e: e[0]['date']):
+        by_file[month_file_path(data_dir, record['date'])].append((record, record_line))
+
+    written = []
+    count = 0
+    duplicates = []
+    for file_path in sorted(by_file):
+        group = by_file[file_path]
+        kept, inserted, skipped = insert_record_lines(
+            file_path, [(record['date'], line) for record, line in group], skip_duplicates)
+        duplicates.extend(group[i][0] for i in skipped)
+        if not inserted:
+            continue
+        written.append(file_path)
+        count += len(inserted)
+
+        if aggregate is not None:
+            source = os.path.relpath(file_path, data_dir)
+            signature = file_signature(file_path)
+            for i, line_no in zip(kept, inserted):
+                aggregate.add_record(group[i][0], source, signature, line_no)
+
+        # 早于模型中最后一次训练的记录无法增量计入，不保存模型，下次分析时重新拟合
+        if model is not None:
+            source = os.path.relpath(file_path, data_dir)
+            signature = file_signature(file_path)
+            if not all(model.add_record(group[i][0], source, signature) for i in kept):
+                model = None
+
+        if bests is not None:
+            source = os.path.relpath(file_path, data_dir)
+            signature = file_signature(file_path)
+            for i in kept:
+                bests.add_record(group[i][0], source, signature)
+
+    if aggregate is not None and written:
+        aggregate.save(state_path)
+    if model is not None and written:
+        model.save(model_path)
+    if bests is not None and written:
+        bests.save(bests_path)
+    return written, count, duplicates, aggregate is not None
+
+def save_record(data_dir, record, record_line):
+    """写入一条记录，返回 (文件路径, 汇总状态是否已更新)"""
+    written, _, _, updated = save_records(data_dir, [(record, record_line)])
+    return written[0], updated
+
+def print_new_records(data_dir, record):
+    """刚写入的记录刷新了个人最佳时提示（个人最佳索引已增量更新时才检查）"""
+    bests = BestEfforts.load(default_index_path(data_dir))
+    if bests is None or not bests.is_current(month_file_signatures(data_dir)):
+        return
+    for title, band in bests.new_records(record):
+        print(f"🏆 新的个人最佳: {'' if band == ALL_BANDS else band + ' '}{title}")
+
 def calculate_pace(distance_km, duration_minutes):
     """计算配速"""
     pace_minutes = duration_minutes / distance_km
@@ -20,6 +255,14 @@ def calculate_pace(distance_km, duration_minutes):
     seconds = int((pace_minutes - minutes) * 60)
     return f"{minutes}:{seconds:02d}"
 
+def _ask_value(prompt, name, convert, low, high, required=False):
+    """交互式输入一个数值，按导入数据的规则校验，有误时重新输入"""
+    while True:
+        try:
+            return _import_value({name: input(prompt)}, name, convert, low, high, required)
+        except ValueError as e:
+            print(f"⚠️  {e}")
+
 def add_running_record():
     """交互式添加跑步记录"""
     print("=" * 60)
@@ -28,26 +271,28 @@ def add_running_record():
     print()
 
     # 获取日期
-    date_input = input("日期 (直接回车使用今天): ").strip()
-    if not date_input:
-        date = datetime.now().strftime("%Y-%m-%d")
-    else:
-        date = date_input
+    while True:
+        date = input("日期 (直接回车使用今天): ").strip() or datetime.now().strftime("%Y-%m-%d")
+        try:
+            check_date(date)
+            break
+        except ValueError as e:
+            print(f"⚠️  {e}")
 
     # 获取基本数据
-    distance = float(input("距离 (km): "))
-    duration = float(input("时长 (分钟): "))
+    distance = round(_ask_value("距离 (km): ", 'distance', float, 0.01, 500, required=True), 2)
+    duration = _ask_value("时长 (分钟): ", 'duration', float, 0.1, 6000, required=True)
 
     # 计算配速
     pace = calculate_pace(distance, duration)
     print(f"计算配速: {pace}")
 
     # 心率数据
-    avg_hr = input("平均心率 (bpm): ").strip()
-    max_hr = input("最大心率 (bpm): ").strip()
+    avg_hr = _ask_value("平均心率 (bpm): ", 'avg_hr', int, 30, 250)
+    max_hr = _ask_value("最大心率 (bpm): ", 'max_hr', int, 30, 250)
 
     # 体重
-    weight = input("体重 (kg): ").strip()
+    weight = _ask_value("体重 (kg): ", 'weight', float, 20, 300)
 
     # 场地类型
     print("\n场地类型:")
@@ -56,17 +301,17 @@ def add_running_record():
     print("3. 操场")
     print("4. 其他")
     venue_choice = input("选择场地 (1-4): ").strip()
-    venue_map = {"1": "跑步机", "2": "户外", "3": "操场", "4": "其他"}
-    venue = venue_map.get(venue_choice, "其他")
+    venue = VENUE_CHOICES.get(venue_choice, "其他")
 
     # 感受评分
-    feeling = input("感受评分 (1-10): ").strip()
+    feeling = _ask_value("感受评分 (1-10): ", 'feeling', int, 1, 10)
 
     # 备注
     note = input("备注: ").strip()
 
     # 生成记录行
-    record_line = f"| {date} | {distance} | {duration:.2f} | {pace} | {avg_hr or '-'} | {max_hr or '-'} | {weight or '-'} | {venue} | {feeling or '-'} | {note} |"
+    record_line = format_record_line(date, distance, duration, pace, avg_hr, max_hr,
+                                     weight, venue, feeling, note)
 
     print("\n" + "=" * 60)
     print("生成的记录:")
@@ -77,33 +322,195 @@ def add_running_record():
     # 对比训练计划
     compare_with_plan(date, distance, pace, avg_hr)
 
-    return record_line
+    record = make_record(date, distance, duration, pace, avg_hr, max_hr, weight, venue, feeling, note)
+    return record_line, record
+
+# 导入文件的列名（英文，或与月度表格相同的中文列名）-> 字段
+IMPORT_FIELDS = {
+    'date': 'date', '日期': 'date',
+    'distance': 'distance', '距离': 'distance', '距离(km)': 'distance',
+    'duration': 'duration', '时长': 'duration', '时长(分钟)': 'duration',
+    'avg_hr': 'avg_hr', '平均心率': 'avg_hr', '平均心率(bpm)': 'avg_hr',
+    'max_hr': 'max_hr', '最大心率': 'max_hr', '最大心率(bpm)': 'max_hr',
+    'weight': 'weight', '体重': 'weight', '体重(kg)': 'weight',
+    'venue': 'venue', '场地': 'venue',
+    'feeling': 'feeling', '感受': 'feeling', '感受(1-10)': 'feeling',
+    'note': 'note', '备注': 'note',
+}
+
+def _import_value(fields, name, convert, low, high, required=False):
+    """取出并校验一个字段，缺失（空、- 或 null）时返回 None"""
+    value = fields.get(name)
+    if value is None or str(value).strip() in ('', '-'):
+        if required:
+            raise ValueError(f"缺少 {name}")
+        return None
+    try:
+        number = float(str(value).strip())
+    except ValueError:
+        raise ValueError(f"{name} 不是数字: {value}")
+    if convert is int:
+        if not number.is_integer():
+            raise ValueError(f"{name} 应为整数: {value}")
+        number = int(number)
+    if not low <= number <= high:
+        raise ValueError(f"{name} 超出范围 {low}-{high}: {value}")
+    return number
+
+def validate_import_row(raw):
+    """校验一行导入数据，返回 (记录字典, 记录行)，数据有误时抛出 ValueError"""
+    fields = {IMPORT_FIELDS.get(str(key).strip()): value for key, value in raw.items() if key}
+
+    date = str(fields.get('date') or '').strip()
+    check_date(date)
+
+    distance = round(_import_value(fields, 'distance', float, 0.01, 500, required=True), 2)
+    duration = _import_value(fields, 'duration', float, 0.1, 6000, required=True)
+    avg_hr = _import_value(fields, 'avg_hr', int, 30, 250)
+    max_hr = _import_value(fields, 'max_hr', int, 30, 250)
+    weight = _import_value(fields, 'weight', float, 20, 300)
+    feeling = _import_value(fields, 'feeling', int, 1, 10)
+    venue = str(fields.get('venue') or '').strip()
+    venue = VENUE_CHOICES.get(venue, venue) or "其他"
+    note = fields.get('note')
+    if '|' in venue:
+        raise ValueError(f"场地不能包含 |: {venue}")
+
+    pace = calculate_pace(distance, duration)
+    args = (date, distance, duration, pace, avg_hr, max_hr, weight, venue, feeling, note)
+    return make_record(*args), format_record_line(*args)
+
+def iter_import_rows(f, fmt):
+    """逐行读取 CSV 或 JSONL，产出 (行号, 原始字段字典或解析错误)"""
+    if fmt == 'csv':
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_no, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, ValueError(f"JSON 解析失败: {e}")
+            continue
+        yield line_no, row if isinstance(row, dict) else ValueError("每行应为一个 JSON 对象")
+
+def import_runs(data_dir, f, fmt, skip_duplicates=True, strict=False, dry_run=False):
+    """批量导入：流式读取并校验，按月份分组，每个月度文件只写一次
+
+    返回 (写入的文件列表, 写入条数, 跳过的重复记录, 无效行 [(行号, 错误)], 汇总状态是否已更新)
+    """
+    entries = []
+    invalid = []
+    for line_no, row in iter_import_rows(f, fmt):
+        try:
+            if isinstance(row, Exception):
+                raise row
+            entries.append(validate_import_row(row))
+        except ValueError as e:
+            invalid.append((line_no, str(e)))
+
+    if dry_run or (strict and invalid):
+        return [], 0, [], invalid, False
+    written, count, duplicates, updated = save_records(data_dir, entries, skip_duplicates)
+    return written, count, duplicates, invalid, updated
+
+def _detect_format(path, f):
+    """根据扩展名或首个非空字符判断格式，返回 (格式, 可继续读取的行迭代器)"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.json', '.ndjson'):
+        return 'jsonl', f
+    if ext == '.csv':
+        return 'csv', f
+    first = f.readline()
+    fmt = 'jsonl' if first.lstrip().startswith('{') else 'csv'
+    return fmt, itertools.chain([first], f)
+
+def run_import(args, data_dir):
+    """--import 模式"""
+    started = time.perf_counter()
+    if args.import_path == '-':
+        f = sys.stdin
+    else:
+        f = open(args.import_path, 'r', encoding='utf-8-sig', newline='')
+    with f:
+        fmt, lines = (args.format, f) if args.format else _detect_format(args.import_path, f)
+        written, count, duplicates, invalid, updated = import_runs(
+            data_dir, lines, fmt, skip_duplicates=not args.allow_duplicates,
+            strict=args.strict, dry_run=args.dry_run)
+
+    for line_no, error in invalid[:20]:
+        print(f"⚠️  第 {line_no} 行: {error}")
+    if len(invalid) > 20:
+        print(f"⚠️  ... 共 {len(invalid)} 行无效")
+    for record in duplicates[:20]:
+        print(f"· 跳过重复日期: {record['date']} {record['distance']}km")
+    if len(duplicates) > 20:
+        print(f"· ... 共 {len(duplicates)} 条重复")
+
+    elapsed = time.perf_counter() - started
+    if args.dry_run:
+        print(f"\n校验完成（未写入）: 无效 {len(invalid)} 行，用时 {elapsed:.2f} 秒")
+    elif args.strict and invalid:
+        print(f"\n❌ 存在 {len(invalid)} 行无效数据，未写入任何记录")
+        sys.exit(1)
+    else:
+        print(f"\n✓ 导入 {count} 条记录，写入 {len(written)} 个月度文件，"
+              f"跳过重复 {len(duplicates)} 条、无效 {len(invalid)} 行，用时 {elapsed:.2f} 秒")
+        if written:
+            if updated:
+                print("📊 汇总统计已增量更新，analyze.py 无需重新解析")
+            else:
+                print("📊 汇总统计将在下次运行 analyze.py 时重建")
+
+# 没有训练计划覆盖当天时使用的默认目标（心率 145-155 bpm，配速 6:15-6:45）
+DEFAULT_TARGET = {'hr': (145, 155), 'pace': (375, 405), 'source': '默认目标'}
 
 def compare_with_plan(date, distance, pace, avg_hr):
-    """对比训练计划"""
+    """对比当天的训练计划（training-plans/ 中当天的安排，没有时使用本月训练目标，再没有时使用默认目标）"""
+    from training_plan import DISTANCE_TOLERANCE, default_plans_dir, load_plans
+
     print("\n" + "=" * 60)
     print("与训练计划对比")
     print("=" * 60)
 
-    # 目标值（从训练计划中读取）
-    target_hr_min = 145
-    target_hr_max = 155
-    target_pace_min = "6:15"
-    target_pace_max = "6:45"
+    target = load_plans(default_plans_dir(get_project_root())).target(date)
+    if target is None:
+        print(f"\n⚠️  training-plans/ 中没有 {date} 的训练计划，使用默认目标对比")
+        target = DEFAULT_TARGET
 
     print(f"\n📊 本次训练数据:")
     print(f"  距离: {distance} km")
     print(f"  配速: {pace}")
     print(f"  心率: {avg_hr or '未记录'} bpm")
 
-    print(f"\n🎯 训练计划目标:")
-    print(f"  心率: {target_hr_min}-{target_hr_max} bpm")
-    print(f"  配速: {target_pace_min} - {target_pace_max}")
+    print(f"\n🎯 训练计划目标（{target['source']}）:")
+    if 'distance' in target:
+        low, high = target['distance']
+        print(f"  距离: {low:g} km" if low == high else f"  距离: {low:g}-{high:g} km")
+    if 'hr' in target:
+        print(f"  心率: {target['hr'][0]}-{target['hr'][1]} bpm")
+    if 'pace' in target:
+        print(f"  配速: {format_pace(target['pace'][0])} - {format_pace(target['pace'][1])}")
 
     print(f"\n✅ 完成情况:")
 
+    # 距离对比（不低于计划下限即可，超出不算未达标）
+    if 'distance' in target:
+        planned = target['distance'][0]
+        if distance >= planned * (1 - DISTANCE_TOLERANCE):
+            print(f"  ✅ 距离达标: {distance} km")
+        else:
+            print(f"  ⚠️  距离不足: {distance} km (计划 {planned:g} km)")
+
     # 心率对比
-    if avg_hr and avg_hr != '-':
+    if not avg_hr or avg_hr == '-':
+        print(f"  ⚠️  未记录心率数据")
+    elif 'hr' in target:
+        target_hr_min, target_hr_max = target['hr']
         hr_value = int(avg_hr)
         if target_hr_min <= hr_value <= target_hr_max:
             print(f"  ✅ 心率达标: {hr_value} bpm")
@@ -115,15 +522,11 @@ def compare_with_plan(date, distance, pace, avg_hr):
             over = hr_value - target_hr_max
             print(f"  ❌ 心率超标: {hr_value} bpm (超出 {over} bpm)")
             print(f"     建议: 下次降低配速，控制心率")
-    else:
-        print(f"  ⚠️  未记录心率数据")
 
     # 配速对比
     pace_seconds = pace_to_seconds(pace)
-    target_min_seconds = pace_to_seconds(target_pace_min)
-    target_max_seconds = pace_to_seconds(target_pace_max)
-
-    if pace_seconds:
+    if pace_seconds and 'pace' in target:
+        target_min_seconds, target_max_seconds = target['pace']
         if target_min_seconds <= pace_seconds <= target_max_seconds:
             print(f"  ✅ 配速达标: {pace}")
         elif pace_seconds < target_min_seconds:
@@ -136,22 +539,45 @@ def compare_with_plan(date, distance, pace, avg_hr):
 
     print("\n" + "=" * 60)
 
-def pace_to_seconds(pace_str):
-    """将配速转换为秒数"""
-    try:
-        parts = pace_str.split(':')
-        return int(parts[0]) * 60 + int(parts[1])
-    except:
-        return None
-
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='跑步记录快速录入')
+    parser.add_argument('--print-only', action='store_true',
+                        help='只输出记录行，不写入月度文件')
+    parser.add_argument('--import', dest='import_path', metavar='PATH',
+                        help='从 CSV/JSONL 文件批量导入（- 表示标准输入）')
+    parser.add_argument('--format', choices=['csv', 'jsonl'],
+                        help='导入格式（默认按扩展名或内容判断）')
+    parser.add_argument('--allow-duplicates', action='store_true',
+                        help='导入时保留与已有记录同一天的记录（默认跳过）')
+    parser.add_argument('--strict', action='store_true',
+                        help='有任何无效行时不导入')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='只校验导入数据，不写入')
+    args = parser.parse_args()
+
+    data_dir = os.path.join(get_project_root(), 'data')
+
+    if args.import_path:
+        run_import(args, data_dir)
+        return
+
     try:
-        record_line = add_running_record()
+        record_line, record = add_running_record()
 
-        print("\n💾 请将以下记录添加到月度记录文件中:")
-        print(record_line)
-        print("\n📝 记录文件位置: data/YYYY/MM-Month.md")
+        if args.print_only:
+            print("\n💾 请将以下记录添加到月度记录文件中:")
+            print(record_line)
+            print("\n📝 记录文件位置: data/YYYY/MM-Month.md")
+            return
+
+        file_path, updated = save_record(data_dir, record, record_line)
+        print(f"\n💾 已写入: {os.path.relpath(file_path, get_project_root())}")
+        if updated:
+            print("📊 汇总统计已增量更新，analyze.py 无需重新解析")
+        else:
+            print("📊 汇总统计将在下次运行 analyze.py 时重建")
+        print_new_records(data_dir, record)
 
     except KeyboardInterrupt:
         print("\n\n已取消录入")
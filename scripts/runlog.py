@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式跑步记录存储
+把 parse_markdown_table 得到的字典记录转换为 NumPy 数组，供分析、可视化、体重分析脚本共用
+"""
+
+import numpy as np
+
+from aggregates import format_pace, pace_to_seconds
+
+# 场地类别（quick_log.py 中的固定选项），其他值按出现顺序追加
+DEFAULT_VENUES = ['跑步机', '户外', '操场', '其他']
+
+# 可为空的列：值数组 + <列名>_valid 掩码
+NULLABLE_COLUMNS = ('pace', 'avg_hr', 'max_hr', 'weight', 'feeling')
+
+
+def _valid_date(value):
+    """日期能否转换为 datetime64[D]（空值会变成 NaT，也算无效）"""
+    try:
+        return not np.isnat(np.datetime64(value, 'D'))
+    except (TypeError, ValueError):
+        return False
+
+
+def _py_float(value):
+    """float32 转回 Python float，保留原始小数位（5.53 而不是 5.5300002）"""
+    return float(str(value))
+
+
+class RunLog:
+    """按列存储的跑步记录，按日期升序排列"""
+
+    def __init__(self, date, distance, duration, pace, avg_hr, max_hr, weight,
+                 venue, feeling, note, venues, valid):
+        self.date = date            # datetime64[D]
+        self.distance = distance    # float32 公里
+        self.duration = duration    # float32 分钟
+        self.pace = pace            # int16 秒/公里
+        self.avg_hr = avg_hr        # int16 bpm
+        self.max_hr = max_hr        # int16 bpm
+        self.weight = weight        # float32 kg
+        self.venue = venue          # int8 场地编码，对应 venues
+        self.feeling = feeling      # int8 1-10
+        self.note = note            # 备注（Python 字符串列表）
+        self.venues = venues
+        for name in NULLABLE_COLUMNS:
+            setattr(self, f'{name}_valid', valid[name])
+
+    @classmethod
+    def from_records(cls, records):
+        """由 parse_markdown_table 的字典记录构建，日期无效的记录被忽略"""
+        try:
+            date = np.array([r['date'] for r in records], dtype='datetime64[D]')
+            valid_dates = not np.isnat(date).any()
+        except (TypeError, ValueError):
+            valid_dates = False
+        if not valid_dates:
+            # 解析器已校验日期，这里只防御其他来源的记录
+            records = [r for r in records if _valid_date(r['date'])]
+            date = np.array([r['date'] for r in records], dtype='datetime64[D]')
+        n = len(records)
+        distance = np.fromiter((r['distance'] for r in records), dtype=np.float32, count=n)
+        duration = np.fromiter((r['duration'] for r in records), dtype=np.float32, count=n)
+
+        paces = [pace_to_seconds(r['pace']) for r in records]
+        columns = {
+            'pace': (paces, np.int16),
+            'avg_hr': ([r['avg_hr'] for r in records], np.int16),
+            'max_hr': ([r['max_hr'] for r in records], np.int16),
+            'weight': ([r['weight'] for r in records], np.float32),
+            'feeling': ([r['feeling'] for r in records], np.int8),
+        }
+        values = {}
+        valid = {}
+        for name, (raw, dtype) in columns.items():
+            valid[name] = np.fromiter((v is not None for v in raw), dtype=bool, count=n)
+            values[name] = np.fromiter((v or 0 for v in raw), dtype=dtype, count=n)
+
+        venues = list(DEFAULT_VENUES)
+        venue_index = {v: i for i, v in enumerate(venues)}
+        venue_codes = np.empty(n, dtype=np.int8)
+        for i, r in enumerate(records):
+            code = venue_index.get(r['venue'])
+            if code is None:
+                code = venue_index[r['venue']] = len(venues)
+                venues.append(r['venue'])
+            venue_codes[i] = code
+
+        note = [r['note'] for r in records]
+
+        # 按日期稳定排序，同一天多次训练保持文件中的顺序
+        order = np.argsort(date, kind='stable')
+        runlog = cls(date, distance, duration, values['pace'], values['avg_hr'],
+                     values['max_hr'], values['weight'], venue_codes, values['feeling'],
+                     note, venues, valid)
+        return runlog.take(order)
+
+    def __len__(self):
+        return len(self.date)
+
+    def take(self, index):
+        """按下标或布尔掩码选取子集"""
+        index = np.asarray(index)
+        if index.dtype == bool:
+            index = np.flatnonzero(index)
+        valid = {name: getattr(self, f'{name}_valid')[index] for name in NULLABLE_COLUMNS}
+        return RunLog(self.date[index], self.distance[index], self.duration[index],
+                      self.pace[index], self.avg_hr[index], self.max_hr[index],
+                      self.weight[index], self.venue[index], self.feeling[index],
+                      [self.note[i] for i in index], self.venues, valid)
+
+    def valid_values(self, name):
+        """返回可为空列中有数值的部分"""
+        return getattr(self, name)[getattr(self, f'{name}_valid')]
+
+    def record(self, i):
+        """取出第 i 条记录，格式与 parse_markdown_table 的字典相同"""
+        def nullable(name, convert):
+            return convert(getattr(self, name)[i]) if getattr(self, f'{name}_valid')[i] else None
+
+        return {
+            'date': str(self.date[i]),
+            'distance': _py_float(self.distance[i]),
+            'duration': _py_float(self.duration[i]),
+            'pace': format_pace(self.pace[i]) if self.pace_valid[i] else '-',
+            'avg_hr': nullable('avg_hr', int),
+            'max_hr': nullable('max_hr', int),
+            'weight': nullable('weight', _py_float),
+            'venue': self.venues[self.venue[i]],
+            'feeling': nullable('feeling', int),
+            'note': self.note[i],
+        }
+
+    def summary(self):
+        """总体统计（向量化计算）"""
+        count = len(self)
+        if count == 0:
+            return None
+
+        total_distance = float(self.distance.sum(dtype=np.float64))
+        total_duration = float(self.duration.sum(dtype=np.float64))
+        summary = {
+            'count': count,
+            'total_distance': total_distance,
+            'total_duration': total_duration,
+            'avg_distance': total_distance / count,
+            'avg_duration': total_duration / count,
+            'avg_hr': None,
+            'max_hr': None,
+            'weight': None,
+        }
+
+        avg_hrs = self.valid_values('avg_hr')
+        if len(avg_hrs):
+            summary['avg_hr'] = float(avg_hrs.mean(dtype=np.float64))
+            max_hrs = self.max_hr[self.avg_hr_valid & self.max_hr_valid]
+            summary['max_hr'] = int(max_hrs.max()) if len(max_hrs) else None
+
+        weights = self.valid_values('weight')
+        if len(weights):
+            summary['weight'] = {
+                'first': _py_float(weights[0]),
+                'latest': _py_float(weights[-1]),
+                'max': _py_float(weights.max()),
+                'min': _py_float(weights.min()),
+            }
+
+        return summary
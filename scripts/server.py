@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 HTTP 服务
+基于 asyncio 的轻量 HTTP/1.1 服务，提供统计数据的 JSON 接口和按需渲染的图表：
+
+    GET /api/overall          总体统计和当前训练负荷
+    GET /api/monthly          月度统计
+    GET /api/recent?n=5       最近几次训练
+    GET /charts/<名称>.png    图表（名称见 visualize.CHARTS）
+
+数据保存在内存中，data/ 有变化时只重新解析变化的月度文件；所有响应带 ETag，
+If-None-Match 命中时返回 304；同一图表的并发请求共享一次渲染
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from email.utils import formatdate
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from batch import monthly_rows
+from training_load import compute_training_load, METRICS
+from visualize import CHARTS, chart_fingerprint, _render_chart
+from watch import LiveData
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# 两次检查 data/ 是否变化的最短间隔（秒），频繁轮询时不必每个请求都扫描目录
+RELOAD_CHECK_SECONDS = 1.0
+
+# 连接空闲超时（秒）和请求头大小上限
+IDLE_TIMEOUT = 15
+MAX_HEADER_BYTES = 16 * 1024
+
+# 接口不使用请求体；不超过该大小的请求体读出后丢弃，更大的直接关闭连接
+MAX_DISCARD_BYTES = 64 * 1024
+
+RECENT_RUNS = 5
+MAX_RECENT_RUNS = 100
+
+STATUS_TEXT = {
+    200: 'OK',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+}
+
+
+class HTTPError(Exception):
+    """返回给客户端的错误响应"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _render_png(filename, data):
+    """子进程中渲染单个图表，返回 PNG 内容，没有数据时返回 None"""
+    output_dir = tempfile.mkdtemp(prefix='runlog-chart-')
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            _render_chart(filename, data, output_dir)
+        path = os.path.join(output_dir, filename)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def _etag(*parts):
+    """由若干字符串计算强 ETag"""
+    return '"' + hashlib.sha1('\0'.join(parts).encode('utf-8')).hexdigest()[:20] + '"'
+
+
+def _etag_matches(header, etag):
+    """If-None-Match 是否命中（支持多个值、弱标记和 *）"""
+    if not header:
+        return False
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+class Dataset:
+    """内存中的数据集：按需检查 data/ 是否变化，变化时只重新解析变化的文件"""
+
+    def __init__(self, data_dir):
+        self.live = LiveData(data_dir)
+        self.version = None
+        self.checked = 0
+        self.lock = asyncio.Lock()
+        self.json_cache = {}
+        self.load = None
+
+    def _reload(self, changed):
+        parsed = self.live.reload(changed)
+        self.load = compute_training_load(self.live.runlog)
+        return parsed
+
+    async def ensure_current(self):
+        """距离上次检查超过 RELOAD_CHECK_SECONDS 时检查 data/，有变化则重新加载（同一时间只有一次重新加载）"""
+        if self.version is not None and time.monotonic() - self.checked < RELOAD_CHECK_SECONDS:
+            return
+        async with self.lock:
+            if self.version is not None and time.monotonic() - self.checked < RELOAD_CHECK_SECONDS:
+                return
+            loop = asyncio.get_running_loop()
+            changed = await loop.run_in_executor(None, self.live.changed_files)
+            if changed or self.version is None:
+                started = time.perf_counter()
+                parsed = await loop.run_in_executor(None, self._reload,
+                                                    None if self.version is None else changed)
+                self.version = hashlib.sha1(json.dumps(self.live.sources, sort_keys=True)
+                                            .encode('utf-8')).hexdigest()
+                self.json_cache.clear()
+                print(f"已加载 {len(self.live.runlog)} 条记录（重新解析 {parsed} 个文件，"
+                      f"用时 {time.perf_counter() - started:.2f} 秒）", flush=True)
+            self.checked = time.monotonic()
+
+    def overall(self):
+        """总体统计和最后一天的训练负荷"""
+        runlog = self.live.runlog
+        result = {'summary': runlog.summary(), 'first_date': None, 'last_date': None, 'load': None}
+        if len(runlog):
+            result['first_date'] = str(runlog.date[0])
+            result['last_date'] = str(runlog.date[-1])
+        if self.load is not None:
+            distance = METRICS.index('distance')
+            hr_load = METRICS.index('load')
+            acwr = float(self.load['acwr'][-1])
+            ramp = float(self.load['ramp'][-1])
+            result['load'] = {
+                'acute_distance': round(float(self.load['acute'][distance, -1]), 2),
+                'chronic_distance': round(float(self.load['chronic'][distance, -1]), 2),
+                'acute_load': round(float(self.load['acute'][hr_load, -1]), 1),
+                'chronic_load': round(float(self.load['chronic'][hr_load, -1]), 1),
+                'acwr': None if np.isnan(acwr) else round(acwr, 3),
+                'load_ramp': None if np.isnan(ramp) else round(ramp, 1),
+            }
+        return result
+
+    def monthly(self):
+        """月度统计"""
+        return monthly_rows(self.live.monthly_stats)
+
+    def recent(self, n):
+        """最近 n 次训练（按日期倒序）"""
+        runlog = self.live.runlog
+        return [runlog.record(i) for i in range(len(runlog) - 1, max(len(runlog) - n, 0) - 1, -1)]
+
+
+class ChartRenderer:
+    """按图表输入数据的指纹缓存 PNG，同一指纹的并发请求共享一次渲染"""
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.rendered = {}
+        self.inflight = {}
+        self.fingerprints = {}
+
+    async def get(self, filename, dataset):
+        """返回 (PNG 内容或 None, ETag)"""
+        runlog = dataset.live.runlog
+        monthly_stats = dataset.live.monthly_stats
+        # 同一数据版本下指纹不变，不必每个请求都重新计算
+        fingerprint = self.fingerprints.get((dataset.version, filename))
+        if fingerprint is None:
+            fingerprint = chart_fingerprint(filename, runlog, monthly_stats)
+            self.fingerprints = {key: value for key, value in self.fingerprints.items()
+                                 if key[0] == dataset.version}
+            self.fingerprints[(dataset.version, filename)] = fingerprint
+        etag = f'"{fingerprint[:20]}"'
+
+        cached = self.rendered.get(filename)
+        if cached and cached[0] == fingerprint:
+            return cached[1], etag
+
+        key = (filename, fingerprint)
+        future = self.inflight.get(key)
+        if future is None:
+            _, source, _ = CHARTS[filename]
+            data = runlog if source == 'runlog' else dict(monthly_stats)
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, _render_png, filename, data)
+            self.inflight[key] = future
+            try:
+                png = await future
+            finally:
+                del self.inflight[key]
+            self.rendered[filename] = (fingerprint, png)
+            return png, etag
+        return await future, etag
+
+
+class RunLogServer:
+    """路由和 HTTP/1.1 连接处理（支持 keep-alive、GET/HEAD、条件请求）"""
+
+    def __init__(self, data_dir, render_jobs=None):
+        self.dataset = Dataset(data_dir)
+        self.executor = ProcessPoolExecutor(max_workers=render_jobs or min(4, os.cpu_count() or 1))
+        self.charts = ChartRenderer(self.executor)
+
+    async def handle(self, reader, writer):
+        """处理一个连接上的所有请求"""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), IDLE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._send(writer, 400, {'error': '请求头过大'}, close=True)
+                    break
+
+                keep_alive = await self._handle_request(head, reader, writer)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def _discard_body(self, headers, reader):
+        """读出并丢弃请求体，返回连接能否继续使用（请求体无法完整读出时为 False）"""
+        if 'transfer-encoding' in headers:
+            return False
+        try:
+            length = int(headers.get('content-length', '0'))
+        except ValueError:
+            return False
+        if length == 0:
+            return True
+        if not 0 < length <= MAX_DISCARD_BYTES:
+            return False
+        try:
+            await asyncio.wait_for(reader.readexactly(length), IDLE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            return False
+        return True
+
+    async def _handle_request(self, head, reader, writer):
+        """处理一个请求，返回连接是否保持"""
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            await self._send(writer, 400, {'error': '无法解析请求行'}, close=True)
+            return False
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        head_only = method == 'HEAD'
+        # 留在流中的请求体会被当成下一个请求的请求行；不支持的方法回复后总是关闭连接
+        if not await self._discard_body(headers, reader) or method not in ('GET', 'HEAD'):
+            keep_alive = False
+
+        try:
+            if method not in ('GET', 'HEAD'):
+                raise HTTPError(405, f'不支持的方法: {method}')
+            status, body, content_type, etag = await self._route(target)
+        except HTTPError as e:
+            status, body, content_type, etag = e.status, {'error': e.message}, None, None
+        except Exception as e:
+            status, body, content_type, etag = 500, {'error': f'{type(e).__name__}: {e}'}, None, None
+
+        if etag and _etag_matches(headers.get('if-none-match'), etag):
+            status, body = 304, b''
+        await self._send(writer, status, body, content_type, etag, close=not keep_alive,
+                         head_only=head_only)
+        return keep_alive
+
+    async def _route(self, target):
+        """返回 (状态码, 响应体, Content-Type, ETag)"""
+        url = urlsplit(target)
+        path = url.path
+        query = parse_qs(url.query)
+        dataset = self.dataset
+        await dataset.ensure_current()
+
+        if path.startswith('/charts/'):
+            filename = path[len('/charts/'):]
+            if filename not in CHARTS:
+                raise HTTPError(404, f'没有这个图表: {filename}')
+            png, etag = await self.charts.get(filename, dataset)
+            if png is None:
+                raise HTTPError(404, '暂无数据，无法生成该图表')
+            return 200, png, 'image/png', etag
+
+        if path == '/api/overall':
+            key, build = 'overall', dataset.overall
+        elif path == '/api/monthly':
+            key, build = 'monthly', dataset.monthly
+        elif path == '/api/recent':
+            try:
+                n = int(query.get('n', [RECENT_RUNS])[0])
+            except ValueError:
+                raise HTTPError(400, 'n 必须是整数')
+            n = max(1, min(n, MAX_RECENT_RUNS))
+            key, build = f'recent:{n}', lambda: dataset.recent(n)
+        elif path in ('/', '/api'):
+            key, build = 'index', lambda: {
+                'endpoints': ['/api/overall', '/api/monthly', '/api/recent?n=5'],
+                'charts': [f'/charts/{name}' for name in CHARTS],
+            }
+        else:
+            raise HTTPError(404, f'没有这个地址: {path}')
+
+        # 同一数据版本下响应不变：ETag 只取决于版本和接口，命中 304 时不需要序列化
+        etag = _etag(dataset.version, key)
+        body = dataset.json_cache.get(key)
+        if body is None:
+            body = json.dumps(build(), ensure_ascii=False).encode('utf-8')
+            dataset.json_cache[key] = body
+        return 200, body, 'application/json; charset=utf-8', etag
+
+    async def _send(self, writer, status, body, content_type=None, etag=None, close=False,
+                    head_only=False):
+        """写出响应"""
+        if isinstance(body, dict):
+            body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        headers = [
+            f'HTTP/1.1 {status} {STATUS_TEXT.get(status, "")}',
+            f'Date: {formatdate(usegmt=True)}',
+            'Server: runlog',
+            f'Content-Length: {len(body)}',
+        ]
+        if content_type and status != 304:
+            headers.append(f'Content-Type: {content_type}')
+        if etag:
+            headers.append(f'ETag: {etag}')
+            headers.append('Cache-Control: no-cache')
+        if close:
+            headers.append('Connection: close')
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1'))
+        if not head_only and status != 304:
+            writer.write(body)
+        with contextlib.suppress(ConnectionError):
+            await writer.drain()
+
+    async def serve(self, host, port):
+        """加载数据并开始监听"""
+        await self.dataset.ensure_current()
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        print(f"服务已启动: http://{host}:{port}/（按 Ctrl+C 退出）", flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='本地 HTTP 服务：统计数据 JSON 接口和图表')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'监听地址（默认 {DEFAULT_HOST}）')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'端口（默认 {DEFAULT_PORT}）')
+    parser.add_argument('--render-jobs', type=int, default=None,
+                        help='渲染图表的进程数（默认 CPU 核数，最多 4）')
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(script_dir)
+    data_dir = os.path.join(project_dir, 'data')
+
+    if not os.path.exists(data_dir):
+        print("错误: 找不到data目录")
+        return
+
+    server = RunLogServer(data_dir, args.render_jobs)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+    finally:
+        server.executor.shutdown(cancel_futures=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跑步记录二进制快照
+把 analyze_data() 解析出的记录按列导出为 .npy 文件，加载时内存映射、不复制数据
+data/ 下的 Markdown 文件仍是唯一数据源，快照记录了源文件签名用于过期检查
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from parse_cache import ParseCache, default_cache_dir, file_digest, file_signature
+from analyze import add_common_arguments, analyze_data, list_month_files, print_diagnostics
+from runlog import NULLABLE_COLUMNS, RunLog
+
+SNAPSHOT_VERSION = 1
+
+# 数值列（备注单独按 Arrow 风格存为 UTF-8 字节 + 偏移量）
+ARRAY_COLUMNS = ('date', 'distance', 'duration', 'pace', 'avg_hr', 'max_hr',
+                 'weight', 'venue', 'feeling')
+
+
+class SnapshotError(Exception):
+    """快照不存在、版本不兼容或已损坏"""
+
+
+class NoteColumn:
+    """按需解码的备注列，底层是内存映射的字节和偏移量"""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return bytes(self.data[start:end]).decode('utf-8')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def default_snapshot_dir(data_dir):
+    """默认快照目录：.cache/snapshot"""
+    return os.path.join(default_cache_dir(data_dir), 'snapshot')
+
+
+def source_signatures(data_dir):
+    """记录所有月度文件的签名，键为相对 data 目录的路径"""
+    sources = {}
+    for _, file_path in list_month_files(data_dir):
+        mtime_ns, size = file_signature(file_path)
+        sources[os.path.relpath(file_path, data_dir)] = {
+            'mtime_ns': mtime_ns,
+            'size': size,
+            'digest': file_digest(file_path),
+        }
+    return sources
+
+
+def export_snapshot(runlog, snapshot_dir, data_dir):
+    """把 RunLog 导出为快照目录"""
+    tmp_dir = snapshot_dir.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = {name: getattr(runlog, name) for name in ARRAY_COLUMNS}
+    for name in NULLABLE_COLUMNS:
+        columns[f'{name}_valid'] = getattr(runlog, f'{name}_valid')
+
+    encoded = [note.encode('utf-8') for note in runlog.note]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    columns['note_data'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    columns['note_offsets'] = offsets
+
+    for name, values in columns.items():
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(values))
+
+    meta = {
+        'schema_version': SNAPSHOT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'count': len(runlog),
+        'venues': runlog.venues,
+        'sources': source_signatures(data_dir),
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    os.replace(tmp_dir, snapshot_dir)
+    return meta
+
+
+def read_meta(snapshot_dir):
+    """读取快照元数据并检查版本"""
+    meta_path = os.path.join(snapshot_dir, 'meta.json')
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except OSError:
+        raise SnapshotError(f"找不到快照: {snapshot_dir}")
+    except ValueError as e:
+        raise SnapshotError(f"快照元数据损坏: {e}")
+
+    if meta.get('schema_version') != SNAPSHOT_VERSION:
+        raise SnapshotError(f"快照版本 {meta.get('schema_version')} 与当前版本 "
+                            f"{SNAPSHOT_VERSION} 不兼容，请重新导出")
+    return meta
+
+
+def load_snapshot(snapshot_dir, mmap=True):
+    """加载快照为 RunLog；mmap=True 时所有列都是只读内存映射，不复制数据"""
+    meta = read_meta(snapshot_dir)
+    mmap_mode = 'r' if mmap else None
+
+    def load(name):
+        return np.load(os.path.join(snapshot_dir, f'{name}.npy'), mmap_mode=mmap_mode)
+
+    try:
+        columns = {name: load(name) for name in ARRAY_COLUMNS}
+        valid = {name: load(f'{name}_valid') for name in NULLABLE_COLUMNS}
+        note = NoteColumn(load('note_data'), load('note_offsets'))
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"快照数据损坏: {e}")
+
+    if len(columns['date']) != meta['count']:
+        raise SnapshotError("快照记录数与元数据不一致")
+
+    return RunLog(note=note, venues=meta['venues'], valid=valid, **columns)
+
+
+def stale_sources(snapshot_dir, data_dir):
+    """返回快照之后新增、修改或删除的月度文件（相对路径列表），为空表示快照是最新的"""
+    recorded = read_meta(snapshot_dir)['sources']
+    stale = []
+    current = set()
+    for _, file_path in list_month_files(data_dir):
+        rel_path = os.path.relpath(file_path, data_dir)
+        current.add(rel_path)
+        entry = recorded.get(rel_path)
+        if entry is None:
+            stale.append(rel_path)
+            continue
+        if (entry['mtime_ns'], entry['size']) == file_signature(file_path):
+            continue
+        # 修改时间变了但内容没变（例如 touch、git checkout）不算过期
+        if entry['digest'] != file_digest(file_path):
+            stale.append(rel_path)
+
+    stale.extend(sorted(set(recorded) - current))
+    return stale
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='跑步记录二进制快照导出/检查')
+    parser.add_argument('command', choices=['export', 'info'],
+                        help='export: 解析data目录并导出快照；info: 查看快照信息和是否过期')
+    parser.add_argument('--snapshot', default=None,
+                        help='快照目录（默认 .cache/snapshot）')
+    add_common_arguments(parser)
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(script_dir)
+    data_dir = os.path.join(project_dir, 'data')
+    snapshot_dir = args.snapshot or default_snapshot_dir(data_dir)
+
+    if not os.path.exists(data_dir):
+        print("错误: 找不到data目录")
+        return
+
+    if args.command == 'export':
+        cache = ParseCache.for_data_dir(data_dir)
+        diagnostics = []
+        all_records, _ = analyze_data(data_dir, cache=cache, diagnostics=diagnostics,
+                                      jobs=args.jobs)
+        print_diagnostics(diagnostics)
+        print(cache.report())
+
+        meta = export_snapshot(RunLog.from_records(all_records), snapshot_dir, data_dir)
+        print(f"✓ 已导出 {meta['count']} 条记录到: {snapshot_dir}")
+        return
+
+    try:
+        meta = read_meta(snapshot_dir)
+        stale = stale_sources(snapshot_dir, data_dir)
+    except SnapshotError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    print(f"快照目录: {snapshot_dir}")
+    print(f"格式版本: {meta['schema_version']}")
+    print(f"导出时间: {meta['created']}")
+    print(f"记录数: {meta['count']}")
+    if stale:
+        print(f"⚠️  快照已过期，以下文件有变化: {', '.join(stale)}")
+        print("   请重新运行: python scripts/snapshot.py export")
+    else:
+        print("✅ 快照与data目录一致")
+
+
+if __name__ == '__main__':
+    main()
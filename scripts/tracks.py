@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运动轨迹导入
+流式读取 GPX / TCX / FIT 轨迹文件（不把整个文档读进内存），重采样为每秒一个点的心率、速度、步频序列，
+以 .npz 保存在 tracks/YYYY/ 下，并由轨迹自动得到距离、时长、平均/最大心率，写入对应日期的月度表格
+"""
+
+import argparse
+import math
+import os
+import struct
+import sys
+import xml.etree.ElementTree as ET
+from array import array
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from quick_log import calculate_pace, format_record_line, get_project_root, make_record, save_records
+
+TRACK_VERSION = 1
+
+# 相邻两个点间隔超过该秒数视为暂停，暂停期间不计入时长和心率
+MAX_GAP_SECONDS = 10
+
+# FIT 时间戳从 1989-12-31 00:00 UTC 开始
+FIT_EPOCH = 631065600
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def default_tracks_dir(project_dir=None):
+    """默认轨迹目录：项目根目录下的 tracks/"""
+    return os.path.join(project_dir or get_project_root(), 'tracks')
+
+
+class TrackPoints:
+    """流式解析时累积的原始轨迹点，缺失值为 nan"""
+
+    FIELDS = ('time', 'lat', 'lon', 'distance', 'speed', 'hr', 'cadence')
+
+    def __init__(self):
+        for name in self.FIELDS:
+            setattr(self, name, array('d'))
+
+    def append(self, time, lat=None, lon=None, distance=None, speed=None, hr=None, cadence=None):
+        nan = math.nan
+        self.time.append(time)
+        self.lat.append(nan if lat is None else lat)
+        self.lon.append(nan if lon is None else lon)
+        self.distance.append(nan if distance is None else distance)
+        self.speed.append(nan if speed is None else speed)
+        self.hr.append(nan if hr is None else hr)
+        self.cadence.append(nan if cadence is None else cadence)
+
+    def __len__(self):
+        return len(self.time)
+
+    def arrays(self):
+        return {name: np.frombuffer(getattr(self, name), dtype=np.float64) for name in self.FIELDS}
+
+
+def _parse_time(text):
+    """ISO 8601 时间转为 Unix 秒"""
+    text = text.strip().replace('Z', '+00:00')
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _float(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def _iter_xml_points(path, point_tag):
+    """iterparse 逐个产出轨迹点元素的 {子元素名: 文本}，处理完即从父元素移除，内存占用与轨迹长度无关"""
+    stack = []
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            continue
+        stack.pop()
+        if _local_name(elem.tag) != point_tag:
+            continue
+        values = {_local_name(child.tag): child.text for child in elem.iter()}
+        values.update(elem.attrib)
+        if stack:
+            stack[-1].remove(elem)
+        elem.clear()
+        yield values
+
+
+def read_gpx(path):
+    """读取 GPX：trkpt 的经纬度、时间，以及 Garmin TrackPointExtension 中的心率和步频"""
+    points = TrackPoints()
+    for values in _iter_xml_points(path, 'trkpt'):
+        if not values.get('time'):
+            continue
+        points.append(_parse_time(values['time']), lat=_float(values.get('lat')),
+                      lon=_float(values.get('lon')), hr=_float(values.get('hr')),
+                      cadence=_float(values.get('cad')))
+    return points
+
+
+def read_tcx(path):
+    """读取 TCX：Trackpoint 的时间、经纬度、累计距离、心率、步频和速度"""
+    points = TrackPoints()
+    for values in _iter_xml_points(path, 'Trackpoint'):
+        if not values.get('Time'):
+            continue
+        points.append(_parse_time(values['Time']), lat=_float(values.get('LatitudeDegrees')),
+                      lon=_float(values.get('LongitudeDegrees')),
+                      distance=_float(values.get('DistanceMeters')),
+                      speed=_float(values.get('Speed')),
+                      # HeartRateBpm 下的 Value
+                      hr=_float(values.get('Value')),
+                      cadence=_float(values.get('RunCadence') or values.get('Cadence')))
+    return points
+
+
+# FIT record 消息（全局编号 20）中用到的字段：编号 -> (名称, 缩放)
+FIT_RECORD_FIELDS = {
+    253: ('timestamp', 1),
+    0: ('lat', 180 / 2 ** 31),
+    1: ('lon', 180 / 2 ** 31),
+    3: ('hr', 1),
+    4: ('cadence', 1),
+    5: ('distance', 1 / 100),
+    6: ('speed', 1 / 1000),
+    73: ('enhanced_speed', 1 / 1000),
+}
+
+# FIT 基本类型的无效值，按 (字节数, 是否有符号)
+FIT_INVALID = {(1, False): 0xFF, (2, False): 0xFFFF, (4, False): 0xFFFFFFFF, (4, True): 0x7FFFFFFF}
+FIT_SIGNED_TYPES = {0x01, 0x83, 0x85, 0x8E}
+
+
+def _read_exact(f, size):
+    """读取 size 个字节，文件提前结束时抛出 ValueError"""
+    data = f.read(size)
+    if len(data) < size:
+        raise ValueError("FIT 文件不完整")
+    return data
+
+
+def read_fit(path):
+    """读取 FIT：按消息流顺序解码，只取 record 消息的时间、位置、心率、步频、距离、速度"""
+    points = TrackPoints()
+    definitions = {}
+    last_timestamp = None
+
+    with open(path, 'rb') as f:
+        header_size = _read_exact(f, 1)[0]
+        if header_size < 12:
+            raise ValueError(f"不是 FIT 文件: {path}")
+        header = _read_exact(f, header_size - 1)
+        data_size = struct.unpack('<I', header[3:7])[0]
+        if header[7:11] != b'.FIT':
+            raise ValueError(f"不是 FIT 文件: {path}")
+
+        remaining = data_size
+        while remaining > 0:
+            record_header = _read_exact(f, 1)[0]
+            remaining -= 1
+            time_offset = None
+
+            if record_header & 0x80:
+                # 压缩时间戳的数据消息
+                local_type = (record_header >> 5) & 0x03
+                time_offset = record_header & 0x1F
+            elif record_header & 0x40:
+                # 定义消息
+                local_type = record_header & 0x0F
+                fixed = _read_exact(f, 5)
+                big_endian = fixed[1] == 1
+                global_num = struct.unpack('>H' if big_endian else '<H', fixed[2:4])[0]
+                field_count = fixed[4]
+                fields = [tuple(_read_exact(f, 3)) for _ in range(field_count)]
+                remaining -= 5 + 3 * field_count
+                developer_size = 0
+                if record_header & 0x20:
+                    dev_count = _read_exact(f, 1)[0]
+                    developer_size = sum(field[1] for field in (tuple(_read_exact(f, 3)) for _ in range(dev_count)))
+                    remaining -= 1 + 3 * dev_count
+                definitions[local_type] = (global_num, big_endian, fields, developer_size)
+                continue
+            else:
+                local_type = record_header & 0x0F
+
+            if local_type not in definitions:
+                raise ValueError(f"FIT 数据消息缺少定义（本地类型 {local_type}）")
+            global_num, big_endian, fields, developer_size = definitions[local_type]
+            size = sum(field[1] for field in fields) + developer_size
+            data = _read_exact(f, size)
+            remaining -= size
+            if global_num != 20:
+                continue
+
+            values = {}
+            offset = 0
+            byteorder = 'big' if big_endian else 'little'
+            for number, field_size, base_type in fields:
+                if number in FIT_RECORD_FIELDS and field_size in (1, 2, 4):
+                    signed = base_type in FIT_SIGNED_TYPES
+                    raw = int.from_bytes(data[offset:offset + field_size], byteorder, signed=signed)
+                    if raw != FIT_INVALID.get((field_size, signed)):
+                        name, scale = FIT_RECORD_FIELDS[number]
+                        values[name] = raw * scale
+                offset += field_size
+
+            if 'timestamp' in values:
+                last_timestamp = int(values['timestamp'])
+            elif time_offset is not None and last_timestamp is not None:
+                base = last_timestamp & ~0x1F
+                last_timestamp = base + time_offset + (0x20 if time_offset < (last_timestamp & 0x1F) else 0)
+            else:
+                continue
+
+            points.append(last_timestamp + FIT_EPOCH, lat=values.get('lat'), lon=values.get('lon'),
+                          distance=values.get('distance'),
+                          speed=values.get('enhanced_speed', values.get('speed')),
+                          hr=values.get('hr'), cadence=values.get('cadence'))
+    return points
+
+
+READERS = {'.gpx': read_gpx, '.tcx': read_tcx, '.fit': read_fit}
+
+
+def read_track(path):
+    """按扩展名选择解析器"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in READERS:
+        raise ValueError(f"不支持的轨迹格式: {path}（支持 {', '.join(READERS)}）")
+    return READERS[ext](path)
+
+
+def _cumulative_distance(points):
+    """每个点的累计距离（米）：优先使用设备记录的距离，否则按经纬度计算大圆距离"""
+    if not np.isnan(points['distance']).all():
+        distance = points['distance'].copy()
+        valid = ~np.isnan(distance)
+        distance[~valid] = np.interp(np.flatnonzero(~valid), np.flatnonzero(valid), distance[valid])
+        return np.maximum.accumulate(distance - distance[0])
+
+    lat = np.radians(points['lat'])
+    lon = np.radians(points['lon'])
+    if np.isnan(lat).all():
+        return np.zeros(len(lat))
+    dlat = np.diff(lat)
+    dlon = np.diff(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    step = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    return np.concatenate(([0.0], np.cumsum(np.nan_to_num(step))))
+
+
+def _interp_valid(grid, t, values, max_gap):
+    """对有效值插值到每秒，离最近的有效点超过 max_gap 秒的位置为 nan"""
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return np.full(len(grid), np.nan)
+    tv = t[valid]
+    result = np.interp(grid, tv, values[valid])
+    right = np.clip(np.searchsorted(tv, grid), 0, len(tv) - 1)
+    left = np.clip(right - 1, 0, len(tv) - 1)
+    nearest = np.minimum(np.abs(tv[right] - grid), np.abs(grid - tv[left]))
+    result[nearest > max_gap] = np.nan
+    return result
+
+
+def resample(points, max_gap=MAX_GAP_SECONDS):
+    """把原始轨迹点重采样为每秒一个点
+
+    返回字典：start（Unix 秒）、hr（bpm，缺失为 nan）、speed（m/s）、cadence（步/分，缺失为 nan）、
+    moving（是否在运动，暂停期间为 False）
+    """
+    raw = points.arrays()
+    order = np.argsort(raw['time'], kind='stable')
+    raw = {name: values[order] for name, values in raw.items()}
+    t = raw['time'] - raw['time'][0]
+    # 同一秒内的多个点只保留第一个
+    keep = np.concatenate(([True], np.diff(t) > 0))
+    raw = {name: values[keep] for name, values in raw.items()}
+    t = t[keep]
+
+    grid = np.arange(int(t[-1]) + 1, dtype=np.float64)
+    distance = np.interp(grid, t, _cumulative_distance(raw))
+
+    # 落在大于 max_gap 的间隔内的秒为暂停
+    right = np.clip(np.searchsorted(t, grid), 0, len(t) - 1)
+    gap = t[right] - t[np.maximum(right - 1, 0)]
+    moving = ~((gap > max_gap) & (t[right] != grid))
+
+    speed = np.diff(distance, prepend=distance[0])
+    speed[~moving] = 0
+
+    hr = _interp_valid(grid, t, raw['hr'], max_gap)
+    hr[~moving] = np.nan
+    cadence = _interp_valid(grid, t, raw['cadence'], max_gap)
+    cadence[~moving] = np.nan
+    # Garmin 等设备记录的是单脚步频，换算为双脚
+    if not np.isnan(cadence).all() and np.nanmedian(cadence) < 120:
+        cadence *= 2
+
+    return {'start': int(raw['time'][0]), 'hr': hr, 'speed': speed, 'cadence': cadence,
+            'moving': moving}
+
+
+def summarize(track):
+    """由每秒序列得到月度表格的汇总字段"""
+    moving = track['moving']
+    hr = track['hr'][moving & ~np.isnan(track['hr'])]
+    cadence = track['cadence'][moving & ~np.isnan(track['cadence'])]
+    distance_km = round(float(track['speed'].sum()) / 1000, 2)
+    duration_min = round(float(moving.sum()) / 60, 2)
+    return {
+        'date': track_date(track),
+        'distance': distance_km,
+        'duration': duration_min,
+        'pace': calculate_pace(distance_km, duration_min) if distance_km > 0 else '-',
+        'avg_hr': int(round(hr.mean())) if len(hr) else None,
+        'max_hr': int(hr.max()) if len(hr) else None,
+        'cadence': int(round(np.median(cadence))) if len(cadence) else None,
+    }
+
+
+def track_date(track):
+    """轨迹开始时间对应的本地日期"""
+    return datetime.fromtimestamp(track['start']).strftime('%Y-%m-%d')
+
+
+def track_path(tracks_dir, track):
+    """轨迹文件位置：tracks/YYYY/YYYY-MM-DD-HHMMSS.npz（本地时间）"""
+    start = datetime.fromtimestamp(track['start'])
+    return os.path.join(tracks_dir, f"{start:%Y}", f"{start:%Y-%m-%d-%H%M%S}.npz")
+
+
+def save_track(path, track):
+    """以紧凑的整数数组保存：心率/步频 uint8（0 为缺失）、速度 uint16（毫米/秒）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    np.savez_compressed(
+        tmp_path,
+        version=np.int16(TRACK_VERSION),
+        start=np.int64(track['start']),
+        hr=np.nan_to_num(np.round(track['hr']), nan=0).clip(0, 255).astype(np.uint8),
+        speed=np.round(track['speed'] * 1000).clip(0, 65535).astype(np.uint16),
+        cadence=np.nan_to_num(np.round(track['cadence']), nan=0).clip(0, 255).astype(np.uint8),
+        moving=track['moving'])
+    os.replace(tmp_path, path)
+
+
+def load_track(path):
+    """读取轨迹文件，返回与 resample() 相同格式的字典"""
+    with np.load(path) as data:
+        if int(data['version']) != TRACK_VERSION:
+            raise ValueError(f"轨迹格式版本不符: {path}")
+        hr = data['hr'].astype(np.float64)
+        cadence = data['cadence'].astype(np.float64)
+        hr[hr == 0] = np.nan
+        cadence[cadence == 0] = np.nan
+        return {'start': int(data['start']), 'hr': hr, 'speed': data['speed'] / 1000,
+                'cadence': cadence, 'moving': data['moving']}
+
+
+def tracks_by_date(tracks_dir):
+    """按日期列出已保存的轨迹：{YYYY-MM-DD: [文件路径]}"""
+    result = {}
+    if not os.path.isdir(tracks_dir):
+        return result
+    for year in sorted(os.listdir(tracks_dir)):
+        year_path = os.path.join(tracks_dir, year)
+        if not os.path.isdir(year_path):
+            continue
+        for name in sorted(os.listdir(year_path)):
+            if name.endswith('.npz'):
+                result.setdefault(name[:10], []).append(os.path.join(year_path, name))
+    return result
+
+
+def import_tracks(paths, tracks_dir, data_dir=None, venue='户外', weight=None, feeling=None,
+                  skip_duplicates=True):
+    """导入轨迹文件，保存每秒序列；data_dir 不为 None 时把汇总行写入月度表格
+
+    返回 [(源文件, 轨迹文件, 汇总)]
+    """
+    imported = []
+    entries = []
+    for path in paths:
+        try:
+            points = read_track(path)
+        except (ValueError, ET.ParseError) as e:
+            print(f"⚠️  无法读取，跳过: {path}（{e}）")
+            continue
+        if len(points) < 2:
+            print(f"⚠️  轨迹点不足，跳过: {path}")
+            continue
+        track = resample(points)
+        output_path = track_path(tracks_dir, track)
+        save_track(output_path, track)
+        summary = summarize(track)
+        imported.append((path, output_path, summary))
+
+        note = f"步频{summary['cadence']},轨迹导入" if summary['cadence'] else "轨迹导入"
+        args = (summary['date'], summary['distance'], summary['duration'], summary['pace'],
+                summary['avg_hr'], summary['max_hr'], weight, venue, feeling, note)
+        entries.append((make_record(*args), format_record_line(*args)))
+
+    if data_dir is not None and entries:
+        _, count, duplicates, _ = save_records(data_dir, entries, skip_duplicates)
+        for record in duplicates:
+            print(f"· {record['date']} 已有记录，未写入表格（轨迹已保存）")
+        print(f"📝 写入 {count} 条汇总记录")
+    return imported
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='导入 GPX/TCX/FIT 运动轨迹')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='导入轨迹文件')
+    import_parser.add_argument('files', nargs='+', help='GPX/TCX/FIT 文件')
+    import_parser.add_argument('--venue', default='户外', help='场地（默认户外）')
+    import_parser.add_argument('--weight', type=float, help='当天体重 (kg)')
+    import_parser.add_argument('--feeling', type=int, help='感受评分 (1-10)')
+    import_parser.add_argument('--no-log', action='store_true', help='只保存轨迹，不写入月度表格')
+    import_parser.add_argument('--allow-duplicates', action='store_true',
+                               help='当天已有记录时仍写入汇总行')
+
+    info_parser = subparsers.add_parser('info', help='查看已保存的轨迹')
+    info_parser.add_argument('date', nargs='?', help='只看某一天 YYYY-MM-DD')
+
+    parser.add_argument('--tracks', default=None, help='轨迹目录（默认 tracks/）')
+    args = parser.parse_args()
+
+    project_dir = get_project_root()
+    tracks_dir = args.tracks or default_tracks_dir(project_dir)
+
+    if args.command == 'import':
+        data_dir = None if args.no_log else os.path.join(project_dir, 'data')
+        imported = import_tracks(args.files, tracks_dir, data_dir, args.venue, args.weight,
+                                 args.feeling, skip_duplicates=not args.allow_duplicates)
+        for source, output_path, s in imported:
+            print(f"✓ {os.path.basename(source)} → {os.path.relpath(output_path, project_dir)}: "
+                  f"{s['date']} {s['distance']}km {s['duration']}分钟 {s['pace']} "
+                  f"心率{s['avg_hr'] or '-'}/{s['max_hr'] or '-'}bpm 步频{s['cadence'] or '-'}")
+        return
+
+    for day, paths in tracks_by_date(tracks_dir).items():
+        if args.date and day != args.date:
+            continue
+        for path in paths:
+            s = summarize(load_track(path))
+            print(f"{day}  {os.path.basename(path)}  {s['distance']}km  {s['duration']}分钟  "
+                  f"心率{s['avg_hr'] or '-'}/{s['max_hr'] or '-'}bpm")
+
+
+if __name__ == '__main__':
+    main()
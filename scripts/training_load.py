@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滚动训练负荷
+把跑步记录按天重采样为距离、时长、心率负荷序列，用前缀和计算 7 天（急性）和 28 天（慢性）滚动合计，
+得到急慢性负荷比（ACWR）和周环比增幅
+"""
+
+import numpy as np
+
+from aggregates import LOAD_WINDOW_DAYS
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+
+# 负荷指标，对应 daily 矩阵的行
+METRICS = ('distance', 'duration', 'load')
+
+# ACWR 区间：(上限, 说明)
+ACWR_ZONES = [
+    (0.8, '负荷偏低'),
+    (1.3, '适宜区间'),
+    (1.5, '负荷偏高'),
+    (float('inf'), '受伤风险高'),
+]
+
+
+def _recorded(values):
+    """float32 列还原为表格中记录的两位小数，累加结果与逐条相加的 Python float 一致"""
+    return np.round(values.astype(np.float64), 2)
+
+
+def hr_load(runlog):
+    """每次训练的心率负荷：时长(分钟) × 平均心率 / 100，缺失心率用平均心率代替"""
+    duration = _recorded(runlog.duration)
+    if runlog.avg_hr_valid.any():
+        mean_hr = runlog.valid_values('avg_hr').mean()
+        avg_hr = np.where(runlog.avg_hr_valid, runlog.avg_hr, mean_hr)
+    else:
+        avg_hr = np.full(len(runlog), 100.0)
+    return duration * avg_hr / 100
+
+
+def daily_series(runlog, end=None):
+    """按天重采样，返回 (日期数组, 3×天数 的负荷矩阵)，没有训练的日子为 0
+
+    end 为截止日期（默认最后一次训练），晚于最后一次训练时末尾补 0
+    """
+    start = runlog.date[0]
+    last = runlog.date[-1] if end is None else max(np.datetime64(end, 'D'), runlog.date[-1])
+    days = int((last - start).astype(np.int64)) + 1
+    index = (runlog.date - start).astype(np.int64)
+
+    daily = np.empty((len(METRICS), days))
+    for row, weights in enumerate((_recorded(runlog.distance), _recorded(runlog.duration),
+                                    hr_load(runlog))):
+        daily[row] = np.bincount(index, weights=weights, minlength=days)
+    return start + np.arange(days).astype('timedelta64[D]'), daily
+
+
+def rolling_sum(values, window):
+    """沿最后一维的滚动合计（含当天），用前缀和一次算出，O(n)"""
+    prefix = np.cumsum(values, axis=-1)
+    result = prefix.copy()
+    result[..., window:] -= prefix[..., :-window]
+    return result
+
+
+def _rolling_load(dates, daily, first_date):
+    """由每日负荷矩阵计算急性、慢性负荷，ACWR 和周环比"""
+    # 前缀和相减会留下累积的浮点误差，舍入后结果只取决于窗口内的数据
+    acute = np.round(rolling_sum(daily, ACUTE_DAYS), 6)
+    chronic = np.round(rolling_sum(daily, CHRONIC_DAYS), 6) / (CHRONIC_DAYS / ACUTE_DAYS)
+
+    load = METRICS.index('load')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        acwr = np.where(chronic[load] > 0, acute[load] / chronic[load], np.nan)
+        ramp = np.full(len(dates), np.nan)
+        previous = acute[load, :-ACUTE_DAYS]
+        ramp[ACUTE_DAYS:] = np.where(previous > 0,
+                                     (acute[load, ACUTE_DAYS:] - previous) / previous * 100, np.nan)
+    # 距第一次训练不满 28 天时慢性负荷不完整
+    acwr[dates < np.datetime64(first_date, 'D') + np.timedelta64(CHRONIC_DAYS - 1, 'D')] = np.nan
+
+    return {
+        'date': dates,
+        'daily': daily,
+        'acute': acute,
+        'chronic': chronic,
+        'acwr': acwr,
+        'ramp': ramp,
+    }
+
+
+def compute_training_load(runlog, end=None):
+    """计算每日的急性、慢性负荷，ACWR 和周环比，没有记录时返回 None
+
+    返回字典：date, daily, acute（7 天合计）, chronic（28 天合计折算为周均值），
+    acwr 和 ramp（心率负荷，前 28 天数据不足时为 nan）
+    """
+    if not len(runlog):
+        return None
+
+    dates, daily = daily_series(runlog, end)
+    return _rolling_load(dates, daily, dates[0])
+
+
+def training_load_from_state(aggregate):
+    """由增量汇总状态（AggregateState）中最近几周的每日负荷计算，报告用到的最近几周与完整计算一致"""
+    first_date, last_date, days = aggregate.daily_load()
+    if last_date is None:
+        return None
+
+    last = np.datetime64(last_date, 'D')
+    start = max(np.datetime64(first_date, 'D'), last - np.timedelta64(LOAD_WINDOW_DAYS - 1, 'D'))
+    dates = start + np.arange(int((last - start).astype(np.int64)) + 1).astype('timedelta64[D]')
+
+    # 每日：[距离, 时长, 时长×心率, 无心率时长]，缺失心率按全部记录的平均心率计算负荷
+    mean_hr = aggregate.mean_hr() or 100.0
+    daily = np.zeros((len(METRICS), len(dates)))
+    for day, (distance, duration, hr_duration, no_hr_duration) in days.items():
+        i = int((np.datetime64(day, 'D') - start).astype(np.int64))
+        if 0 <= i < len(dates):
+            daily[:, i] = (distance, duration, (hr_duration + no_hr_duration * mean_hr) / 100)
+    return _rolling_load(dates, daily, first_date)
+
+
+def acwr_zone(value):
+    """ACWR 所在区间的说明"""
+    if np.isnan(value):
+        return '数据不足'
+    for limit, label in ACWR_ZONES:
+        if value < limit:
+            return label
+
+
+def print_training_load(load, weeks=4):
+    """打印训练负荷：当前值和最近几周（每 7 天取一个点），load 为 compute_training_load() 的结果"""
+    if load is None:
+        return
+
+    distance = METRICS.index('distance')
+    hr = METRICS.index('load')
+    last = len(load['date']) - 1
+    acwr = load['acwr'][last]
+    ramp = load['ramp'][last]
+
+    print("【训练负荷】")
+    print(f"截至 {load['date'][last]}（最后一次训练）")
+    print(f"近7天跑量: {load['acute'][distance, last]:.2f} 公里，"
+          f"近28天周均: {load['chronic'][distance, last]:.2f} 公里")
+    print(f"近7天心率负荷: {load['acute'][hr, last]:.0f}，近28天周均: {load['chronic'][hr, last]:.0f}")
+    acwr_text = '-' if np.isnan(acwr) else f"{acwr:.2f}"
+    ramp_text = '-' if np.isnan(ramp) else f"{ramp:+.0f}%"
+    print(f"急慢性负荷比(ACWR): {acwr_text}（{acwr_zone(acwr)}），心率负荷周环比: {ramp_text}")
+
+    points = [i for i in range(last, -1, -ACUTE_DAYS)][:weeks]
+    if len(points) > 1:
+        print(f"\n{'截至':<12} {'7天跑量':>10} {'28天周均':>10} {'ACWR':>8} {'心率负荷周环比':>10}")
+        print("-" * 54)
+        for i in reversed(points):
+            acwr_text = '-' if np.isnan(load['acwr'][i]) else f"{load['acwr'][i]:.2f}"
+            ramp_text = '-' if np.isnan(load['ramp'][i]) else f"{load['ramp'][i]:+.0f}%"
+            print(f"{str(load['date'][i]):<12} {load['acute'][distance, i]:>10.2f} "
+                  f"{load['chronic'][distance, i]:>10.2f} {acwr_text:>8} {ramp_text:>10}")
+    print()
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+训练计划对比
+把 training-plans/*.md 解析为按日期区间的目标（心率、配速、距离），放进区间索引按日期二分查找；
+再把全部历史记录一次性与当天的计划对比，按周、按月统计达标率
+当天有单独安排时使用当天的目标，缺少的项和没有安排的日子使用计划的“本月训练目标”
+"""
+
+import argparse
+import bisect
+import os
+import re
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from parse_cache import ParseCache, default_cache_dir
+from profiling import PROFILER
+from analyze import (add_common_arguments, add_date_range_arguments, analyze_data, date_range,
+                     print_date_range, print_diagnostics)
+from runlog import RunLog, format_pace, pace_to_seconds
+
+# 计划文件名：2026-01-plan.md
+PLAN_FILE_PATTERN = re.compile(r'^(\d{4})-(\d{2})-plan\.md$')
+
+# 每天的安排：### 周二 1/13 ✅ 已完成
+DAY_PATTERN = re.compile(r'^###\s+周.\s+(\d{1,2})/(\d{1,2})')
+SECTION_PATTERN = re.compile(r'^#{1,3}\s')
+PLAN_LINE_PATTERN = re.compile(r'^-\s*\*\*计划\*\*[:：]\s*(.*)')
+
+HR_PATTERN = re.compile(r'心率(?:控制)?[:：]?\s*(\d+)\s*-\s*(\d+)')
+PACE_PATTERN = re.compile(r'(\d+:\d{2})\s*-\s*(\d+:\d{2})')
+DISTANCE_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(?:\s*-\s*(\d+(?:\.\d+)?))?\s*km', re.IGNORECASE)
+VOLUME_PATTERN = re.compile(r'总跑量[:：]\s*(\d+(?:\.\d+)?)\s*-\s*(\d+(?:\.\d+)?)')
+RUNS_PATTERN = re.compile(r'训练次数[:：]\s*(\d+)\s*-\s*(\d+)')
+
+# 实际距离不低于计划下限的 95% 即视为距离达标
+DISTANCE_TOLERANCE = 0.05
+
+# datetime64[D] 的起点（1970-01-01）对应的日期序数
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# 达标状态：没有目标或没有数据、达标、偏低、偏高
+STATUS_NONE, STATUS_OK, STATUS_LOW, STATUS_HIGH = range(4)
+
+
+def default_plans_dir(project_dir):
+    """默认计划目录：项目根目录下的 training-plans/"""
+    return os.path.join(project_dir, 'training-plans')
+
+
+def _range(match, convert=float):
+    """正则匹配到的 a-b 范围，没有匹配时为 None"""
+    if not match:
+        return None
+    low = convert(match.group(1))
+    high = convert(match.group(2)) if match.group(2) else low
+    return (low, high) if low <= high else (high, low)
+
+
+def parse_targets(text):
+    """从一行计划文字中提取心率、配速（秒/公里）、距离范围，没有的项不出现在结果中"""
+    targets = {}
+    hr = _range(HR_PATTERN.search(text), int)
+    if hr:
+        targets['hr'] = hr
+    pace = _range(PACE_PATTERN.search(text), pace_to_seconds)
+    if pace:
+        targets['pace'] = pace
+    distance = _range(DISTANCE_PATTERN.search(text))
+    if distance:
+        targets['distance'] = distance
+    return targets
+
+
+def _plan_date(year, plan_month, month, day):
+    """计划中的 月/日 转为日期；跨年的计划（12 月计划中的 1/3）顺延到下一年"""
+    if month - plan_month > 6:
+        year -= 1
+    elif plan_month - month > 6:
+        year += 1
+    return date(year, month, day)
+
+
+def parse_plan_file(file_path, year, month):
+    """解析一个月的计划文件
+
+    返回 (本月目标, [(日期, 当天安排)])；本月目标包括 hr、pace 和月度的 volume（总跑量）、runs（训练次数），
+    当天安排为 {'text': 计划文字, 'run': 是否安排跑步, 以及当天写明的 hr/pace/distance}
+    """
+    month_targets = {}
+    days = []
+    section = None
+    current = None
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            day_match = DAY_PATTERN.match(line)
+            if day_match:
+                current = _plan_date(year, month, int(day_match.group(1)), int(day_match.group(2)))
+                section = 'day'
+                continue
+            if SECTION_PATTERN.match(line):
+                section = 'month' if '本月训练目标' in line else None
+                current = None
+                continue
+
+            if section == 'month' and line.startswith('-'):
+                # “配速范围：以心率145-155为准，当前建议7:15-7:50” 这一行只取配速
+                targets = parse_targets(line)
+                if '配速' in line and 'pace' in targets:
+                    month_targets['pace'] = targets['pace']
+                elif '心率' in line and 'hr' in targets:
+                    month_targets['hr'] = targets['hr']
+                for key, pattern in (('volume', VOLUME_PATTERN), ('runs', RUNS_PATTERN)):
+                    value = _range(pattern.search(line), float if key == 'volume' else int)
+                    if value:
+                        month_targets[key] = value
+            elif section == 'day' and current is not None:
+                plan_match = PLAN_LINE_PATTERN.match(line)
+                if plan_match:
+                    text = plan_match.group(1)
+                    targets = parse_targets(text)
+                    # 休息日（可选散步、拉伸）没有跑步距离；“休息日或恢复跑 3-4km”仍算安排了跑步
+                    targets['run'] = 'distance' in targets or not text.startswith('休息')
+                    targets['text'] = text
+                    days.append((current, targets))
+                    current = None
+
+    return month_targets, days
+
+
+def _month_end(year, month):
+    """当月最后一天"""
+    first_of_next = date(year + month // 12, month % 12 + 1, 1)
+    return first_of_next - timedelta(days=1)
+
+
+def _to_datetime64(days):
+    """date 列表转为 datetime64[D] 数组（按序数换算，比逐个转换快得多）"""
+    ordinals = np.fromiter((d.toordinal() for d in days), dtype=np.int64, count=len(days))
+    return (ordinals - EPOCH_ORDINAL).astype('datetime64[D]')
+
+
+class PlanIndex:
+    """互不重叠的日期区间 -> 目标，按区间起点二分查找，单次查询 O(log n)"""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.targets = []
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.starts)
+
+    def assign(self, start, end, target):
+        """把 [start, end]（含两端）设为 target，覆盖已有区间的重叠部分"""
+        i = bisect.bisect_left(self.ends, start)
+        j = bisect.bisect_right(self.starts, end)
+        replaced = []
+        # 被覆盖的区间两端伸出新区间的部分保留下来
+        if i < j and self.starts[i] < start:
+            replaced.append((self.starts[i], start - timedelta(days=1), self.targets[i]))
+        replaced.append((start, end, target))
+        if i < j and self.ends[j - 1] > end:
+            replaced.append((end + timedelta(days=1), self.ends[j - 1], self.targets[j - 1]))
+        self.starts[i:j] = [s for s, _, _ in replaced]
+        self.ends[i:j] = [e for _, e, _ in replaced]
+        self.targets[i:j] = [t for _, _, t in replaced]
+        self._arrays = None
+
+    def lookup(self, day):
+        """某一天的目标，没有计划时为 None"""
+        i = bisect.bisect_right(self.starts, day) - 1
+        if i >= 0 and day <= self.ends[i]:
+            return self.targets[i]
+        return None
+
+    def lookup_many(self, dates):
+        """一组日期（datetime64[D] 数组）对应的区间下标，没有计划的为 -1"""
+        if not self.starts:
+            return np.full(len(dates), -1)
+        if self._arrays is None:
+            self._arrays = (_to_datetime64(self.starts), _to_datetime64(self.ends))
+        starts, ends = self._arrays
+        index = np.searchsorted(starts, dates, side='right') - 1
+        found = (index >= 0) & (dates <= ends[np.maximum(index, 0)])
+        return np.where(found, index, -1)
+
+
+class TrainingPlans:
+    """全部训练计划：按日期的目标索引、安排了跑步的日期和各月的月度目标"""
+
+    def __init__(self, index, run_days, month_targets):
+        self.index = index
+        self.run_days = run_days
+        self.month_targets = month_targets
+
+    def target(self, day):
+        """某一天（date 或 YYYY-MM-DD）的目标，没有计划时为 None"""
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        return self.index.lookup(day)
+
+
+def load_plans(plans_dir):
+    """读取计划目录下的全部计划文件，没有目录时返回空的计划
+
+    优先级从低到高：计划覆盖到下个月的部分、计划所在月份、当天的安排；同一天有多个安排时取较晚的计划
+    """
+    plans = []
+    if os.path.isdir(plans_dir):
+        for name in sorted(os.listdir(plans_dir)):
+            match = PLAN_FILE_PATTERN.match(name)
+            if match:
+                year, month = int(match.group(1)), int(match.group(2))
+                month_targets, days = parse_plan_file(os.path.join(plans_dir, name), year, month)
+                plans.append((year, month, month_targets, days))
+
+    index = PlanIndex()
+    layers = ([], [], [])
+    for year, month, month_targets, days in plans:
+        base = {key: month_targets[key] for key in ('hr', 'pace') if key in month_targets}
+        base['source'] = f"{year}-{month:02d} 本月目标"
+        first, last = date(year, month, 1), _month_end(year, month)
+        layers[1].append((first, last, base))
+        latest = max((day for day, _ in days), default=last)
+        if latest > last:
+            layers[0].append((last + timedelta(days=1), latest, base))
+        for day, targets in days:
+            layers[2].append((day, day, dict(base, source=f"{day.month}/{day.day} {targets['text']}",
+                                              **{k: v for k, v in targets.items() if k != 'text'})))
+
+    for layer in layers:
+        for start, end, target in layer:
+            index.assign(start, end, target)
+
+    run_days = sorted({day for _, _, _, days in plans for day, targets in days if targets['run']})
+    month_targets = {f"{year}-{month:02d}": targets for year, month, targets, _ in plans}
+    return TrainingPlans(index, run_days, month_targets)
+
+
+def _target_columns(plans, index):
+    """每条记录对应的目标范围：{名称: (下限, 上限)}，没有目标的为 nan"""
+    columns = {}
+    found = index >= 0
+    missing = (np.nan, np.nan)
+    for key in ('hr', 'pace', 'distance'):
+        # 最后一行全为 nan，没有计划的记录取这一行
+        table = np.array([target.get(key, missing) for target in plans.index.targets] + [missing],
+                         dtype=np.float64)
+        values = table[np.where(found, index, len(plans.index))]
+        columns[key] = (values[:, 0], values[:, 1])
+    return columns
+
+
+def _status(values, valid, low, high):
+    """逐条记录的达标状态"""
+    status = np.full(len(values), STATUS_NONE, dtype=np.int8)
+    checked = valid & ~np.isnan(low)
+    status[checked] = STATUS_OK
+    with np.errstate(invalid='ignore'):
+        status[checked & (values < low)] = STATUS_LOW
+        status[checked & (values > high)] = STATUS_HIGH
+    return status
+
+
+def compare_runs(runlog, plans):
+    """全部记录一次性与计划对比
+
+    返回字典：index（目标下标，-1 为没有计划）、hr/pace/distance（达标状态数组）、targets（目标范围）
+    """
+    index = plans.index.lookup_many(runlog.date)
+    targets = _target_columns(plans, index)
+    distance_low, distance_high = targets['distance']
+    result = {
+        'index': index,
+        'targets': targets,
+        'hr': _status(runlog.avg_hr.astype(np.float64), runlog.avg_hr_valid, *targets['hr']),
+        'pace': _status(runlog.pace.astype(np.float64), runlog.pace_valid, *targets['pace']),
+        # 距离只要求不低于计划下限（留 DISTANCE_TOLERANCE 余量），超出不算未达标
+        # 距离按记录的两位小数比较，避免 float32 的 7.6 略小于 8 × 95%
+        'distance': _status(runlog.distance.astype(np.float64).round(2), np.ones(len(runlog), dtype=bool),
+                            distance_low * (1 - DISTANCE_TOLERANCE), np.full(len(runlog), np.inf)),
+    }
+    return result
+
+
+def _period_keys(dates, period):
+    """日期所在的周（周一的日期）或月份"""
+    if period == 'week':
+        # 1970-01-01 是周四，往前推 3 天对齐到周一
+        days = dates.astype('datetime64[D]').astype(np.int64)
+        return ((days + 3) // 7 * 7 - 3).astype('datetime64[D]')
+    return dates.astype('datetime64[M]')
+
+
+def compliance(runlog, plans, comparison, period):
+    """按周或按月统计，返回每行一个周期的列表：
+
+    period, planned（计划跑步天数）, completed（其中实际跑了的天数）, runs（训练次数）, km（总距离）,
+    以及 hr/pace/distance 的 (达标次数, 有目标且有数据的次数)
+    """
+    run_days = np.array(plans.run_days, dtype='datetime64[D]')
+    run_keys = _period_keys(runlog.date, period)
+    plan_keys = _period_keys(run_days, period)
+    periods, inverse = np.unique(np.concatenate([run_keys, plan_keys]), return_inverse=True)
+    run_index, plan_index = inverse[:len(run_keys)], inverse[len(run_keys):]
+    m = len(periods)
+
+    done = np.isin(run_days, runlog.date)
+    rows = {
+        'planned': np.bincount(plan_index, minlength=m),
+        'completed': np.bincount(plan_index[done], minlength=m),
+        'runs': np.bincount(run_index, minlength=m),
+        'km': np.bincount(run_index, weights=runlog.distance, minlength=m),
+    }
+    for key in ('hr', 'pace', 'distance'):
+        status = comparison[key]
+        rows[f'{key}_ok'] = np.bincount(run_index[status == STATUS_OK], minlength=m)
+        rows[f'{key}_checked'] = np.bincount(run_index[status != STATUS_NONE], minlength=m)
+
+    return [{
+        'period': str(periods[i]),
+        'planned': int(rows['planned'][i]),
+        'completed': int(rows['completed'][i]),
+        'runs': int(rows['runs'][i]),
+        'km': float(rows['km'][i]),
+        **{key: (int(rows[f'{key}_ok'][i]), int(rows[f'{key}_checked'][i]))
+           for key in ('hr', 'pace', 'distance')},
+    } for i in range(m)]
+
+
+def _rate(pair):
+    """达标次数/有数据次数 的百分比"""
+    ok, checked = pair
+    return f"{ok / checked * 100:.0f}%" if checked else '-'
+
+
+def _range_text(value, fmt=str):
+    return f"{fmt(value[0])}-{fmt(value[1])}" if value else '-'
+
+
+def _target_cell(status, low, high, fmt):
+    """单项目标及对比结果：✅ 达标，⬇ 偏低，⬆ 偏高，· 没有数据"""
+    if np.isnan(low):
+        return '-'
+    mark = {STATUS_NONE: '·', STATUS_OK: '✅', STATUS_LOW: '⬇', STATUS_HIGH: '⬆'}[status]
+    return f"{mark} {fmt(low)}-{fmt(high)}"
+
+
+def print_compliance_table(title, rows, label):
+    """打印按周或按月的达标率"""
+    print(f"【{title}】")
+    print(f"{label:<12} {'计划':>6} {'完成':>6} {'次数':>6} {'距离(km)':>10} "
+          f"{'心率达标':>12} {'配速达标':>12} {'距离达标':>12}")
+    print("-" * 83)
+    for row in rows:
+        print(f"{row['period']:<12} {row['planned']:>6} {row['completed']:>6} {row['runs']:>6} "
+              f"{row['km']:>10.2f} {_rate(row['hr']):>12} {_rate(row['pace']):>12} "
+              f"{_rate(row['distance']):>12}")
+    print()
+
+
+def print_plan_report(runlog, plans, comparison, weeks=8, recent=10):
+    """打印计划对比报告：最近几次训练、最近几周、每月"""
+    print("=" * 72)
+    print("训练计划对比")
+    print("=" * 72)
+    print("计划/完成：计划中安排跑步的天数及其中实际跑了的天数；达标率只统计有目标且有数据的训练")
+    print("✅ 达标，⬆/⬇ 高于/低于目标（配速按秒/公里，⬆ 为偏慢），· 没有数据")
+    print()
+
+    indices = np.arange(len(runlog))[-recent:] if recent else np.arange(len(runlog))
+    targets = comparison['targets']
+    print("【最近训练】")
+    print(f"{'日期':<12} {'距离':>6} {'配速':>6} {'心率':>4}  {'心率目标':<10} {'配速目标':<14} 计划")
+    print("-" * 72)
+    for i in indices:
+        index = comparison['index'][i]
+        source = plans.index.targets[index]['source'] if index >= 0 else '没有计划'
+        record = runlog.record(i)
+        hr_cell = _target_cell(comparison['hr'][i], *(t[i] for t in targets['hr']), lambda v: f"{v:.0f}")
+        pace_cell = _target_cell(comparison['pace'][i], *(t[i] for t in targets['pace']), format_pace)
+        print(f"{record['date']:<12} {record['distance']:>6} {record['pace']:>6} "
+              f"{record['avg_hr'] or '-':>4}  {hr_cell:<10} {pace_cell:<14} {source}")
+    print()
+
+    weekly = compliance(runlog, plans, comparison, 'week')
+    print_compliance_table('每周', weekly[-weeks:] if weeks else weekly, '周（周一）')
+
+    monthly = compliance(runlog, plans, comparison, 'month')
+    print_compliance_table('每月', monthly, '月份')
+
+    planned_months = [row for row in monthly if row['period'] in plans.month_targets]
+    if planned_months:
+        print("【月度目标】")
+        print(f"{'月份':<12} {'跑量目标':>10} {'实际跑量':>10} {'次数目标':>8} {'实际次数':>8}")
+        print("-" * 72)
+        for row in planned_months:
+            targets = plans.month_targets[row['period']]
+            print(f"{row['period']:<12} {_range_text(targets.get('volume'), lambda v: f'{v:g}'):>10} "
+                  f"{row['km']:>10.2f} {_range_text(targets.get('runs')):>8} {row['runs']:>8}")
+        print()
+    print("=" * 72)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='训练计划与实际训练对比')
+    add_common_arguments(parser)
+    add_date_range_arguments(parser)
+    parser.add_argument('--plans', default=None, help='计划目录（默认 training-plans/）')
+    parser.add_argument('--weeks', type=int, default=8, help='显示最近几周（0 为全部）')
+    parser.add_argument('--runs', type=int, default=10, help='显示最近几次训练（0 为全部）')
+    args = parser.parse_args()
+    since, until = date_range(parser, args)
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(script_dir)
+    data_dir = os.path.join(project_dir, 'data')
+
+    if not os.path.exists(data_dir):
+        print("错误: 找不到data目录")
+        return
+
+    PROFILER.configure(args, 'training_plan', os.path.join(default_cache_dir(data_dir), 'profile'))
+    with PROFILER.stage('load_plans'):
+        plans = load_plans(args.plans or default_plans_dir(project_dir))
+        PROFILER.count(intervals=len(plans.index))
+    if not len(plans.index):
+        print("没有找到训练计划（training-plans/YYYY-MM-plan.md）")
+        return
+
+    cache = ParseCache.for_data_dir(data_dir)
+    diagnostics = []
+    all_records, _ = analyze_data(data_dir, cache=cache, diagnostics=diagnostics, jobs=args.jobs,
+                                  since=since, until=until)
+    print_diagnostics(diagnostics)
+    print_date_range(since, until)
+    with PROFILER.stage('build_runlog', records=len(all_records)):
+        runlog = RunLog.from_records(all_records)
+
+    with PROFILER.stage('compare_runs', records=len(runlog)):
+        comparison = compare_runs(runlog, plans)
+    with PROFILER.stage('print_plan_report'):
+        print_plan_report(runlog, plans, comparison, args.weeks, args.runs)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,31 +5,58 @@
 生成各种图表展示跑步数据趋势
 """
 
+import argparse
+import hashlib
+import json
 import os
 import sys
-from datetime import datetime
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from collections import defaultdict
-
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'DejaVu Sans']
-plt.rcParams['axes.unicode_minus'] = False
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 # 导入分析脚本的函数
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from analyze import analyze_data, parse_markdown_table
-
-def plot_distance_trend(all_records, output_dir='output'):
+from plotting import get_pyplot, save_figure
+from parse_cache import ParseCache, default_cache_dir
+from profiling import PROFILER
+from analyze import (add_common_arguments, add_date_range_arguments, analyze_data, date_range,
+                     print_date_range, print_diagnostics)
+from runlog import RunLog
+from training_load import ACWR_ZONES, METRICS, compute_training_load
+from downsample import downsample
+
+# 折线图降采样：文件名 -> (方法, 默认目标点数)，记录多于目标点数时降采样，绘图耗时与历史长度无关
+# 心率图用 minmax，保证最大心率等峰值不会被丢掉
+DOWNSAMPLING = {
+    'distance_trend.png': ('lttb', 1000),
+    'pace_trend.png': ('lttb', 1000),
+    'heart_rate_trend.png': ('minmax', 1000),
+    'weight_trend.png': ('lttb', 1000),
+}
+
+def chart_points(filename, max_points=None):
+    """图表的目标点数：max_points 覆盖默认值，0 表示不降采样"""
+    return DOWNSAMPLING[filename][1] if max_points is None else max_points
+
+def _downsampled(filename, dates, values, max_points=None):
+    """按图表的配置降采样，返回 (日期, 数值, 是否画点标记)，降采样后只画折线"""
+    method = DOWNSAMPLING[filename][0]
+    index = downsample(dates, values, chart_points(filename, max_points), method)
+    if len(index) < len(dates):
+        return dates[index], values[index], False
+    return dates, values, True
+
+def plot_distance_trend(runlog, output_dir='output', max_points=None):
     """绘制跑步距离趋势图"""
-    if not all_records:
+    plt = get_pyplot()
+    if not len(runlog):
         return
 
-    dates = [datetime.strptime(r['date'], '%Y-%m-%d') for r in all_records]
-    distances = [r['distance'] for r in all_records]
+    dates, distances, markers = _downsampled('distance_trend.png', runlog.date, runlog.distance,
+                                             max_points)
 
     plt.figure(figsize=(12, 6))
-    plt.plot(dates, distances, marker='o', linestyle='-', linewidth=2, markersize=6)
+    plt.plot(dates, distances, marker='o' if markers else None, linestyle='-', linewidth=2,
+             markersize=6)
     plt.title('跑步距离趋势', fontsize=16, fontweight='bold')
     plt.xlabel('日期', fontsize=12)
     plt.ylabel('距离 (公里)', fontsize=12)
@@ -38,36 +65,26 @@ def plot_distance_trend(all_records, output_dir='output'):
     plt.tight_layout()
 
     os.makedirs(output_dir, exist_ok=True)
-    plt.savefig(os.path.join(output_dir, 'distance_trend.png'), dpi=300)
+    save_figure(plt, os.path.join(output_dir, 'distance_trend.png'))
     print(f"✓ 已生成: {output_dir}/distance_trend.png")
     plt.close()
 
-def plot_pace_trend(all_records, output_dir='output'):
+def plot_pace_trend(runlog, output_dir='output', max_points=None):
     """绘制配速趋势图"""
-    if not all_records:
+    plt = get_pyplot()
+    if not len(runlog):
         return
 
-    # 将配速转换为秒数
-    def pace_to_seconds(pace_str):
-        try:
-            parts = pace_str.split(':')
-            return int(parts[0]) * 60 + int(parts[1])
-        except:
-            return None
-
-    dates = []
-    paces = []
-    for r in all_records:
-        pace_seconds = pace_to_seconds(r['pace'])
-        if pace_seconds:
-            dates.append(datetime.strptime(r['date'], '%Y-%m-%d'))
-            paces.append(pace_seconds / 60)  # 转换为分钟
-
-    if not dates:
+    dates = runlog.date[runlog.pace_valid]
+    paces = runlog.valid_values('pace') / 60  # 转换为分钟
+
+    if not len(dates):
         return
+    dates, paces, markers = _downsampled('pace_trend.png', dates, paces, max_points)
 
     plt.figure(figsize=(12, 6))
-    plt.plot(dates, paces, marker='o', linestyle='-', linewidth=2, markersize=6, color='orange')
+    plt.plot(dates, paces, marker='o' if markers else None, linestyle='-', linewidth=2,
+             markersize=6, color='orange')
     plt.title('配速趋势', fontsize=16, fontweight='bold')
     plt.xlabel('日期', fontsize=12)
     plt.ylabel('配速 (分/公里)', fontsize=12)
@@ -76,26 +93,30 @@ def plot_pace_trend(all_records, output_dir='output'):
     plt.gca().invert_yaxis()  # 配速越小越好，所以反转Y轴
     plt.tight_layout()
 
-    plt.savefig(os.path.join(output_dir, 'pace_trend.png'), dpi=300)
+    save_figure(plt, os.path.join(output_dir, 'pace_trend.png'))
     print(f"✓ 已生成: {output_dir}/pace_trend.png")
     plt.close()
 
-def plot_heart_rate(all_records, output_dir='output'):
+def plot_heart_rate(runlog, output_dir='output', max_points=None):
     """绘制心率趋势图"""
-    hr_records = [r for r in all_records if r['avg_hr']]
-    if not hr_records:
+    plt = get_pyplot()
+    hr_mask = runlog.avg_hr_valid
+    if not hr_mask.any():
         return
 
-    dates = [datetime.strptime(r['date'], '%Y-%m-%d') for r in hr_records]
-    avg_hrs = [r['avg_hr'] for r in hr_records]
-    max_hrs = [r['max_hr'] for r in hr_records if r['max_hr']]
+    dates = runlog.date[hr_mask]
+    avg_hrs = runlog.avg_hr[hr_mask]
+    max_hrs = runlog.max_hr[hr_mask & runlog.max_hr_valid]
 
     plt.figure(figsize=(12, 6))
-    plt.plot(dates, avg_hrs, marker='o', linestyle='-', linewidth=2, markersize=6,
-             label='平均心率', color='red')
+    avg_dates, avg_hrs, markers = _downsampled('heart_rate_trend.png', dates, avg_hrs, max_points)
+    plt.plot(avg_dates, avg_hrs, marker='o' if markers else None, linestyle='-', linewidth=2,
+             markersize=6, label='平均心率', color='red')
     if len(max_hrs) == len(dates):
-        plt.plot(dates, max_hrs, marker='s', linestyle='--', linewidth=2, markersize=5,
-                 label='最大心率', color='darkred', alpha=0.7)
+        max_dates, max_hrs, markers = _downsampled('heart_rate_trend.png', dates, max_hrs,
+                                                   max_points)
+        plt.plot(max_dates, max_hrs, marker='s' if markers else None, linestyle='--', linewidth=2,
+                 markersize=5, label='最大心率', color='darkred', alpha=0.7)
 
     plt.title('心率趋势', fontsize=16, fontweight='bold')
     plt.xlabel('日期', fontsize=12)
@@ -105,21 +126,23 @@ def plot_heart_rate(all_records, output_dir='output'):
     plt.xticks(rotation=45)
     plt.tight_layout()
 
-    plt.savefig(os.path.join(output_dir, 'heart_rate_trend.png'), dpi=300)
+    save_figure(plt, os.path.join(output_dir, 'heart_rate_trend.png'))
     print(f"✓ 已生成: {output_dir}/heart_rate_trend.png")
     plt.close()
 
-def plot_weight_trend(all_records, output_dir='output'):
+def plot_weight_trend(runlog, output_dir='output', max_points=None):
     """绘制体重趋势图"""
-    weight_records = [r for r in all_records if r['weight']]
-    if not weight_records:
+    plt = get_pyplot()
+    if not runlog.weight_valid.any():
         return
 
-    dates = [datetime.strptime(r['date'], '%Y-%m-%d') for r in weight_records]
-    weights = [r['weight'] for r in weight_records]
+    dates = runlog.date[runlog.weight_valid]
+    weights = runlog.valid_values('weight')
+    dates, weights, markers = _downsampled('weight_trend.png', dates, weights, max_points)
 
     plt.figure(figsize=(12, 6))
-    plt.plot(dates, weights, marker='o', linestyle='-', linewidth=2, markersize=6, color='green')
+    plt.plot(dates, weights, marker='o' if markers else None, linestyle='-', linewidth=2,
+             markersize=6, color='green')
     plt.title('体重变化趋势', fontsize=16, fontweight='bold')
     plt.xlabel('日期', fontsize=12)
     plt.ylabel('体重 (kg)', fontsize=12)
@@ -127,12 +150,13 @@ def plot_weight_trend(all_records, output_dir='output'):
     plt.xticks(rotation=45)
     plt.tight_layout()
 
-    plt.savefig(os.path.join(output_dir, 'weight_trend.png'), dpi=300)
+    save_figure(plt, os.path.join(output_dir, 'weight_trend.png'))
     print(f"✓ 已生成: {output_dir}/weight_trend.png")
     plt.close()
 
 def plot_monthly_summary(monthly_stats, output_dir='output'):
     """绘制月度统计图"""
+    plt = get_pyplot()
     if not monthly_stats:
         return
 
@@ -159,24 +183,57 @@ def plot_monthly_summary(monthly_stats, output_dir='output'):
     ax2.tick_params(axis='x', rotation=45)
 
     plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'monthly_summary.png'), dpi=300)
+    save_figure(plt, os.path.join(output_dir, 'monthly_summary.png'))
     print(f"✓ 已生成: {output_dir}/monthly_summary.png")
     plt.close()
 
-def plot_feeling_distribution(all_records, output_dir='output'):
+def plot_training_load(runlog, output_dir='output'):
+    """绘制训练负荷图：7天/28天滚动跑量和急慢性负荷比"""
+    plt = get_pyplot()
+    load = compute_training_load(runlog)
+    if load is None:
+        return
+
+    dates = load['date']
+    distance = METRICS.index('distance')
+
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10), sharex=True)
+
+    # 急性/慢性跑量
+    ax1.plot(dates, load['acute'][distance], linewidth=1.5, color='steelblue', label='近7天跑量')
+    ax1.plot(dates, load['chronic'][distance], linewidth=2, color='coral', label='近28天周均')
+    ax1.set_title('滚动训练负荷', fontsize=16, fontweight='bold')
+    ax1.set_ylabel('距离 (公里)', fontsize=12)
+    ax1.legend()
+    ax1.grid(True, alpha=0.3)
+
+    # 急慢性负荷比，标出适宜区间
+    low, high = ACWR_ZONES[0][0], ACWR_ZONES[1][0]
+    ax2.axhspan(low, high, color='green', alpha=0.1, label=f'适宜区间 {low}-{high}')
+    ax2.plot(dates, load['acwr'], linewidth=1.5, color='purple', label='ACWR（心率负荷）')
+    ax2.set_title('急慢性负荷比', fontsize=16, fontweight='bold')
+    ax2.set_xlabel('日期', fontsize=12)
+    ax2.set_ylabel('ACWR', fontsize=12)
+    ax2.legend()
+    ax2.grid(True, alpha=0.3)
+    ax2.tick_params(axis='x', rotation=45)
+
+    plt.tight_layout()
+    save_figure(plt, os.path.join(output_dir, 'training_load.png'))
+    print(f"✓ 已生成: {output_dir}/training_load.png")
+    plt.close()
+
+def plot_feeling_distribution(runlog, output_dir='output'):
     """绘制感受评分分布"""
-    feeling_records = [r for r in all_records if r['feeling']]
-    if not feeling_records:
+    plt = get_pyplot()
+    if not runlog.feeling_valid.any():
         return
 
-    feelings = [r['feeling'] for r in feeling_records]
-    feeling_counts = defaultdict(int)
-    for f in feelings:
-        feeling_counts[f] += 1
+    feeling_counts = np.bincount(runlog.valid_values('feeling'), minlength=11)
 
     plt.figure(figsize=(10, 6))
-    scores = sorted(feeling_counts.keys())
-    counts = [feeling_counts[s] for s in scores]
+    scores = np.flatnonzero(feeling_counts)
+    counts = feeling_counts[scores]
 
     plt.bar(scores, counts, color='purple', alpha=0.7)
     plt.title('训练感受评分分布', fontsize=16, fontweight='bold')
@@ -186,12 +243,144 @@ def plot_feeling_distribution(all_records, output_dir='output'):
     plt.grid(True, alpha=0.3, axis='y')
     plt.tight_layout()
 
-    plt.savefig(os.path.join(output_dir, 'feeling_distribution.png'), dpi=300)
+    save_figure(plt, os.path.join(output_dir, 'feeling_distribution.png'))
     print(f"✓ 已生成: {output_dir}/feeling_distribution.png")
     plt.close()
 
+# 图表渲染版本：修改绘图样式后加一，使所有图表重新生成
+RENDER_VERSION = 1
+
+def _monthly_slice(monthly_stats):
+    """月度图用到的数据"""
+    return [(m, round(monthly_stats[m]['total_distance'], 4), monthly_stats[m]['count'])
+            for m in sorted(monthly_stats.keys())]
+
+# 图表注册表：文件名 -> (绘图函数, 数据来源, 输入数据切片)
+# 指纹只取决于该图表实际用到的列，例如只改感受评分时体重图不会重新渲染
+CHARTS = {
+    'distance_trend.png': (plot_distance_trend, 'runlog',
+                           lambda r, m: (r.date, r.distance)),
+    'pace_trend.png': (plot_pace_trend, 'runlog',
+                       lambda r, m: (r.date[r.pace_valid], r.valid_values('pace'))),
+    'heart_rate_trend.png': (plot_heart_rate, 'runlog',
+                             lambda r, m: (r.date, r.avg_hr, r.avg_hr_valid,
+                                           r.max_hr, r.max_hr_valid)),
+    'weight_trend.png': (plot_weight_trend, 'runlog',
+                         lambda r, m: (r.date[r.weight_valid], r.valid_values('weight'))),
+    'monthly_summary.png': (plot_monthly_summary, 'monthly',
+                            lambda r, m: _monthly_slice(m)),
+    'training_load.png': (plot_training_load, 'runlog',
+                          lambda r, m: (r.date, r.distance, r.duration, r.avg_hr, r.avg_hr_valid)),
+    'feeling_distribution.png': (plot_feeling_distribution, 'runlog',
+                                 lambda r, m: (r.valid_values('feeling'),)),
+}
+
+def chart_fingerprint(filename, runlog, monthly_stats, max_points=None):
+    """计算图表输入数据的指纹（包括降采样的目标点数）"""
+    _, _, data_slice = CHARTS[filename]
+    h = hashlib.sha1(f"{filename}:{RENDER_VERSION}".encode('utf-8'))
+    if filename in DOWNSAMPLING:
+        h.update(f"points:{chart_points(filename, max_points)}".encode('utf-8'))
+    data = data_slice(runlog, monthly_stats)
+    if isinstance(data, tuple):
+        for column in data:
+            column = np.ascontiguousarray(column)
+            h.update(f"{column.dtype}{column.shape}".encode('utf-8'))
+            h.update(column.tobytes())
+    else:
+        h.update(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+    return h.hexdigest()
+
+def _load_render_state(state_path):
+    """读取已渲染图表的指纹：输出路径 -> {'fingerprint', 'written'}"""
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_render_state(state_path, state):
+    """保存已渲染图表的指纹"""
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, state_path)
+
+def _render_chart(filename, data, output_dir, max_points=None):
+    """渲染单个图表"""
+    plot, _, _ = CHARTS[filename]
+    with PROFILER.stage(plot.__name__, chart=filename, records=len(data)):
+        if filename in DOWNSAMPLING:
+            plot(data, output_dir, max_points)
+        else:
+            plot(data, output_dir)
+    return filename
+
+def _render_chart_worker(filename, data, output_dir, max_points=None):
+    """子进程中渲染单个图表，返回剖析记录"""
+    PROFILER.reset()
+    _render_chart(filename, data, output_dir, max_points)
+    return PROFILER.collect()
+
+def render_charts(runlog, monthly_stats, output_dir, state_path, jobs=None, force=False,
+                  max_points=None):
+    """调度图表渲染：输入数据未变化且文件存在的图表跳过，其余在进程池中并行渲染
+
+    max_points 覆盖折线图降采样的目标点数（0 表示不降采样）；返回实际渲染的图表文件名列表
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    state = _load_render_state(state_path)
+
+    pending = {}
+    for filename, (_, source, _) in CHARTS.items():
+        output_path = os.path.abspath(os.path.join(output_dir, filename))
+        fingerprint = chart_fingerprint(filename, runlog, monthly_stats, max_points)
+        previous = state.get(output_path)
+        if (not force and previous and previous['fingerprint'] == fingerprint
+                and (os.path.exists(output_path) or not previous['written'])):
+            print(f"· 数据未变化，跳过: {output_dir}/{filename}")
+            continue
+        data = runlog if source == 'runlog' else monthly_stats
+        pending[filename] = (output_path, fingerprint, data)
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(pending))
+
+    with PROFILER.stage('render_charts', charts=len(pending), jobs=max(jobs, 1)):
+        if jobs <= 1:
+            for filename, (_, _, data) in pending.items():
+                _render_chart(filename, data, output_dir, max_points)
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = [executor.submit(_render_chart_worker, filename, data, output_dir,
+                                           max_points)
+                           for filename, (_, _, data) in pending.items()]
+                for future in futures:
+                    PROFILER.attach(future.result(), worker=True)
+
+    # 没有数据的图表不会生成文件，同样记录指纹，数据不变时不再尝试
+    for output_path, fingerprint, _ in pending.values():
+        state[output_path] = {'fingerprint': fingerprint, 'written': os.path.exists(output_path)}
+    _save_render_state(state_path, state)
+
+    return list(pending)
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='跑步数据可视化')
+    add_common_arguments(parser)
+    add_date_range_arguments(parser)
+    parser.add_argument('--render-jobs', type=int, default=None,
+                        help='并行渲染图表的进程数（默认CPU核数）')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略指纹，重新生成所有图表')
+    parser.add_argument('--max-points', type=int, default=None,
+                        help='折线图最多绘制的点数，超过时降采样（默认每个图表 1000，0 为不降采样）')
+    args = parser.parse_args()
+    since, until = date_range(parser, args)
+
     script_dir = os.path.dirname(os.path.abspath(__file__))
     project_dir = os.path.dirname(script_dir)
     data_dir = os.path.join(project_dir, 'data')
@@ -201,24 +390,31 @@ def main():
         print("错误: 找不到data目录")
         return
 
+    PROFILER.configure(args, 'visualize', os.path.join(default_cache_dir(data_dir), 'profile'))
     print("正在分析数据...")
-    all_records, monthly_stats = analyze_data(data_dir)
+    cache = ParseCache.for_data_dir(data_dir)
+    diagnostics = []
+    all_records, monthly_stats = analyze_data(data_dir, cache=cache, diagnostics=diagnostics,
+                                              jobs=args.jobs, since=since, until=until)
+    print_diagnostics(diagnostics)
+    print(cache.report())
+    print_date_range(since, until)
 
     if not all_records:
         print("暂无跑步记录数据")
         return
 
-    print(f"\n找到 {len(all_records)} 条跑步记录，开始生成图表...\n")
+    with PROFILER.stage('build_runlog', records=len(all_records)):
+        runlog = RunLog.from_records(all_records)
+    print(f"\n找到 {len(runlog)} 条跑步记录，开始生成图表...\n")
 
-    # 生成各种图表
-    plot_distance_trend(all_records, output_dir)
-    plot_pace_trend(all_records, output_dir)
-    plot_heart_rate(all_records, output_dir)
-    plot_weight_trend(all_records, output_dir)
-    plot_monthly_summary(monthly_stats, output_dir)
-    plot_feeling_distribution(all_records, output_dir)
+    # 生成各种图表（数据未变化的图表跳过）
+    state_path = os.path.join(default_cache_dir(data_dir), 'charts.json')
+    rendered = render_charts(runlog, monthly_stats, output_dir, state_path,
+                             jobs=args.render_jobs, force=args.force,
+                             max_points=args.max_points)
 
-    print(f"\n所有图表已生成到 {output_dir} 目录")
+    print(f"\n本次生成 {len(rendered)} 个图表，所有图表位于 {output_dir} 目录")
     print("=" * 60)
 
 if __name__ == '__main__':
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监听模式
+常驻运行，监听 data/ 下月度文件的变化（Linux 上用 inotify，其他系统或不可用时定时轮询），
+一批连续的修改合并为一次处理：只重新解析有变化的月度文件，重写 output/ 下的报告，
+并只重新渲染输入数据有变化的图表
+"""
+
+import argparse
+import contextlib
+import ctypes
+import ctypes.util
+import hashlib
+import io
+import os
+import select
+import struct
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from aggregates import (AggregateState, default_state_path, list_month_files, merge_month_stats,
+                        month_file_signatures, new_month_stats)
+from parse_cache import ParseCache, default_cache_dir
+from profiling import PROFILER
+from analyze import add_common_arguments, load_month_file, print_report
+from runlog import RunLog
+
+# 一批修改结束后等待的时间（秒），期间的新修改合并进同一批
+DEBOUNCE_SECONDS = 0.5
+
+# 轮询间隔（秒）
+POLL_INTERVAL = 1.0
+
+# inotify 事件（linux/inotify.h）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+FILE_EVENTS = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """用 inotify 监听 data 目录和各年份目录（通过 ctypes 调用 libc，不依赖第三方库）"""
+
+    def __init__(self, data_dir):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), '无法初始化 inotify')
+        self.data_dir = data_dir
+        self.dirs = {}
+        self._watch(data_dir)
+        for name in os.listdir(data_dir):
+            if os.path.isdir(os.path.join(data_dir, name)):
+                self._watch(os.path.join(data_dir, name))
+
+    def _watch(self, path):
+        wd = self._add_watch(self.fd, os.fsencode(path), FILE_EVENTS)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'无法监听目录: {path}')
+        self.dirs[wd] = path
+
+    def changes(self, timeout=None):
+        """等待文件事件，返回有变化的路径集合，超时返回空集合"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed = set()
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+            offset += length
+
+            directory = self.dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_DELETE_SELF:
+                del self.dirs[wd]
+                changed.add(directory)
+                continue
+            path = os.path.join(directory, name)
+            # 新建的年份目录加入监听，其中已有的文件也算作变化
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and directory == self.data_dir:
+                    self._watch(path)
+                changed.add(path)
+            elif name.endswith('.md'):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """定时比较月度文件的签名（修改时间、大小）"""
+
+    def __init__(self, data_dir, interval=POLL_INTERVAL):
+        self.data_dir = data_dir
+        self.interval = interval
+        self.signatures = month_file_signatures(data_dir)
+
+    def changes(self, timeout=None):
+        """轮询直到发现变化或超时，返回有变化（新增、修改、删除）的路径集合"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            signatures = month_file_signatures(self.data_dir)
+            changed = {os.path.join(self.data_dir, path)
+                       for path in set(signatures) | set(self.signatures)
+                       if signatures.get(path) != self.signatures.get(path)}
+            self.signatures = signatures
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            wait = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            time.sleep(max(wait, 0))
+
+    def close(self):
+        pass
+
+
+def create_watcher(data_dir, poll=False, interval=POLL_INTERVAL):
+    """优先使用 inotify，不可用时退回轮询"""
+    if not poll:
+        try:
+            return InotifyWatcher(data_dir)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  inotify 不可用（{e}），改为每 {interval:g} 秒轮询")
+    return PollingWatcher(data_dir, interval)
+
+
+def wait_for_batch(watcher, debounce=DEBOUNCE_SECONDS):
+    """阻塞到有变化，再等到 debounce 秒内没有新的变化，返回这一批所有变化的路径"""
+    changed = set()
+    while not changed:
+        changed = watcher.changes()
+    while True:
+        more = watcher.changes(debounce)
+        if not more:
+            return changed
+        changed |= more
+
+
+def _fingerprint(*columns):
+    """数组列的指纹"""
+    h = hashlib.sha1()
+    for column in columns:
+        h.update(column.tobytes())
+    return h.hexdigest()
+
+
+class LiveData:
+    """在内存中保存每个月度文件的解析结果，每次只重新解析变化的文件
+
+    reload() 之后 records / monthly_stats / diagnostics / sources / runlog 与完整运行 analyze_data 的结果相同
+    """
+
+    def __init__(self, data_dir, cache=None):
+        self.data_dir = data_dir
+        self.cache = cache or ParseCache.for_data_dir(data_dir)
+        self.payloads = {}
+        self.records = []
+        self.monthly_stats = defaultdict(new_month_stats)
+        self.diagnostics = []
+        self.sources = {}
+        self.runlog = RunLog.from_records([])
+
+    def changed_files(self):
+        """与上次加载相比签名有变化（新增、修改、删除）的月度文件路径"""
+        sources = month_file_signatures(self.data_dir)
+        return {os.path.join(self.data_dir, path)
+                for path in set(sources) | set(self.sources)
+                if sources.get(path) != self.sources.get(path)}
+
+    def reload(self, changed=None):
+        """重新加载变化的文件（changed 为 None 时加载全部），返回实际重新解析的文件数"""
+        month_files = list_month_files(self.data_dir)
+        current = {file_path for _, file_path in month_files}
+        for file_path in list(self.payloads):
+            if file_path not in current:
+                del self.payloads[file_path]
+
+        misses = self.cache.misses
+        with PROFILER.stage('reload', files=len(current)):
+            for _, file_path in month_files:
+                if changed is None or file_path in changed or file_path not in self.payloads:
+                    self.payloads[file_path] = self.cache.load(file_path, load_month_file)
+
+        # 与 analyze_data 相同的合并：按文件顺序拼接后按日期稳定排序
+        records = []
+        monthly_stats = defaultdict(new_month_stats)
+        diagnostics = []
+        for month_key, file_path in month_files:
+            file_records, file_stats, file_diagnostics = self.payloads[file_path]
+            records.extend(file_records)
+            diagnostics.extend(file_diagnostics)
+            merge_month_stats(monthly_stats[month_key], file_stats)
+        records.sort(key=lambda r: r['date'])
+
+        self.records = records
+        self.monthly_stats = monthly_stats
+        self.diagnostics = diagnostics
+        self.sources = month_file_signatures(self.data_dir, month_files)
+        self.runlog = RunLog.from_records(records)
+        return self.cache.misses - misses
+
+
+class WatchSession:
+    """监听模式的一次会话：数据变化后重写报告和图表"""
+
+    def __init__(self, data_dir, output_dir, render_jobs=None, plots=True, weight_report=True):
+        self.data_dir = data_dir
+        self.output_dir = output_dir
+        self.render_jobs = render_jobs
+        self.plots = plots
+        self.weight_report = weight_report
+        self.data = LiveData(data_dir)
+        self.weight_fingerprint = None
+
+    def refresh(self, changed=None):
+        """重新加载变化的文件（changed 为 None 时加载全部），重写报告和图表
+
+        返回 (重新解析的文件数, 解析诊断, 渲染的图表)
+        """
+        data = self.data
+        parsed = data.reload(changed)
+
+        # 顺便更新增量汇总，之后运行 analyze.py 不需要重新解析
+        AggregateState.build(data.records, data.monthly_stats, data.sources, data.diagnostics).save(
+            default_state_path(self.data_dir))
+
+        runlog = data.runlog
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._write_report(runlog, data.monthly_stats)
+        if self.weight_report:
+            self._write_weight_report(runlog, data.records)
+
+        rendered = []
+        if self.plots and len(runlog):
+            from visualize import render_charts
+            with contextlib.redirect_stdout(io.StringIO()):
+                rendered = render_charts(runlog, data.monthly_stats, self.output_dir,
+                                         os.path.join(default_cache_dir(self.data_dir), 'charts.json'),
+                                         jobs=self.render_jobs)
+        return parsed, data.diagnostics, rendered
+
+    def _write_report(self, runlog, monthly_stats):
+        """分析报告写到 output/report.txt"""
+        report = io.StringIO()
+        with contextlib.redirect_stdout(report):
+            if len(runlog):
+                print_report(runlog, monthly_stats)
+            else:
+                print("暂无跑步记录数据")
+        with open(os.path.join(self.output_dir, 'report.txt'), 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+
+    def _write_weight_report(self, runlog, all_records):
+        """体重关联分析写到 output/weight_report.txt，用到的列没有变化时跳过"""
+        fingerprint = _fingerprint(runlog.date, runlog.distance, runlog.weight, runlog.weight_valid,
+                                   runlog.avg_hr, runlog.avg_hr_valid, runlog.pace, runlog.pace_valid,
+                                   runlog.venue)
+        report_path = os.path.join(self.output_dir, 'weight_report.txt')
+        if fingerprint == self.weight_fingerprint and os.path.exists(report_path):
+            return
+        from weight_analysis import (analyze_weight_correlation, plot_weight_hr_correlation,
+                                     print_analysis_report)
+        from hr_model import load_or_fit
+
+        report = io.StringIO()
+        with contextlib.redirect_stdout(report):
+            analysis = analyze_weight_correlation(runlog)
+            if analysis:
+                model, _ = load_or_fit(self.data_dir, all_records)
+                print_analysis_report(analysis, model)
+                if self.plots:
+                    plot_weight_hr_correlation(analysis['records'], self.output_dir)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+        self.weight_fingerprint = fingerprint
+
+
+def _log(message):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}", flush=True)
+
+
+def _describe(changed, data_dir):
+    """变化的文件列表（相对 data 目录）"""
+    names = sorted(os.path.relpath(path, data_dir) for path in changed)
+    if len(names) > 3:
+        return '、'.join(names[:3]) + f" 等 {len(names)} 个文件"
+    return '、'.join(names)
+
+
+def run_once(session, changed=None):
+    """处理一批变化并打印结果"""
+    started = time.perf_counter()
+    parsed, diagnostics, rendered = session.refresh(changed)
+    for d in diagnostics:
+        if changed is None or d.file in changed:
+            _log(f"解析失败: {d.file}:{d.line_no}: {d.line}（{d.error}）")
+    charts = f"，重新渲染 {len(rendered)} 个图表" if session.plots else ''
+    _log(f"重新解析 {parsed} 个文件{charts}，报告已更新，用时 {time.perf_counter() - started:.2f} 秒")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='监听数据变化，自动更新报告和图表')
+    add_common_arguments(parser)
+    parser.add_argument('--poll', action='store_true', help='不使用 inotify，定时轮询')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL,
+                        help=f'轮询间隔（秒，默认 {POLL_INTERVAL:g}）')
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE_SECONDS,
+                        help=f'连续修改合并的等待时间（秒，默认 {DEBOUNCE_SECONDS:g}）')
+    parser.add_argument('--render-jobs', type=int, default=None,
+                        help='并行渲染图表的进程数（默认CPU核数）')
+    parser.add_argument('--no-plots', action='store_true', help='只更新文字报告，不生成图表')
+    parser.add_argument('--no-weight', action='store_true', help='不更新体重关联分析')
+    parser.add_argument('--once', action='store_true', help='更新一次后退出，不监听')
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(script_dir)
+    data_dir = os.path.join(project_dir, 'data')
+    output_dir = os.path.join(project_dir, 'output')
+
+    if not os.path.exists(data_dir):
+        print("错误: 找不到data目录")
+        return
+
+    PROFILER.configure(args, 'watch', os.path.join(default_cache_dir(data_dir), 'profile'))
+    session = WatchSession(data_dir, output_dir, render_jobs=args.render_jobs,
+                           plots=not args.no_plots, weight_report=not args.no_weight)
+    _log(f"加载 {data_dir}")
+    run_once(session)
+    if args.once:
+        return
+
+    watcher = create_watcher(data_dir, args.poll, args.interval)
+    kind = 'inotify' if isinstance(watcher, InotifyWatcher) else '轮询'
+    _log(f"开始监听（{kind}），报告和图表输出到 {output_dir}，按 Ctrl+C 退出")
+    try:
+        while True:
+            changed = wait_for_batch(watcher, args.debounce)
+            _log(f"{_describe(changed, data_dir)} 有变化")
+            run_once(session, changed)
+    except KeyboardInterrupt:
+        _log("已停止监听")
+    finally:
+        watcher.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,53 +5,69 @@
 验证体重对心率和配速的影响
 """
 
+import argparse
 import os
 import sys
-import matplotlib.pyplot as plt
+import unicodedata
 import numpy as np
-from collections import defaultdict
-
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'DejaVu Sans']
-plt.rcParams['axes.unicode_minus'] = False
 
 # 导入分析脚本的函数
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from analyze import analyze_data
-
-def pace_to_seconds(pace_str):
-    """将配速转换为秒数"""
-    try:
-        parts = pace_str.split(':')
-        return int(parts[0]) * 60 + int(parts[1])
-    except:
-        return None
-
-def analyze_weight_correlation(all_records):
-    """分析体重与心率、配速的关联"""
-
-    # 筛选有完整数据的记录
-    valid_records = []
-    for r in all_records:
-        if r['weight'] and r['avg_hr'] and r['pace']:
-            pace_seconds = pace_to_seconds(r['pace'])
-            if pace_seconds:
-                valid_records.append({
-                    'date': r['date'],
-                    'weight': r['weight'],
-                    'avg_hr': r['avg_hr'],
-                    'pace_seconds': pace_seconds,
-                    'distance': r['distance']
-                })
-
-    if len(valid_records) < 2:
+from plotting import get_pyplot, save_figure
+from parse_cache import ParseCache, default_cache_dir
+from profiling import PROFILER
+from analyze import add_common_arguments, analyze_data, print_diagnostics
+from runlog import RunLog
+from snapshot import SnapshotError, default_snapshot_dir, load_snapshot, stale_sources
+from correlation import (BOOTSTRAP_SAMPLES, LAG_DAYS, bootstrap, confidence_interval,
+                         correlation_matrix, feature_columns, pair_products)
+from hr_model import Z_95, feature_vector, load_or_fit
+
+# 预测分析的默认目标体重和目标心率（--target-weight / --target-hr）
+TARGET_WEIGHT = 78
+TARGET_HR = 150
+
+# 按最近几次完整记录的配速、距离和场地做预测
+PREDICTION_RUNS = 5
+
+# 心率模型各系数的单位
+COEFFICIENT_UNITS = {
+    '体重': 'bpm/kg',
+    '配速': 'bpm/(秒/km)',
+    '距离': 'bpm/km',
+    '近7天跑量': 'bpm/km',
+}
+
+def analyze_weight_correlation(runlog, samples=BOOTSTRAP_SAMPLES, seed=0):
+    """分析体重与心率、配速、距离、场地的关联，包括滞后的体重和自助法置信区间
+
+    返回字典：records（体重、心率、配速都有的记录）, names（列名）, r, slope, mean, pairs
+    （见 correlation.correlation_matrix）以及重抽样结果 boot_r, boot_slope, boot_mean；
+    完整记录不足2条时返回 None
+    """
+
+    # 筛选有完整数据的记录（RunLog 已按日期排序）
+    mask = runlog.weight_valid & runlog.avg_hr_valid & runlog.pace_valid
+    if mask.sum() < 2:
         print("数据不足，至少需要2条完整记录才能进行关联分析")
         return None
 
-    # 按日期排序
-    valid_records.sort(key=lambda x: x['date'])
-
-    return valid_records
+    # 相关矩阵用全部记录，每一对列只看两者都有数据的记录（滞后体重需要没有心率的记录中的体重）
+    names, values, valid = feature_columns(runlog)
+    products, center = pair_products(values, valid)
+    r, slope, mean, pairs = correlation_matrix(products, center)
+    boot_r, boot_slope, boot_mean = bootstrap(products, center, samples, seed)
+    return {
+        'records': runlog.take(mask),
+        'names': names,
+        'r': r,
+        'slope': slope,
+        'mean': mean,
+        'pairs': pairs,
+        'boot_r': boot_r,
+        'boot_slope': boot_slope,
+        'boot_mean': boot_mean,
+    }
 
 def calculate_correlation(x, y):
     """计算相关系数"""
@@ -65,14 +81,94 @@ def calculate_correlation(x, y):
     correlation = np.corrcoef(x, y)[0, 1]
     return correlation
 
-def print_analysis_report(valid_records):
-    """打印分析报告"""
-    if not valid_records:
+def _strength(r):
+    """相关强度"""
+    if abs(r) > 0.7:
+        return '强相关'
+    if abs(r) > 0.4:
+        return '中等相关'
+    return '弱相关'
+
+def _print_correlation(analysis, r_ci, x, y, subject):
+    """打印一对列的相关系数、置信区间和结论"""
+    i, j = analysis['names'].index(x), analysis['names'].index(y)
+    r = analysis['r'][i, j]
+    pairs = int(analysis['pairs'][i, j])
+    if np.isnan(r):
+        print(f"{x}与{y}相关系数: -（{pairs} 条配对记录，数据不足）")
         return
+    low, high = r_ci[0][i, j], r_ci[1][i, j]
+    print(f"{x}与{y}相关系数: {r:.3f}（95%置信区间 {low:.3f} ~ {high:.3f}，{pairs} 条记录）")
+    impact = {'强相关': '影响显著', '中等相关': '有一定影响', '弱相关': '影响较小'}[_strength(r)]
+    if low > 0 or high < 0:
+        print(f"  → {_strength(r)}：{subject}对{y}{impact}（置信区间不含0，统计上显著）")
+    else:
+        print(f"  → {_strength(r)}：{subject}对{y}{impact}，但置信区间包含0，尚不能确定存在关联")
+
+def _display_width(text):
+    """终端显示宽度：中文字符占两格"""
+    return sum(2 if unicodedata.east_asian_width(c) in 'WF' else 1 for c in text)
+
+def print_correlation_matrix(analysis):
+    """打印完整的相关系数矩阵"""
+    names = analysis['names']
+    width = max(_display_width(name) for name in names) + 2
+    print("【相关系数矩阵】")
+    print(' ' * width + ''.join(' ' * (width - _display_width(name)) + name for name in names))
+    for i, name in enumerate(names):
+        cells = ''.join(f"{'-' if np.isnan(v) else f'{v:.2f}':>{width}}" for v in analysis['r'][i])
+        print(name + ' ' * (width - _display_width(name)) + cells)
+    print()
 
-    weights = [r['weight'] for r in valid_records]
-    hrs = [r['avg_hr'] for r in valid_records]
-    paces = [r['pace_seconds'] for r in valid_records]
+def print_hr_model(model, valid_records, target_weight=TARGET_WEIGHT, target_hr=TARGET_HR):
+    """打印心率模型的系数，以及按最近几次训练的条件在当前体重和目标体重下的心率预测"""
+    print("【心率模型】")
+    print(f"平均心率 ~ 体重 + 配速 + 距离 + 场地 + 近7天跑量（递推最小二乘，{model.count()} 条记录）")
+    if model.residual_variance() is None:
+        print("记录数不足，暂时无法估计")
+        print()
+        return
+    for name, coefficient, error in model.coefficients()[1:]:
+        if error is None:
+            continue
+        print(f"  {name}: {coefficient:+.3f} ± {Z_95 * error:.3f} {COEFFICIENT_UNITS.get(name, 'bpm')}")
+
+    recent = valid_records.take(np.arange(max(len(valid_records) - PREDICTION_RUNS, 0),
+                                          len(valid_records)))
+    pace = float(recent.pace.mean())
+    distance = float(recent.distance.mean())
+    venue = recent.venues[np.bincount(recent.venue).argmax()]
+    load = model.current_load()
+    weight = float(valid_records.weight[-1])
+    print(f"按最近{len(recent)}次训练的平均配速 {int(pace) // 60}:{int(pace) % 60:02d}、"
+          f"距离 {distance:.1f} 公里、场地 {venue}，近7天跑量 {load:.1f} 公里：")
+
+    def predict(weight):
+        return model.predict(feature_vector(weight, pace, distance, venue, load))
+
+    estimate, low, high = predict(weight)
+    print(f"  当前体重 {weight:.1f}kg：心率约 {estimate:.0f} bpm（95%预测区间 {low:.0f} ~ {high:.0f}）")
+    if weight > target_weight:
+        estimate, low, high = predict(target_weight)
+        print(f"  体重降至{target_weight:g}kg：心率约 {estimate:.0f} bpm（95%预测区间 {low:.0f} ~ {high:.0f}）")
+        if high <= target_hr:
+            print(f"  ✅ 预计可以达到目标心率{target_hr} bpm")
+        elif estimate <= target_hr:
+            print(f"  → 有可能达到目标心率{target_hr} bpm（预测区间上限 {high:.0f} bpm）")
+        else:
+            print(f"  ⚠️  预计心率{estimate:.0f} bpm，仍高于目标{target_hr} bpm")
+    print()
+
+def print_analysis_report(analysis, model=None, target_weight=TARGET_WEIGHT, target_hr=TARGET_HR):
+    """打印分析报告，analysis 为 analyze_weight_correlation() 的结果，model 为心率模型（HRModel）"""
+    if not analysis:
+        return
+
+    valid_records = analysis['records']
+
+    weights = valid_records.weight.astype(float)
+    hrs = valid_records.avg_hr.astype(int)
+    paces = valid_records.pace.astype(int)
 
     print("=" * 60)
     print("体重-心率-配速关联分析报告")
@@ -83,7 +179,7 @@ def print_analysis_report(valid_records):
     print()
 
     # 体重变化
-    weight_change = weights[-1] - weights[0]
+    weight_change = float(weights[-1] - weights[0])
     print("【体重变化】")
     print(f"起始体重: {weights[0]:.1f} kg")
     print(f"当前体重: {weights[-1]:.1f} kg")
@@ -91,7 +187,7 @@ def print_analysis_report(valid_records):
     print()
 
     # 心率变化
-    hr_change = hrs[-1] - hrs[0]
+    hr_change = int(hrs[-1] - hrs[0])
     print("【心率变化】")
     print(f"起始平均心率: {hrs[0]} bpm")
     print(f"当前平均心率: {hrs[-1]} bpm")
@@ -99,61 +195,40 @@ def print_analysis_report(valid_records):
     print()
 
     # 配速变化
-    pace_change = paces[-1] - paces[0]
+    pace_change = int(paces[-1] - paces[0])
     print("【配速变化】")
     print(f"起始配速: {paces[0]//60}:{paces[0]%60:02d}")
     print(f"当前配速: {paces[-1]//60}:{paces[-1]%60:02d}")
     print(f"配速变化: {pace_change:+d} 秒/km")
     print()
 
-    # 相关性分析
-    print("【相关性分析】")
-
-    # 体重与心率的相关性
-    weight_hr_corr = calculate_correlation(weights, hrs)
-    print(f"体重与心率相关系数: {weight_hr_corr:.3f}")
-    if abs(weight_hr_corr) > 0.7:
-        print("  → 强相关：体重对心率影响显著")
-    elif abs(weight_hr_corr) > 0.4:
-        print("  → 中等相关：体重对心率有一定影响")
-    else:
-        print("  → 弱相关：体重对心率影响较小")
-
-    # 体重与配速的相关性
-    weight_pace_corr = calculate_correlation(weights, paces)
-    print(f"体重与配速相关系数: {weight_pace_corr:.3f}")
-    if abs(weight_pace_corr) > 0.7:
-        print("  → 强相关：体重对配速影响显著")
-    elif abs(weight_pace_corr) > 0.4:
-        print("  → 中等相关：体重对配速有一定影响")
-    else:
-        print("  → 弱相关：体重对配速影响较小")
+    print_correlation_matrix(analysis)
 
+    # 相关性分析（95%置信区间来自自助法重抽样）
+    print("【相关性分析】")
+    r_ci = confidence_interval(analysis['boot_r'])
+    for x in ['体重'] + [f'{lag}天前体重' for lag in LAG_DAYS]:
+        subject = '体重' if x == '体重' else f'{x}（滞后）'
+        _print_correlation(analysis, r_ci, x, '心率', subject)
+        _print_correlation(analysis, r_ci, x, '配速', subject)
     print()
 
-    # 预测分析
-    if weight_change != 0:
+    # 预测分析：心率对体重的回归，用全部配对记录而不只是首末两条
+    w, hr = analysis['names'].index('体重'), analysis['names'].index('心率')
+    slope = analysis['slope'][w, hr]
+    if not np.isnan(slope):
         print("【预测分析】")
-
-        # 计算每kg体重对心率的影响
-        hr_per_kg = hr_change / weight_change if weight_change != 0 else 0
-        print(f"每减重1kg，心率变化约: {hr_per_kg:.1f} bpm")
-
-        # 预测达到目标体重时的心率
-        target_weight = 78
-        weight_to_lose = weights[-1] - target_weight
-        if weight_to_lose > 0:
-            predicted_hr = hrs[-1] + (hr_per_kg * (-weight_to_lose))
-            print(f"预测体重降至{target_weight}kg时，心率约: {predicted_hr:.0f} bpm")
-
-            target_hr = 150
-            if predicted_hr <= target_hr:
-                print(f"  ✅ 预计可以达到目标心率{target_hr} bpm")
-            else:
-                print(f"  ⚠️  预计心率{predicted_hr:.0f} bpm，仍高于目标{target_hr} bpm")
-
+        slope_low, slope_high = confidence_interval(analysis['boot_slope'][:, w, hr])
+        print(f"每减重1kg，心率变化约: {-slope:+.1f} bpm"
+              f"（95%置信区间 {-slope_high:+.1f} ~ {-slope_low:+.1f}）")
+        if not (slope_low > 0 or slope_high < 0):
+            print("  体重与心率的回归斜率置信区间包含0，预测仅供参考")
         print()
 
+    # 目标体重下的心率：多元模型同时考虑配速、距离、场地和近期负荷
+    if model is not None:
+        print_hr_model(model, valid_records, target_weight, target_hr)
+
     # 建议
     print("【训练建议】")
     if weight_change < 0:
@@ -175,12 +250,13 @@ def print_analysis_report(valid_records):
 
 def plot_weight_hr_correlation(valid_records, output_dir='output'):
     """绘制体重-心率关联图"""
+    plt = get_pyplot()
     if not valid_records:
         return
 
-    weights = [r['weight'] for r in valid_records]
-    hrs = [r['avg_hr'] for r in valid_records]
-    dates = [r['date'] for r in valid_records]
+    weights = valid_records.weight
+    hrs = valid_records.avg_hr
+    dates = valid_records.date
 
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
 
@@ -231,12 +307,45 @@ def plot_weight_hr_correlation(valid_records, output_dir='output'):
     plt.tight_layout()
 
     os.makedirs(output_dir, exist_ok=True)
-    plt.savefig(os.path.join(output_dir, 'weight_hr_correlation.png'), dpi=300)
+    save_figure(plt, os.path.join(output_dir, 'weight_hr_correlation.png'))
     print(f"✓ 已生成: {output_dir}/weight_hr_correlation.png")
     plt.close()
 
+def _load_from_snapshot(snapshot_dir, data_dir):
+    """从快照加载记录，快照不可用或已过期时返回 None"""
+    try:
+        stale = stale_sources(snapshot_dir, data_dir)
+        if stale:
+            print(f"⚠️  快照已过期（{', '.join(stale)} 有变化），改为解析Markdown")
+            return None
+        runlog = load_snapshot(snapshot_dir)
+    except SnapshotError as e:
+        print(f"⚠️  {e}，改为解析Markdown")
+        return None
+
+    print(f"已从快照加载: {snapshot_dir}")
+    return runlog
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='体重-心率-配速关联分析')
+    add_common_arguments(parser)
+    parser.add_argument('--no-plots', action='store_true',
+                        help='只输出文字报告，不生成图表（不加载matplotlib）')
+    parser.add_argument('--snapshot', nargs='?', const='', default=None,
+                        help='从二进制快照加载记录（默认 .cache/snapshot），快照过期时回退为解析Markdown')
+    parser.add_argument('--bootstrap', type=int, default=BOOTSTRAP_SAMPLES,
+                        help=f'自助法重抽样次数（默认 {BOOTSTRAP_SAMPLES}）')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='重抽样的随机种子（默认 0，结果可重复）')
+    parser.add_argument('--target-weight', type=float, default=TARGET_WEIGHT,
+                        help=f'预测分析的目标体重 kg（默认 {TARGET_WEIGHT}）')
+    parser.add_argument('--target-hr', type=int, default=TARGET_HR,
+                        help=f'预测分析的目标心率 bpm（默认 {TARGET_HR}）')
+    args = parser.parse_args()
+    if args.bootstrap < 1:
+        parser.error('--bootstrap 必须大于 0')
+
     script_dir = os.path.dirname(os.path.abspath(__file__))
     project_dir = os.path.dirname(script_dir)
     data_dir = os.path.join(project_dir, 'data')
@@ -246,26 +355,51 @@ def main():
         print("错误: 找不到data目录")
         return
 
-    print("正在分析数据...")
-    all_records, monthly_stats = analyze_data(data_dir)
-
-    if not all_records:
+    PROFILER.configure(args, 'weight_analysis', os.path.join(default_cache_dir(data_dir), 'profile'))
+    runlog = None
+    all_records = None
+    if args.snapshot is not None:
+        runlog = _load_from_snapshot(args.snapshot or default_snapshot_dir(data_dir), data_dir)
+
+    if runlog is None:
+        print("正在分析数据...")
+        cache = ParseCache.for_data_dir(data_dir)
+        diagnostics = []
+        all_records, monthly_stats = analyze_data(data_dir, cache=cache, diagnostics=diagnostics,
+                                                  jobs=args.jobs)
+        print_diagnostics(diagnostics)
+        print(cache.report())
+        with PROFILER.stage('build_runlog', records=len(all_records)):
+            runlog = RunLog.from_records(all_records)
+
+    if not len(runlog):
         print("暂无跑步记录数据")
         return
 
-    print(f"找到 {len(all_records)} 条跑步记录\n")
+    print(f"找到 {len(runlog)} 条跑步记录\n")
 
     # 分析体重关联
-    valid_records = analyze_weight_correlation(all_records)
-
-    if valid_records:
+    with PROFILER.stage('analyze_weight_correlation', records=len(runlog), samples=args.bootstrap):
+        analysis = analyze_weight_correlation(runlog, args.bootstrap, args.seed)
+
+    if analysis:
+        # 心率模型：与月度文件一致时直接读取（quick_log.py 录入时已增量更新），否则重新拟合
+        with PROFILER.stage('hr_model', records=len(runlog)):
+            if all_records is None:
+                all_records = [runlog.record(i) for i in range(len(runlog))]
+            model, refitted = load_or_fit(data_dir, all_records)
+        print(f"心率模型: {'重新拟合' if refitted else '使用已保存的模型'}（{model.count()} 条记录）\n")
+
+        valid_records = analysis['records']
         # 打印分析报告
-        print_analysis_report(valid_records)
+        with PROFILER.stage('print_analysis_report', records=len(valid_records)):
+            print_analysis_report(analysis, model, args.target_weight, args.target_hr)
 
         # 生成关联图表
-        plot_weight_hr_correlation(valid_records, output_dir)
-
-        print(f"\n图表已保存到 {output_dir} 目录")
+        if not args.no_plots:
+            with PROFILER.stage('plot_weight_hr_correlation', records=len(valid_records)):
+                plot_weight_hr_correlation(valid_records, output_dir)
+            print(f"\n图表已保存到 {output_dir} 目录")
     else:
         print("\n提示: 需要记录体重数据才能进行关联分析")
         print("请在每次跑步时记录体重，以便追踪体重对心率和配速的影响")